@@ -0,0 +1,296 @@
+"""
+Streaming catalog importer for CSV and NDJSON feeds.
+
+Records flow through a generator pipeline (read -> batch -> validate) that
+only ever holds one batch in hand, and validated batches are handed to the
+database writer through a bounded asyncio.Queue. When the writer falls
+behind, the reader blocks on the full queue instead of buffering the file,
+so memory stays constant no matter how large the feed is.
+
+Each batch is written in its own transaction by the entity's writer, and
+`import_stream` yields an `ImportProgress` snapshot after every batch.
+An HTTP upload is read through `AsyncChunkReader`, which pulls body chunks
+from the event loop only as the parser needs them.
+
+The entities themselves (Pydantic model + writer) are defined in main.py
+as IMPORT_ENTITIES. Command line use:
+
+    python app/catalog_import.py products supplier_feed.csv.gz --batch-size 2000
+"""
+
+import argparse
+import asyncio
+import csv
+import gzip
+import io
+import json
+import sys
+import time
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import (Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional,
+                    TextIO, Tuple)
+
+from pydantic import BaseModel, ValidationError
+
+FORMATS = ("csv", "ndjson")
+# Row errors kept in progress reports; further errors are only counted
+MAX_REPORTED_ERRORS = 100
+
+# (row index, message) for a rejected row
+RowError = Tuple[int, str]
+# Writes validated (row index, model) pairs in one transaction; returns the rows it rejected
+BatchWriter = Callable[[Any, List[Tuple[int, BaseModel]]], Awaitable[List[RowError]]]
+
+
+@dataclass
+class ImportEntity:
+    """An importable entity: the model rows are validated against and its batch writer."""
+    name: str
+    model: type
+    write: BatchWriter
+
+
+@dataclass
+class ImportProgress:
+    """Running totals for an import, reported after each batch."""
+    entity: str
+    rows_read: int = 0
+    rows_written: int = 0
+    rows_failed: int = 0
+    batches: int = 0
+    elapsed_seconds: float = 0.0
+    done: bool = False
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+
+    def record_errors(self, errors: Iterable[RowError]) -> None:
+        for index, message in errors:
+            self.rows_failed += 1
+            if len(self.errors) < MAX_REPORTED_ERRORS:
+                self.errors.append({"index": index, "error": message})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "entity": self.entity,
+            "rows_read": self.rows_read,
+            "rows_written": self.rows_written,
+            "rows_failed": self.rows_failed,
+            "batches": self.batches,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "done": self.done,
+            "errors": self.errors,
+        }
+
+
+class AsyncChunkReader(io.RawIOBase):
+    """
+    Blocking, file-like view of an async iterator of byte chunks (a request body).
+
+    Only for use off the event loop, as import_stream's parsing thread
+    does: each read asks `loop` for the next chunk and waits for it, so
+    the body is pulled as fast as rows are parsed and never held whole.
+    `finished` is set on the loop once the last chunk has been read.
+    """
+
+    def __init__(self, chunks: AsyncIterator[bytes], loop: asyncio.AbstractEventLoop):
+        self._chunks = chunks.__aiter__()
+        self._loop = loop
+        self._pending = b""
+        self.finished = asyncio.Event()
+
+    def readable(self) -> bool:
+        return True
+
+    async def _next_chunk(self) -> Optional[bytes]:
+        try:
+            return await self._chunks.__anext__()
+        except StopAsyncIteration:
+            self.finished.set()
+            return None
+
+    def readinto(self, buffer) -> int:
+        while not self._pending and not self.finished.is_set():
+            chunk = asyncio.run_coroutine_threadsafe(self._next_chunk(), self._loop).result()
+            self._pending = chunk or b""
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+def detect_format(name: Optional[str]) -> Optional[str]:
+    """Guess the feed format from a file name or content type."""
+    name = (name or "").lower()
+    if "ndjson" in name or "jsonl" in name or name.endswith((".json", ".json.gz")):
+        return "ndjson"
+    if "csv" in name:
+        return "csv"
+    return None
+
+
+def iter_records(stream: TextIO, fmt: str) -> Iterator[Any]:
+    """
+    Lazily parse a text stream into dicts.
+
+    Empty CSV cells become None so optional fields validate. A line that
+    cannot be parsed yields a ValueError in its place rather than stopping
+    the import.
+    """
+    if fmt == "csv":
+        for record in csv.DictReader(stream):
+            yield {key: (value if value != "" else None) for key, value in record.items() if key}
+    elif fmt == "ndjson":
+        for line in stream:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                yield ValueError(f"Invalid JSON: {e.msg}")
+    else:
+        raise ValueError(f"Unsupported format '{fmt}'. Choose from: {', '.join(FORMATS)}")
+
+
+def batched(iterable: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def format_validation_error(error: ValidationError) -> str:
+    """Flatten a ValidationError into one "field: message; ..." line."""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" if e['loc'] else e['msg']
+        for e in error.errors()
+    )
+
+
+def validate_batch(model: type, start: int, records: List[Any]) -> Tuple[List[Tuple[int, BaseModel]], List[RowError]]:
+    """Validate one batch; row indexes are 0-based positions in the whole feed."""
+    valid, errors = [], []
+    for index, record in enumerate(records, start):
+        if isinstance(record, ValueError):
+            errors.append((index, str(record)))
+        elif not isinstance(record, dict):
+            errors.append((index, "Expected an object"))
+        else:
+            try:
+                valid.append((index, model(**record)))
+            except ValidationError as e:
+                errors.append((index, format_validation_error(e)))
+    return valid, errors
+
+
+def validated_batches(stream: TextIO, fmt: str, model: type, batch_size: int) -> Iterator[Tuple[int, list, list]]:
+    """The read -> batch -> validate pipeline: yields (rows in batch, valid rows, row errors)."""
+    start = 0
+    for records in batched(iter_records(stream, fmt), batch_size):
+        valid, errors = validate_batch(model, start, records)
+        start += len(records)
+        yield len(records), valid, errors
+
+
+async def import_stream(stream: TextIO, fmt: str, entity: ImportEntity, session_factory,
+                        batch_size: int = 1000, max_pending_batches: int = 4) -> AsyncIterator[ImportProgress]:
+    """
+    Import a feed, yielding progress after each written batch and once more when done.
+
+    Parsing and validation run in a worker thread so the event loop stays
+    free; at most `max_pending_batches` validated batches wait for the
+    writer at any time.
+    """
+    progress = ImportProgress(entity=entity.name)
+    started = time.monotonic()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending_batches)
+    pipeline = validated_batches(stream, fmt, entity.model, batch_size)
+    finished = object()
+
+    async def produce():
+        try:
+            while True:
+                batch = await asyncio.to_thread(next, pipeline, finished)
+                await queue.put(batch)
+                if batch is finished:
+                    return
+        except Exception as e:
+            await queue.put(e)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            batch = await queue.get()
+            if batch is finished:
+                break
+            if isinstance(batch, Exception):
+                raise batch
+            count, valid, errors = batch
+            progress.rows_read += count
+            progress.record_errors(errors)
+            if valid:
+                async with session_factory() as session:
+                    rejected = await entity.write(session, valid)
+                progress.record_errors(rejected)
+                progress.rows_written += len(valid) - len(rejected)
+            progress.batches += 1
+            progress.elapsed_seconds = time.monotonic() - started
+            yield progress
+    finally:
+        producer.cancel()
+
+    progress.done = True
+    progress.elapsed_seconds = time.monotonic() - started
+    yield progress
+
+
+def open_feed(path: str) -> TextIO:
+    """Open a feed file for streaming, transparently decompressing .gz files."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+async def _run_cli(args) -> int:
+    # Imported lazily so the module can be used without starting the app
+    import main as app_main
+    from migrations import run_migrations
+
+    entity = app_main.IMPORT_ENTITIES[args.entity]
+    fmt = args.format or detect_format(args.path)
+    if fmt is None:
+        print(f"Cannot tell the format of {args.path}; pass --format csv|ndjson", file=sys.stderr)
+        return 2
+
+    async with app_main.engine.begin() as connection:
+        await connection.run_sync(run_migrations, app_main.Base.metadata)
+
+    progress = None
+    try:
+        with open_feed(args.path) as stream:
+            async for progress in import_stream(stream, fmt, entity, app_main.SessionLocal,
+                                                batch_size=args.batch_size):
+                rate = progress.rows_read / progress.elapsed_seconds if progress.elapsed_seconds else 0
+                status = "done" if progress.done else "progress"
+                print(f"{entity.name} {status}: {progress.rows_read} read, {progress.rows_written} written, "
+                      f"{progress.rows_failed} failed ({rate:,.0f} rows/s)", file=sys.stderr)
+    finally:
+        await app_main.engine.dispose()
+
+    for error in progress.errors if progress else []:
+        print(f"row {error['index']}: {error['error']}", file=sys.stderr)
+    return 1 if progress and progress.rows_failed else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Stream a CSV or NDJSON catalog feed into the inventory database.")
+    parser.add_argument("entity", choices=["products", "suppliers", "inventory_levels"])
+    parser.add_argument("path", help="Feed file (.csv, .ndjson/.jsonl, optionally .gz)")
+    parser.add_argument("--format", choices=FORMATS, help="Feed format (default: from the file name)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per transaction (default: 1000)")
+    return asyncio.run(_run_cli(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
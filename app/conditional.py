@@ -0,0 +1,58 @@
+"""
+Weak ETags and conditional GET handling.
+
+Product reads carry weak validators: a single product's is derived from
+its id and `updated_at`, a product page's from the request parameters and
+the catalog revision (bumped in the transaction of every product create,
+edit or delete), so any product change changes every page's tag. A request whose
+If-None-Match holds the current tag gets 304 Not Modified and no body.
+
+Responses are sent with `Cache-Control: no-cache`, so browsers keep them
+but revalidate on every use; a 304 is then served from the browser cache
+without any client changes.
+"""
+
+import hashlib
+from datetime import datetime
+from typing import Any, Mapping, Optional
+
+from starlette.responses import Response
+
+CACHE_CONTROL = "no-cache"
+
+
+def _part(value: Any) -> str:
+    if isinstance(value, str):
+        try:
+            # Timestamps may come back from SQLite or a cache tier as text
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def weak_etag(*parts: Any) -> str:
+    """A weak ETag over `parts`; timestamps compare equal whether given as datetime or ISO text."""
+    digest = hashlib.sha1("\x1f".join(_part(part) for part in parts).encode("utf-8")).hexdigest()
+    return f'W/"{digest[:24]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header value against `etag`."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+def validator_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+
+def not_modified(headers: Mapping[str, str]) -> Response:
+    """An empty 304 response carrying the validator headers."""
+    return Response(status_code=304, headers=dict(headers))
@@ -0,0 +1,186 @@
+"""
+Database settings and engine construction.
+
+Settings come from environment variables (see `DatabaseSettings.from_env`);
+main.py loads the project's .env file into the environment before they are read.
+All request handling goes through SQLAlchemy's asyncio extension, so the
+URL is mapped to an async driver: SQLite (the default) runs on aiosqlite
+and PostgreSQL on asyncpg.
+
+For SQLite, a named profile supplies the connection pragmas, which are
+applied to every new connection through an engine "connect" event. The
+"production" profile enables WAL so readers no longer block behind writers,
+and sets busy_timeout so concurrent writers wait instead of failing with
+"database is locked".
+
+Blocking work that cannot be awaited (bulk search/vector indexing, file
+parsing) is handed to `asyncio.to_thread`; `create_executor` sizes the
+thread pool behind it (DB_EXECUTOR_WORKERS, by default the pool size
+plus overflow) so it is bounded the same way as database connections.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+# Async drivers used for each backend, keyed by URL scheme
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+
+def to_async_url(url: str) -> str:
+    """Map a database URL onto its async driver (sqlite -> aiosqlite, postgresql -> asyncpg)."""
+    scheme, sep, rest = url.partition("://")
+    backend, _, driver = scheme.partition("+")
+    if driver in ("aiosqlite", "asyncpg"):
+        return url
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"Unsupported DATABASE_URL backend '{backend}'. Use sqlite or postgresql.")
+    return f"{ASYNC_DRIVERS[backend]}{sep}{rest}"
+
+# SQLite pragma presets; individual SQLITE_* variables override them
+SQLITE_PROFILES = {
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,        # negative = KiB, i.e. 64 MB page cache
+        "mmap_size": 268435456,      # 256 MB memory-mapped I/O
+        "busy_timeout": 5000,        # ms to wait on a locked database
+        "temp_store": "MEMORY",
+    },
+    "development": {
+        "journal_mode": None,
+        "synchronous": None,
+        "cache_size": None,
+        "mmap_size": None,
+        "busy_timeout": 5000,
+        "temp_store": None,
+    },
+}
+
+
+@dataclass
+class DatabaseSettings:
+    """Connection and tuning settings for the inventory database."""
+    url: str = "sqlite:///./inventory.db"
+    profile: str = "production"
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0
+    pool_recycle: int = 1800
+    executor_workers: Optional[int] = None
+    journal_mode: Optional[str] = None
+    synchronous: Optional[str] = None
+    cache_size: Optional[int] = None
+    mmap_size: Optional[int] = None
+    busy_timeout: Optional[int] = None
+    temp_store: Optional[str] = None
+
+    def __post_init__(self):
+        if self.profile not in SQLITE_PROFILES:
+            raise ValueError(f"Unknown DB_PROFILE '{self.profile}'. Choose from: {', '.join(SQLITE_PROFILES)}")
+        for pragma, value in SQLITE_PROFILES[self.profile].items():
+            if getattr(self, pragma) is None:
+                setattr(self, pragma, value)
+
+    @property
+    def is_sqlite(self) -> bool:
+        return self.url.startswith("sqlite")
+
+    @property
+    def async_url(self) -> str:
+        return to_async_url(self.url)
+
+    @property
+    def max_workers(self) -> int:
+        """Threads in the blocking-work executor: DB_EXECUTOR_WORKERS, else pool_size + max_overflow."""
+        if self.executor_workers:
+            return self.executor_workers
+        return max(self.pool_size + self.max_overflow, 1)
+
+    @property
+    def is_sqlite_memory(self) -> bool:
+        return self.is_sqlite and (self.url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in self.url)
+
+    @classmethod
+    def from_env(cls) -> "DatabaseSettings":
+        """
+        Read DATABASE_URL, DB_PROFILE, DB_POOL_SIZE, DB_MAX_OVERFLOW,
+        DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_EXECUTOR_WORKERS and SQLITE_<PRAGMA> overrides
+        (e.g. SQLITE_CACHE_SIZE, SQLITE_BUSY_TIMEOUT).
+        """
+        env = {
+            "url": os.getenv("DATABASE_URL"),
+            "profile": os.getenv("DB_PROFILE"),
+            "pool_size": os.getenv("DB_POOL_SIZE"),
+            "max_overflow": os.getenv("DB_MAX_OVERFLOW"),
+            "pool_timeout": os.getenv("DB_POOL_TIMEOUT"),
+            "pool_recycle": os.getenv("DB_POOL_RECYCLE"),
+            "executor_workers": os.getenv("DB_EXECUTOR_WORKERS"),
+        }
+        for pragma in SQLITE_PROFILES["production"]:
+            env[pragma] = os.getenv(f"SQLITE_{pragma.upper()}")
+
+        casts = {
+            "pool_size": int, "max_overflow": int, "pool_timeout": float, "pool_recycle": int, "executor_workers": int,
+            "cache_size": int, "mmap_size": int, "busy_timeout": int,
+        }
+        kwargs = {name: casts.get(name, str)(value) for name, value in env.items() if value}
+        return cls(**kwargs)
+
+
+def sqlite_pragmas(settings: DatabaseSettings) -> List[str]:
+    """PRAGMA statements to run on each new SQLite connection."""
+    pragmas = []
+    for pragma in SQLITE_PROFILES["production"]:
+        value = getattr(settings, pragma)
+        if value is not None:
+            pragmas.append(f"PRAGMA {pragma}={value}")
+    return pragmas
+
+
+def create_db_engine(settings: DatabaseSettings) -> AsyncEngine:
+    """Create the async engine with a sized pool and per-connection SQLite pragmas."""
+    kwargs = {}
+    if settings.is_sqlite:
+        # busy_timeout pragma governs lock waits; the driver timeout mirrors it
+        kwargs["connect_args"] = {
+            "check_same_thread": False,
+            "timeout": (settings.busy_timeout or 5000) / 1000,
+        }
+    if not settings.is_sqlite_memory:
+        kwargs.update(
+            pool_size=settings.pool_size,
+            max_overflow=settings.max_overflow,
+            pool_timeout=settings.pool_timeout,
+            pool_recycle=settings.pool_recycle,
+            pool_pre_ping=not settings.is_sqlite,
+        )
+
+    engine = create_async_engine(settings.async_url, **kwargs)
+
+    if settings.is_sqlite:
+        pragmas = sqlite_pragmas(settings)
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for pragma in pragmas:
+                    cursor.execute(pragma)
+            finally:
+                cursor.close()
+
+    return engine
+
+
+def create_executor(settings: DatabaseSettings) -> ThreadPoolExecutor:
+    """Thread pool for blocking work started from async handlers (install it as the loop's default executor)."""
+    return ThreadPoolExecutor(max_workers=settings.max_workers, thread_name_prefix="inventory-db")
@@ -0,0 +1,310 @@
+"""
+Local, offline vector embeddings for product retrieval.
+
+Products are encoded with a pluggable local encoder (feature hashing by
+default, optionally TF-IDF weighted) into L2-normalized vectors kept in a
+NumPy matrix. Top-k queries are a single matrix-vector product, and a
+product write re-embeds only that row. The matrix can be saved to disk and
+memory-mapped back on startup, in which case only rows whose text changed
+while the server was down are re-embedded. Saves write each file under a
+temporary name and rename it into place, so a crash mid-save or a store
+that no longer loads only costs a re-embed, never a failed startup.
+
+`fuse_rankings` merges vector hits with keyword hits (reciprocal-rank
+fusion), so semantic matches are not hidden by a single keyword match.
+"""
+
+import json
+import math
+import os
+import re
+import tempfile
+import zlib
+from pathlib import Path
+from threading import RLock
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; the API falls back to keyword search
+    np = None
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def embeddings_available() -> bool:
+    """True when numpy is installed and vector retrieval can be used."""
+    return np is not None
+
+
+def _stable_hash(value: str) -> int:
+    # Python's hash() is salted per process; persisted vectors need a stable one
+    return zlib.crc32(value.encode("utf-8"))
+
+
+def _replace_file(path: Path, write) -> None:
+    """Write `path` through a temporary file in the same directory, renamed into place by `os.replace`."""
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def fuse_rankings(*rankings: List[Tuple[float, int]], limit: int = 3, k: int = 60) -> List[int]:
+    """
+    Reciprocal-rank fusion of (score, id) lists, each best first.
+
+    An id scores sum(1 / (k + rank)) over the lists it appears in, so items
+    ranked well by several retrievers rise to the top; raw scores from the
+    different retrievers are never compared. Ties keep first-seen order.
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, (_, item_id) in enumerate(ranking, start=1):
+            fused[item_id] = fused.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused, key=fused.get, reverse=True)[:limit]
+
+
+class HashingEncoder:
+    """
+    Feature-hashing encoder over word unigrams and character n-grams.
+
+    Character n-grams (taken inside each word) let "macbooks" land close to
+    "macbook" without a vocabulary. The sign of each feature comes from the
+    hash as well, so bucket collisions tend to cancel out.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim: int = 1024, char_ngram: int = 3, stop_words: Optional[Set[str]] = None):
+        self.dim = dim
+        self.char_ngram = char_ngram
+        self.stop_words = stop_words or set()
+
+    def _features(self, text: str) -> Dict[int, float]:
+        counts: Dict[int, float] = {}
+        for word in _TOKEN_PATTERN.findall(text.lower()):
+            if word in self.stop_words:
+                continue
+            features = [word]
+            padded = f"<{word}>"
+            n = self.char_ngram
+            features.extend(padded[i:i + n] for i in range(max(len(padded) - n + 1, 0)))
+            for feature in features:
+                h = _stable_hash(feature)
+                bucket = h % self.dim
+                sign = 1.0 if (h >> 31) & 1 == 0 else -1.0
+                counts[bucket] = counts.get(bucket, 0.0) + sign
+        return counts
+
+    def _weight(self, bucket: int, value: float) -> float:
+        return value
+
+    def encode(self, texts: List[str]) -> "np.ndarray":
+        """Encode texts into an (n, dim) float32 matrix of unit-length rows."""
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for bucket, value in self._features(text).items():
+                matrix[row, bucket] = self._weight(bucket, value)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+
+class TfidfEncoder(HashingEncoder):
+    """
+    HashingEncoder with IDF weights per bucket, fitted on the catalog.
+
+    IDF weights are frozen at fit time so that individual writes never force
+    other rows to be re-embedded; refit by rebuilding the store.
+    """
+
+    name = "tfidf"
+
+    def __init__(self, dim: int = 1024, char_ngram: int = 3, stop_words: Optional[Set[str]] = None):
+        super().__init__(dim, char_ngram, stop_words)
+        self.idf = None
+
+    def fit(self, texts: Iterable[str]) -> "TfidfEncoder":
+        document_frequency = np.zeros(self.dim, dtype=np.float64)
+        n_documents = 0
+        for text in texts:
+            n_documents += 1
+            for bucket in self._features(text):
+                document_frequency[bucket] += 1
+        self.idf = (np.log((1 + n_documents) / (1 + document_frequency)) + 1).astype(np.float32)
+        return self
+
+    def _weight(self, bucket: int, value: float) -> float:
+        tf = math.copysign(1 + math.log(abs(value)), value) if value else 0.0
+        return tf * (self.idf[bucket] if self.idf is not None else 1.0)
+
+
+class VectorStore:
+    """
+    NumPy-backed id -> vector store answering top-k cosine-similarity queries.
+
+    Rows are preallocated and grown by doubling; removed rows are zeroed and
+    reused. A content hash per row lets `upsert` skip texts that have not
+    changed.
+    """
+
+    def __init__(self, encoder: HashingEncoder, capacity: int = 1024):
+        self.encoder = encoder
+        self._lock = RLock()
+        self._matrix = np.zeros((capacity, encoder.dim), dtype=np.float32)
+        self._ids = np.full(capacity, -1, dtype=np.int64)
+        self._hashes = np.zeros(capacity, dtype=np.uint32)
+        self._row_of: Dict[int, int] = {}
+        self._free: List[int] = []
+        self._size = 0
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def _grow(self, needed: int) -> None:
+        capacity = self._matrix.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+        matrix = np.zeros((new_capacity, self.encoder.dim), dtype=np.float32)
+        matrix[:self._size] = self._matrix[:self._size]
+        ids = np.full(new_capacity, -1, dtype=np.int64)
+        ids[:self._size] = self._ids[:self._size]
+        hashes = np.zeros(new_capacity, dtype=np.uint32)
+        hashes[:self._size] = self._hashes[:self._size]
+        self._matrix, self._ids, self._hashes = matrix, ids, hashes
+
+    def upsert_many(self, items: Iterable[Tuple[int, str]]) -> int:
+        """Embed and store (id, text) pairs; returns how many rows were (re)embedded."""
+        with self._lock:
+            pending = []
+            for item_id, text in items:
+                content_hash = _stable_hash(text)
+                row = self._row_of.get(item_id)
+                if row is not None and self._hashes[row] == content_hash:
+                    continue
+                pending.append((item_id, text, content_hash))
+            if not pending:
+                return 0
+
+            vectors = self.encoder.encode([text for _, text, _ in pending])
+            for (item_id, _, content_hash), vector in zip(pending, vectors):
+                row = self._row_of.get(item_id)
+                if row is None:
+                    if self._free:
+                        row = self._free.pop()
+                    else:
+                        self._grow(self._size + 1)
+                        row = self._size
+                        self._size += 1
+                    self._row_of[item_id] = row
+                    self._ids[row] = item_id
+                self._matrix[row] = vector
+                self._hashes[row] = content_hash
+            return len(pending)
+
+    def upsert(self, item_id: int, text: str) -> bool:
+        """Embed and store a single row; False if its text was unchanged."""
+        return self.upsert_many([(item_id, text)]) > 0
+
+    def remove(self, item_id: int) -> None:
+        """Drop a row (no-op if absent)."""
+        with self._lock:
+            row = self._row_of.pop(item_id, None)
+            if row is None:
+                return
+            self._matrix[row] = 0
+            self._ids[row] = -1
+            self._hashes[row] = 0
+            self._free.append(row)
+
+    def retain(self, item_ids: Set[int]) -> None:
+        """Drop every row whose id is not in `item_ids`."""
+        with self._lock:
+            for item_id in [i for i in self._row_of if i not in item_ids]:
+                self.remove(item_id)
+
+    def search(self, text: str, k: int = 5, min_score: float = 0.0) -> List[Tuple[float, int]]:
+        """Return up to k (similarity, id) pairs above `min_score`, best first."""
+        query = self.encoder.encode([text])[0]
+        with self._lock:
+            if not self._row_of or not query.any():
+                return []
+            scores = self._matrix[:self._size] @ query
+            k = min(k, self._size)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [
+                (float(scores[row]), int(self._ids[row]))
+                for row in top
+                if self._ids[row] >= 0 and scores[row] > min_score
+            ]
+
+    # ---- Persistence ----
+
+    def save(self, path: str) -> None:
+        """
+        Write the matrix, ids and content hashes next to `path` (.npy files + meta json).
+
+        A matrix memory-mapped by `load` is copied into memory first: the
+        mapping reads from the very file this replaces.
+        """
+        base = Path(path)
+        base.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            if isinstance(self._matrix, np.memmap):
+                self._matrix = np.array(self._matrix)
+            arrays = {
+                ".vectors.npy": self._matrix[:self._size],
+                ".ids.npy": self._ids[:self._size],
+                ".hashes.npy": self._hashes[:self._size],
+            }
+            if getattr(self.encoder, "idf", None) is not None:
+                arrays[".idf.npy"] = self.encoder.idf
+            for suffix, array in arrays.items():
+                _replace_file(base.with_suffix(suffix), lambda f: np.save(f, array))
+            meta = {"encoder": self.encoder.name, "dim": self.encoder.dim}
+            _replace_file(base.with_suffix(".meta.json"), lambda f: f.write(json.dumps(meta).encode("utf-8")))
+
+    def load(self, path: str) -> bool:
+        """
+        Load a store written by `save`, memory-mapping the vector matrix.
+
+        Returns False, leaving the store as it was, if nothing compatible and
+        intact is on disk (missing, written by another encoder, truncated or
+        mismatched files); the caller then embeds the catalog from scratch.
+        """
+        base = Path(path)
+        meta_path = base.with_suffix(".meta.json")
+        if not meta_path.exists():
+            return False
+        try:
+            meta = json.loads(meta_path.read_text())
+            if meta.get("encoder") != self.encoder.name or meta.get("dim") != self.encoder.dim:
+                return False
+            # Copy-on-write mapping: pages are only read into memory when touched
+            matrix = np.load(base.with_suffix(".vectors.npy"), mmap_mode="c")
+            ids = np.array(np.load(base.with_suffix(".ids.npy")), dtype=np.int64)
+            hashes = np.array(np.load(base.with_suffix(".hashes.npy")), dtype=np.uint32)
+            idf = None
+            idf_path = base.with_suffix(".idf.npy")
+            if getattr(self.encoder, "idf", "absent") is None and idf_path.exists():
+                idf = np.load(idf_path)
+        except (OSError, ValueError, EOFError):
+            return False
+        if matrix.shape != (len(ids), self.encoder.dim) or len(hashes) != len(ids) or (
+                idf is not None and idf.shape != (self.encoder.dim,)):
+            return False
+        with self._lock:
+            self._matrix, self._ids, self._hashes = matrix, ids, hashes
+            if idf is not None:
+                self.encoder.idf = idf
+            self._size = len(self._ids)
+            self._row_of = {int(i): row for row, i in enumerate(self._ids) if i >= 0}
+            self._free = [row for row, i in enumerate(self._ids) if i < 0]
+        return True
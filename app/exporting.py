@@ -0,0 +1,136 @@
+"""
+Streaming encoders for bulk data exports.
+
+Every encoder consumes an async iterator of row batches (lists of tuples
+in `columns` order) and yields bytes as each batch is encoded, so a
+StreamingResponse can send a result set of any size while only one batch
+is held in memory.
+
+Parquet output needs pyarrow, which is optional; each batch becomes one
+row group written through a sink that hands its bytes back immediately.
+"""
+
+import csv
+import io
+import json
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Dict, List, Sequence
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional; only the parquet format needs it
+    pa = pq = None
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+RowBatches = AsyncIterator[List[Sequence[Any]]]
+
+
+def parquet_available() -> bool:
+    """True when pyarrow is installed and Parquet exports can be produced."""
+    return pa is not None
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+async def encode_csv(columns: List[str], batches: RowBatches) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for batch in batches:
+        writer.writerows(
+            [value.isoformat() if isinstance(value, (datetime, date)) else value for value in row]
+            for row in batch
+        )
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def encode_ndjson(columns: List[str], batches: RowBatches) -> AsyncIterator[bytes]:
+    async for batch in batches:
+        lines = [json.dumps(dict(zip(columns, row)), default=_json_default) for row in batch]
+        if lines:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that buffers bytes until they are drained."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _arrow_schema(columns: List[str], types: Dict[str, str]) -> "pa.Schema":
+    arrow_types = {
+        "int": pa.int64(),
+        "float": pa.float64(),
+        "bool": pa.bool_(),
+        "str": pa.string(),
+        "datetime": pa.timestamp("us"),
+    }
+    return pa.schema([(column, arrow_types[types.get(column, "str")]) for column in columns])
+
+
+async def encode_parquet(columns: List[str], batches: RowBatches, types: Dict[str, str]) -> AsyncIterator[bytes]:
+    schema = _arrow_schema(columns, types)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        async for batch in batches:
+            if not batch:
+                continue
+            arrays = [pa.array([row[i] for row in batch], type=field.type) for i, field in enumerate(schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def encode_rows(fmt: str, columns: List[str], batches: RowBatches, types: Dict[str, str]) -> AsyncIterator[bytes]:
+    """
+    Encode row batches as `fmt` ("csv", "ndjson" or "parquet").
+
+    `types` maps column names to "int", "float", "bool", "str" or
+    "datetime"; it fixes the Parquet schema up front so batches whose
+    values happen to be all NULL still line up.
+    """
+    if fmt == "csv":
+        return encode_csv(columns, batches)
+    if fmt == "ndjson":
+        return encode_ndjson(columns, batches)
+    if fmt == "parquet":
+        if not parquet_available():
+            raise RuntimeError("Parquet export requires pyarrow")
+        return encode_parquet(columns, batches, types)
+    raise ValueError(f"Unsupported export format '{fmt}'. Choose from: {', '.join(EXPORT_MEDIA_TYPES)}")
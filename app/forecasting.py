@@ -0,0 +1,164 @@
+"""
+Deterministic demand forecasting from the stock movement ledger.
+
+Outbound movements are binned into a (products x days) matrix of daily
+demand, and every product is forecast at once with array operations:
+
+- daily demand is either the simple moving average of the last `window`
+  days ("sma") or a single exponential smoothing of the whole history
+  ("ses", computed as one weighted sum rather than a per-day loop);
+- safety stock is z * sigma * sqrt(lead time), with z taken from the
+  service level and sigma the standard deviation of daily demand;
+- the reorder point is the demand over the lead time plus safety stock,
+  and the order quantity tops on-hand stock up to cover the lead time
+  plus `horizon_days` of demand.
+
+NumPy is optional for the API as a whole; `forecasting_available()`
+reports whether this module can be used.
+"""
+
+import math
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from statistics import NormalDist
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; /forecast and the restock forecaster need it
+    np = None
+
+METHODS = ("sma", "ses")
+
+
+def forecasting_available() -> bool:
+    """True when numpy is installed and demand can be forecast."""
+    return np is not None
+
+
+@dataclass(frozen=True)
+class ForecastSettings:
+    """Parameters shared by every product in a forecast run."""
+    method: str = "sma"
+    history_days: int = 90
+    window: int = 28            # days averaged by "sma"
+    alpha: float = 0.3          # smoothing factor for "ses"
+    horizon_days: int = 28      # demand an order should cover after it arrives
+    service_level: float = 0.95
+
+    def __post_init__(self):
+        if self.method not in METHODS:
+            raise ValueError(f"Unknown method '{self.method}'. Choose from: {', '.join(METHODS)}")
+        if not 0 < self.alpha <= 1:
+            raise ValueError("alpha must be in (0, 1]")
+        if not 0.5 <= self.service_level < 1:
+            raise ValueError("service_level must be in [0.5, 1)")
+        if self.history_days < 1 or self.window < 1 or self.horizon_days < 0:
+            raise ValueError("history_days and window must be positive and horizon_days non-negative")
+
+
+def demand_matrix(product_ids: Sequence[int], daily_rows: Iterable[Tuple[int, Union[date, str], float]],
+                  end: date, days: int) -> "np.ndarray":
+    """
+    Daily outbound quantities as a (len(product_ids), days) float matrix.
+
+    `daily_rows` are (product_id, day, quantity) rows, e.g. from a GROUP BY
+    on the movement date; the last column is `end`. Rows for unknown
+    products or days outside the window are ignored.
+    """
+    matrix = np.zeros((len(product_ids), days), dtype=np.float64)
+    position = {product_id: i for i, product_id in enumerate(product_ids)}
+    first = end - timedelta(days=days - 1)
+    rows, columns, quantities = [], [], []
+    for product_id, day, quantity in daily_rows:
+        if isinstance(day, str):
+            day = date.fromisoformat(day[:10])
+        elif isinstance(day, datetime):
+            day = day.date()
+        row = position.get(product_id)
+        column = (day - first).days
+        if row is not None and 0 <= column < days:
+            rows.append(row)
+            columns.append(column)
+            quantities.append(quantity or 0)
+    if rows:
+        np.add.at(matrix, (np.array(rows), np.array(columns)), np.array(quantities, dtype=np.float64))
+    return matrix
+
+
+def daily_demand_rate(demand: "np.ndarray", settings: ForecastSettings) -> "np.ndarray":
+    """Forecast daily demand per product (one value per matrix row)."""
+    if demand.shape[1] == 0:
+        return np.zeros(demand.shape[0])
+    if settings.method == "sma":
+        return demand[:, -settings.window:].mean(axis=1)
+    # Exponential smoothing seeded with the first day: level_n = sum_k w_k * x_k
+    n = demand.shape[1]
+    decay = (1 - settings.alpha) ** np.arange(n - 1, -1, -1, dtype=np.float64)
+    weights = settings.alpha * decay
+    weights[0] = decay[0]
+    return demand @ weights
+
+
+def forecast(demand: "np.ndarray", on_hand: Sequence[float], lead_time_days: Sequence[float],
+             settings: ForecastSettings, min_order: Optional[Sequence[float]] = None,
+             min_reorder_point: Optional[Sequence[float]] = None) -> Dict[str, "np.ndarray"]:
+    """
+    Forecast every row of `demand` at once.
+
+    Returns arrays (one value per product) for recent_demand (units over
+    the last `window` days), daily_demand, demand_std, safety_stock,
+    reorder_point, order_up_to, reorder_quantity and days_of_cover (inf
+    when there is no demand). A positive reorder quantity is raised to
+    `min_order` (e.g. the product's reorder_quantity). `min_reorder_point`
+    (e.g. the product's configured reorder_point) floors the reorder point,
+    so stock at or below it is reordered even without demand history.
+    """
+    on_hand = np.asarray(on_hand, dtype=np.float64)
+    lead_time = np.maximum(np.asarray(lead_time_days, dtype=np.float64), 0)
+    rate = daily_demand_rate(demand, settings)
+    sigma = demand.std(axis=1) if demand.shape[1] else np.zeros(demand.shape[0])
+    z = NormalDist().inv_cdf(settings.service_level)
+
+    safety_stock = z * sigma * np.sqrt(lead_time)
+    reorder_point = rate * lead_time + safety_stock
+    order_up_to = rate * (lead_time + settings.horizon_days) + safety_stock
+    quantity = np.ceil(np.maximum(order_up_to - on_hand, 0) - 1e-9)
+    if min_reorder_point is not None:
+        floor = np.asarray(min_reorder_point, dtype=np.float64)
+        reorder_point = np.maximum(reorder_point, floor)
+        due = (floor > 0) & (on_hand <= floor)
+        quantity = np.where(due, np.maximum(quantity, np.maximum(floor - on_hand, 1)), quantity)
+    if min_order is not None:
+        quantity = np.where(quantity > 0, np.maximum(quantity, np.asarray(min_order, dtype=np.float64)), 0)
+    with np.errstate(divide="ignore"):
+        days_of_cover = np.where(rate > 0, np.maximum(on_hand, 0) / np.where(rate > 0, rate, 1), np.inf)
+    return {
+        "recent_demand": demand[:, -settings.window:].sum(axis=1),
+        "daily_demand": rate,
+        "demand_std": sigma,
+        "safety_stock": safety_stock,
+        "reorder_point": reorder_point,
+        "order_up_to": order_up_to,
+        "reorder_quantity": quantity.astype(np.int64),
+        "days_of_cover": days_of_cover,
+    }
+
+
+def forecast_rows(product_ids: Sequence[int], result: Dict[str, "np.ndarray"]) -> List[dict]:
+    """Per-product dicts of plain Python values (rounded) from a `forecast` result."""
+    columns = {name: values.tolist() for name, values in result.items()}
+    rows = []
+    for i, product_id in enumerate(product_ids):
+        cover = columns["days_of_cover"][i]
+        rows.append({
+            "product_id": product_id,
+            "recent_demand": int(round(columns["recent_demand"][i])),
+            "daily_demand": round(columns["daily_demand"][i], 3),
+            "demand_std": round(columns["demand_std"][i], 3),
+            "safety_stock": math.ceil(columns["safety_stock"][i] - 1e-9),
+            "reorder_point": math.ceil(columns["reorder_point"][i] - 1e-9),
+            "reorder_quantity": int(columns["reorder_quantity"][i]),
+            "days_of_cover": None if math.isinf(cover) else round(cover, 1),
+        })
+    return rows
@@ -0,0 +1,239 @@
+"""
+In-memory inverted index over the products table for /ask_inventory.
+
+The index is built once at startup and kept current by the product write
+endpoints, so answering a question only touches the postings of matching
+tokens instead of loading and rescanning every product row.
+
+Each worker process holds its own index. Writes handled by another worker
+are picked up by re-reading the products changed since the last sync (by
+`updated_at`, see `main.sync_search_index`); `synced_through` and
+`sync_due` keep the watermark and throttle for that.
+
+Scoring is the same keyword/synonym scheme /ask_inventory has always used:
+per search term, +10 for a name match (else +5 SKU, +6 description,
++2 category), +8 per name word that overlaps the term and +4 per
+description word (longer than 3 chars) that overlaps it.
+"""
+
+import re
+import time
+from collections import defaultdict
+from datetime import datetime
+from threading import RLock
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Words that carry no product meaning in inventory questions
+COMMON_WORDS = {
+    'do', 'we', 'have', 'any', 'is', 'are', 'there', 'what', 'which', 'how', 'many', 'much',
+    'the', 'a', 'an', 'of', 'in', 'on', 'at', 'to', 'for', 'with', 'by', 'show', 'me', 'get',
+    'find', 'list', 'tell', 'give', 'available', 'products', 'items', 'stock', 'inventory'
+}
+
+# Synonym mapping for common product types
+SYNONYMS = {
+    'laptop': ['macbook', 'notebook', 'computer', 'programming'],
+    'laptops': ['macbook', 'macbooks', 'notebooks', 'computers'],
+    'phone': ['smartphone', 'mobile', 'iphone', 'android'],
+    'tablet': ['ipad'],
+    'headphones': ['earphones', 'earbuds', 'headset'],
+    'watch': ['smartwatch'],
+    'computer': ['pc', 'desktop', 'laptop', 'macbook', 'programming'],
+    'computers': ['pcs', 'desktops', 'laptops', 'macbooks']
+}
+
+# Fields indexed for substring matching, in scoring priority order
+_FIELDS = ("name", "sku", "description", "category")
+_FIELD_SCORES = {"name": 10, "sku": 5, "description": 6, "category": 2}
+_NAME_WORD_SCORE = 8
+_DESCRIPTION_WORD_SCORE = 4
+
+
+def extract_search_terms(question: str) -> List[str]:
+    """Extract search terms from a question, adding plural/singular variants and synonyms."""
+    question_words = re.findall(r'\b\w+\b', question.lower())
+    search_terms = []
+
+    for word in question_words:
+        if len(word) > 2 and word not in COMMON_WORDS:
+            search_terms.append(word)
+            # Add singular/plural variations
+            if word.endswith('s') and len(word) > 3:
+                singular = word[:-1]
+                if singular not in search_terms:
+                    search_terms.append(singular)
+            elif not word.endswith('s'):
+                plural = word + 's'
+                if plural not in search_terms:
+                    search_terms.append(plural)
+
+            # Add synonyms
+            if word in SYNONYMS:
+                for synonym in SYNONYMS[word]:
+                    if synonym not in search_terms:
+                        search_terms.append(synonym)
+
+    return search_terms
+
+
+class InventorySearchIndex:
+    """
+    Token -> product postings for the searchable product fields.
+
+    Tokens are whitespace-separated lowercase words. Search terms never
+    contain whitespace, so "term is a substring of the field" is exactly
+    "term is a substring of one of the field's tokens", which lets matching
+    scan the (small) vocabulary instead of every product.
+    """
+
+    def __init__(self):
+        self._lock = RLock()
+        self._docs: Dict[int, Dict[str, str]] = {}
+        self._postings: Dict[str, Dict[str, Dict[int, int]]] = {
+            field: defaultdict(dict) for field in _FIELDS
+        }
+        self._match_cache: Dict[Tuple[str, str, bool], List[str]] = {}
+        self.ready = False
+        # Latest product updated_at applied to the index, and when the table was last checked for newer rows
+        self.synced_through: Optional[datetime] = None
+        self._checked_at = float("-inf")
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    # ---- Maintenance ----
+
+    def upsert(self, product_id: int, name: str, sku: str,
+               description: Optional[str], category: Optional[str]) -> None:
+        """Add or replace a product's entry."""
+        doc = {
+            "name": (name or "").lower(),
+            "sku": (sku or "").lower(),
+            "description": (description or "").lower(),
+            "category": (category or "").lower(),
+        }
+        with self._lock:
+            if self._docs.get(product_id) == doc:
+                return
+            self._remove_postings(product_id)
+            self._docs[product_id] = doc
+            for field in _FIELDS:
+                postings = self._postings[field]
+                for token in doc[field].split():
+                    if token not in postings:
+                        self._match_cache.clear()
+                    counts = postings[token]
+                    counts[product_id] = counts.get(product_id, 0) + 1
+
+    def remove(self, product_id: int) -> None:
+        """Drop a product from the index (no-op if absent)."""
+        with self._lock:
+            self._remove_postings(product_id)
+            self._docs.pop(product_id, None)
+
+    def rebuild(self, rows: Iterable[Tuple[int, str, str, Optional[str], Optional[str]]],
+                synced_through: Optional[datetime] = None) -> None:
+        """
+        Replace the index contents with (id, name, sku, description, category) rows.
+        `synced_through` is the latest updated_at the rows are known to include.
+        """
+        with self._lock:
+            self._docs.clear()
+            for field in _FIELDS:
+                self._postings[field].clear()
+            self._match_cache.clear()
+            for row in rows:
+                self.upsert(*row)
+            self.synced_through = synced_through
+            self._checked_at = time.monotonic()
+            self.ready = True
+
+    def sync_due(self, interval: float) -> bool:
+        """
+        True, at most once per `interval` seconds, when the products table should be
+        checked for rows changed after `synced_through`.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not self.ready or now - self._checked_at < interval:
+                return False
+            self._checked_at = now
+            return True
+
+    def advance(self, updated_at: Optional[datetime]) -> None:
+        """Move `synced_through` forward to `updated_at` (never backwards)."""
+        with self._lock:
+            if updated_at is not None and (self.synced_through is None or updated_at > self.synced_through):
+                self.synced_through = updated_at
+
+    def _remove_postings(self, product_id: int) -> None:
+        doc = self._docs.get(product_id)
+        if doc is None:
+            return
+        for field in _FIELDS:
+            postings = self._postings[field]
+            for token in set(doc[field].split()):
+                counts = postings.get(token)
+                if counts is None:
+                    continue
+                counts.pop(product_id, None)
+                if not counts:
+                    del postings[token]
+                    self._match_cache.clear()
+
+    # ---- Querying ----
+
+    def _matching_tokens(self, field: str, term: str, overlap: bool) -> List[str]:
+        """Vocabulary tokens containing `term` (or, with overlap, contained in it)."""
+        key = (field, term, overlap)
+        tokens = self._match_cache.get(key)
+        if tokens is None:
+            if overlap:
+                tokens = [t for t in self._postings[field] if term in t or t in term]
+            else:
+                tokens = [t for t in self._postings[field] if term in t]
+            self._match_cache[key] = tokens
+        return tokens
+
+    def matching_ids(self, term: str) -> Set[int]:
+        """Ids of products with `term` as a substring of any indexed field."""
+        term = term.lower()
+        ids: Set[int] = set()
+        with self._lock:
+            for field in _FIELDS:
+                for token in self._matching_tokens(field, term, overlap=False):
+                    ids.update(self._postings[field][token])
+        return ids
+
+    def search(self, terms: List[str], limit: int = 5) -> List[Tuple[int, int]]:
+        """Return up to `limit` (score, product_id) pairs, best first, ties by id."""
+        scores: Dict[int, int] = defaultdict(int)
+        with self._lock:
+            for term in terms:
+                # One field-match bonus per product, by field priority
+                candidates: Set[int] = set()
+                for field in _FIELDS:
+                    for token in self._matching_tokens(field, term, overlap=False):
+                        candidates.update(self._postings[field][token])
+                for product_id in candidates:
+                    doc = self._docs[product_id]
+                    for field in _FIELDS:
+                        if term in doc[field]:
+                            scores[product_id] += _FIELD_SCORES[field]
+                            break
+
+                # Partial matches against individual name/description words
+                for token in self._matching_tokens("name", term, overlap=True):
+                    for product_id, count in self._postings["name"][token].items():
+                        scores[product_id] += _NAME_WORD_SCORE * count
+                for token in self._matching_tokens("description", term, overlap=True):
+                    if len(token) <= 3:
+                        continue
+                    for product_id, count in self._postings["description"][token].items():
+                        scores[product_id] += _DESCRIPTION_WORD_SCORE * count
+
+        ranked = sorted(
+            ((score, product_id) for product_id, score in scores.items() if score > 0),
+            key=lambda item: (-item[0], item[1])
+        )
+        return ranked[:limit]
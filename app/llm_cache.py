@@ -0,0 +1,302 @@
+"""
+Response cache for LLM completions.
+
+Keys are derived from (model, provider, temperature, normalized prompt),
+so the same request phrased with different whitespace is answered once.
+Entries live in an in-process LRU tier bounded by entry count and TTL,
+and optionally in an SQLite file that survives restarts (and can be
+shared by workers on one host); a disk hit is promoted into memory.
+
+Entries can carry tags such as "product:42"; `invalidate_tags` drops
+every entry built from a changed object. A put made with a generation
+taken before one of its own tags was invalidated is discarded, so an
+answer computed from stale data is never stored after the data changed,
+while writes to unrelated objects leave it alone. Disk rows for
+invalidated tags are deleted by a background thread on its own
+connection, so a write request never waits on another worker's lock;
+until then they are treated as misses.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse runs of whitespace and trim, so formatting-only differences share a key."""
+    return _WHITESPACE.sub(" ", prompt).strip()
+
+
+def cache_key(model_name: str, api_provider: str, temperature: float, prompt: str) -> str:
+    payload = json.dumps([model_name, api_provider, round(float(temperature), 3), normalize_prompt(prompt)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Two-tier (memory LRU, optional SQLite) cache of completion text.
+
+    `max_entries=0` disables caching entirely. `ttl` is the default
+    lifetime in seconds; `put` can override it per entry.
+
+    Each invalidation advances `generation` and records it against the
+    invalidated tags. Only the most recent `max_invalidated_tags` tags are
+    remembered; puts with a generation older than the oldest forgotten
+    record are discarded, since they may have missed it.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600.0, path: Optional[str] = None,
+                 max_disk_entries: int = 100_000, max_invalidated_tags: int = 10_000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.max_disk_entries = max_disk_entries
+        # key -> (expires_at, value, tags), least recently used first
+        self._entries: "OrderedDict[str, Tuple[float, str, Tuple[str, ...]]]" = OrderedDict()
+        self._keys_by_tag: Dict[str, Set[str]] = {}
+        self._lock = Lock()
+        self.generation = 0
+        # tag -> generation of its latest invalidation, least recently invalidated first
+        self._invalidated: "OrderedDict[str, int]" = OrderedDict()
+        self.max_invalidated_tags = max_invalidated_tags
+        # Puts older than this may have missed a forgotten invalidation (or a clear)
+        self._stale_before = 0
+        self._stats = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "puts": 0,
+                       "evictions": 0, "expirations": 0, "invalidations": 0, "discarded": 0}
+        self._disk: Optional[sqlite3.Connection] = None
+        # Disk invalidations waiting for the background thread: tag -> generation
+        self._pending_disk_tags: Dict[str, int] = {}
+        self._disk_invalidator: Optional[sqlite3.Connection] = None
+        self._invalidation_thread: Optional[ThreadPoolExecutor] = None
+        self._flush_scheduled = False
+        if path and max_entries > 0:
+            self._open_disk(path)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _open_disk(self, path: str) -> None:
+        try:
+            disk = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+            disk.execute("PRAGMA journal_mode=WAL")
+            disk.execute("CREATE TABLE IF NOT EXISTS llm_cache ("
+                         "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, tags TEXT NOT NULL)")
+            disk.execute("CREATE TABLE IF NOT EXISTS llm_cache_tags (tag TEXT NOT NULL, key TEXT NOT NULL, "
+                         "PRIMARY KEY (tag, key))")
+            disk.execute("DELETE FROM llm_cache WHERE expires_at < ?", (time.time(),))
+            disk.execute("DELETE FROM llm_cache_tags WHERE key NOT IN (SELECT key FROM llm_cache)")
+            self._disk = disk
+            self._disk_invalidator = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+            self._invalidation_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-cache-invalidate")
+        except sqlite3.Error as e:
+            logger.error(f"LLM cache disk tier disabled ({path}): {e}")
+
+    # ---- memory tier (callers hold the lock) ----
+
+    def _forget(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+    def _remember(self, key: str, expires_at: float, value: str, tags: Tuple[str, ...]) -> None:
+        self._forget(key)
+        self._entries[key] = (expires_at, value, tags)
+        for tag in tags:
+            self._keys_by_tag.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._forget(next(iter(self._entries)))
+            self._stats["evictions"] += 1
+
+    def _is_stale(self, generation: int, tags: Tuple[str, ...]) -> bool:
+        if generation < self._stale_before:
+            return True
+        return any(self._invalidated.get(tag, 0) > generation for tag in tags)
+
+    # ---- public API ----
+
+    def get(self, key: str) -> Optional[str]:
+        """The cached completion for `key`, or None (counted as a miss)."""
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] >= now:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    self._stats["memory_hits"] += 1
+                    return entry[1]
+                self._forget(key)
+                self._stats["expirations"] += 1
+            if self._disk is not None:
+                try:
+                    row = self._disk.execute(
+                        "SELECT value, expires_at, tags FROM llm_cache WHERE key = ? AND expires_at >= ?", (key, now)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    logger.warning(f"LLM cache disk read failed: {e}")
+                    row = None
+                if row is not None and self._pending_disk_tags.keys().isdisjoint(json.loads(row[2])):
+                    value, expires_at, tags = row
+                    self._remember(key, expires_at, value, tuple(json.loads(tags)))
+                    self._stats["hits"] += 1
+                    self._stats["disk_hits"] += 1
+                    return value
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, key: str, value: str, tags: Iterable[str] = (), ttl: Optional[float] = None,
+            generation: Optional[int] = None) -> bool:
+        """
+        Store `value`; returns False if it was discarded.
+
+        Pass the `generation` read before computing the value: if any of
+        its `tags` were invalidated since, the value may be stale and is
+        not stored.
+        """
+        if not self.enabled:
+            return False
+        tags = tuple(sorted(set(tags)))
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if generation is not None and self._is_stale(generation, tags):
+                self._stats["discarded"] += 1
+                return False
+            self._remember(key, expires_at, value, tags)
+            self._stats["puts"] += 1
+            if self._disk is not None:
+                try:
+                    self._disk.execute("BEGIN")
+                    self._disk.execute("INSERT OR REPLACE INTO llm_cache (key, value, expires_at, tags) "
+                                       "VALUES (?, ?, ?, ?)", (key, value, expires_at, json.dumps(tags)))
+                    self._disk.execute("DELETE FROM llm_cache_tags WHERE key = ?", (key,))
+                    self._disk.executemany("INSERT INTO llm_cache_tags (tag, key) VALUES (?, ?)",
+                                           [(tag, key) for tag in tags])
+                    if self._stats["puts"] % 1000 == 0:
+                        self._prune_disk()
+                    self._disk.execute("COMMIT")
+                except sqlite3.Error as e:
+                    self._disk.execute("ROLLBACK")
+                    logger.warning(f"LLM cache disk write failed: {e}")
+        return True
+
+    def _prune_disk(self) -> None:
+        self._disk.execute("DELETE FROM llm_cache WHERE expires_at < ?", (time.time(),))
+        self._disk.execute(
+            "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY expires_at DESC "
+            "LIMIT -1 OFFSET ?)", (self.max_disk_entries,)
+        )
+        self._disk.execute("DELETE FROM llm_cache_tags WHERE key NOT IN (SELECT key FROM llm_cache)")
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """Drop every entry carrying any of `tags`; returns how many memory entries were dropped."""
+        tags = set(tags)
+        if not tags or not self.enabled:
+            return 0
+        with self._lock:
+            self.generation += 1
+            for tag in tags:
+                self._invalidated.pop(tag, None)
+                self._invalidated[tag] = self.generation
+            while len(self._invalidated) > self.max_invalidated_tags:
+                _, forgotten = self._invalidated.popitem(last=False)
+                self._stale_before = max(self._stale_before, forgotten)
+            keys = set().union(*(self._keys_by_tag.get(tag, ()) for tag in tags))
+            for key in keys:
+                self._forget(key)
+            self._stats["invalidations"] += len(keys)
+            if self._invalidation_thread is not None:
+                self._pending_disk_tags.update((tag, self.generation) for tag in tags)
+                if not self._flush_scheduled:
+                    self._flush_scheduled = True
+                    self._invalidation_thread.submit(self._flush_disk_invalidations)
+            return len(keys)
+
+    def _flush_disk_invalidations(self) -> None:
+        """Delete disk rows for pending tags (runs on the invalidation thread, outside the cache lock)."""
+        while True:
+            with self._lock:
+                pending = dict(self._pending_disk_tags)
+                if not pending:
+                    self._flush_scheduled = False
+                    return
+            tags = tuple(pending)
+            disk = self._disk_invalidator
+            try:
+                for start in range(0, len(tags), 500):
+                    chunk = tags[start:start + 500]
+                    placeholders = ", ".join("?" * len(chunk))
+                    disk.execute("BEGIN IMMEDIATE")
+                    disk.execute(f"DELETE FROM llm_cache WHERE key IN "
+                                 f"(SELECT key FROM llm_cache_tags WHERE tag IN ({placeholders}))", chunk)
+                    disk.execute(f"DELETE FROM llm_cache_tags WHERE tag IN ({placeholders})", chunk)
+                    disk.execute("COMMIT")
+            except sqlite3.Error as e:
+                if disk.in_transaction:
+                    disk.execute("ROLLBACK")
+                logger.warning(f"LLM cache disk invalidation failed: {e}")
+                with self._lock:
+                    # Still pending (so still misses); the next invalidation retries them
+                    self._flush_scheduled = False
+                return
+            with self._lock:
+                # Tags invalidated again meanwhile stay pending for another pass
+                for tag, generation in pending.items():
+                    if self._pending_disk_tags.get(tag) == generation:
+                        del self._pending_disk_tags[tag]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._invalidated.clear()
+            self._stale_before = self.generation
+            self._entries.clear()
+            self._keys_by_tag.clear()
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM llm_cache")
+                self._disk.execute("DELETE FROM llm_cache_tags")
+
+    def metrics(self) -> dict:
+        """Hit/miss counters, hit rate and current sizes."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            if self._disk is not None:
+                try:
+                    stats["disk_entries"] = self._disk.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+                except sqlite3.Error:
+                    stats["disk_entries"] = None
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else None
+        stats.update(enabled=self.enabled, max_entries=self.max_entries, ttl=self.ttl, disk=bool(self.path))
+        return stats
+
+    def close(self) -> None:
+        """Finish queued disk invalidations and close the disk tier."""
+        if self._invalidation_thread is not None:
+            self._invalidation_thread.shutdown(wait=True)
+            self._invalidation_thread = None
+            self._disk_invalidator.close()
+            self._disk_invalidator = None
+        if self._disk is not None:
+            self._disk.close()
+            self._disk = None
@@ -1,24 +1,60 @@
-from fastapi import FastAPI, HTTPException, status, Depends
+from fastapi import FastAPI, HTTPException, status, Depends, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field, EmailStr, validator
-from typing import Optional, List
-from datetime import datetime
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, EmailStr, ValidationError, validator
+from typing import Optional, List, Tuple
+from collections import defaultdict
+from datetime import datetime, timedelta
 from threading import Lock
+import asyncio
+import io
 import logging
 import os
 import json
 import sys
 from pathlib import Path
 from sqlalchemy import (
-    Column, Integer, String, Text, DateTime, ForeignKey, UniqueConstraint,
-    create_engine
+    Column, Integer, String, Text, DateTime, ForeignKey, UniqueConstraint, Index,
+    select, insert, update, delete, and_, or_, case, false, tuple_, text
 )
-from sqlalchemy.orm import declarative_base, relationship, sessionmaker, Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import declarative_base, relationship, Session
 from sqlalchemy.sql import func
 
-# Add parent directory to path to import utils
+try:
+    from dotenv import find_dotenv, load_dotenv
+except ImportError:  # python-dotenv is optional; settings then come from the process environment only
+    load_dotenv = None
+
+# Settings are read from the environment at import time, here and in the modules imported below
+# (database, utils, ...), so .env is loaded first. Variables already set in the environment win.
+if load_dotenv is not None:
+    load_dotenv(find_dotenv(usecwd=True) or Path(__file__).resolve().parent.parent / ".env")
+
+# Add parent directory to path to import utils, and this directory for sibling modules
 sys.path.append(str(Path(__file__).parent.parent))
-from utils import setup_llm_client, get_completion, clean_llm_output
+sys.path.append(str(Path(__file__).parent))
+from inventory_search import InventorySearchIndex, extract_search_terms, COMMON_WORDS
+from database import DatabaseSettings, create_db_engine, create_executor
+from migrations import run_migrations
+from catalog_import import AsyncChunkReader, ImportEntity, detect_format, format_validation_error, import_stream
+from exporting import EXPORT_MEDIA_TYPES, encode_rows, parquet_available
+from stock_totals import (DECREASING_MOVEMENT_TYPES, LevelChange, rebuild_stock_totals, total_deltas,
+                          verify_stock_totals)
+from reorder_alerts import ReorderAlertEngine
+from llm_cache import LLMResponseCache, cache_key
+from product_cache import ProductCache
+from single_flight import SingleFlight
+from serialization import JSONRowsResponse, iter_json_array
+from conditional import etag_matches, not_modified, validator_headers, weak_etag
+from pagination import CountCache, InvalidCursor, decode_cursor, encode_cursor
+from forecasting import ForecastSettings, demand_matrix, forecast, forecast_rows, forecasting_available
+from embeddings import HashingEncoder, TfidfEncoder, VectorStore, embeddings_available, fuse_rankings
+from utils import llm_registry, get_completion_async, stream_completion_async, clean_llm_output
+
+# Model used by the AI endpoints; its client is built once at startup
+LLM_MODEL_NAME = os.getenv("LLM_MODEL_NAME", "gpt-4o")
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -38,24 +74,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "ETag"],
 )
 
 # ---- Database Configuration ----
-SQLALCHEMY_DATABASE_URL = "sqlite:///./inventory.db"
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False}
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# URL, pool size and SQLite pragmas come from the environment (see database.py)
+db_settings = DatabaseSettings.from_env()
+SQLALCHEMY_DATABASE_URL = db_settings.url
+engine = create_db_engine(db_settings)
+# Threads for blocking work offloaded with asyncio.to_thread; installed as the loop's default executor on startup
+db_executor = create_executor(db_settings)
+# expire_on_commit=False: handlers read attributes after commit without lazy-loading
+SessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
-def get_db():
-    """FastAPI dependency that provides a SQLAlchemy session."""
-    db: Session = SessionLocal()
-    try:
+async def get_db():
+    """FastAPI dependency that provides an async SQLAlchemy session."""
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+def get_session_factory():
+    """FastAPI dependency for endpoints that open their own sessions (e.g. inside streaming responses)."""
+    return SessionLocal
 
 # ---- SQLAlchemy Models ----
 
@@ -110,6 +150,13 @@ class Supplier(Base):
 class Product(Base):
     """Represents an inventory product."""
     __tablename__ = 'products'
+    __table_args__ = (
+        Index('ix_products_category_is_active', 'category', 'is_active'),
+        Index('ix_products_category_id', 'category', 'id'),
+        Index('ix_products_price_id', 'price', 'id'),
+        Index('ix_products_stock_id', 'stock', 'id'),
+        Index('ix_products_updated_at', 'updated_at'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     sku = Column(String, nullable=False, unique=True)
@@ -125,6 +172,8 @@ class Product(Base):
     lead_time_days = Column(Integer, default=0, server_default="0")
     is_active = Column(Integer, nullable=False, default=1, server_default="1")
     created_at = Column(DateTime, nullable=False, server_default=func.current_timestamp())
+    # Set by the application on every write (microsecond resolution; ETags are derived from it)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
     supplier = relationship("Supplier", back_populates="products")
@@ -137,6 +186,7 @@ class InventoryLevel(Base):
     __tablename__ = 'inventory_levels'
     __table_args__ = (
         UniqueConstraint('product_id', 'warehouse_id', name='uix_product_warehouse'),
+        Index('ix_inventory_levels_warehouse_id', 'warehouse_id'),
     )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -152,6 +202,11 @@ class InventoryLevel(Base):
 class StockMovement(Base):
     """Logs inbound/outbound/adjustment stock movements."""
     __tablename__ = 'stock_movements'
+    __table_args__ = (
+        Index('ix_stock_movements_product_warehouse_created', 'product_id', 'warehouse_id', 'created_at'),
+        Index('ix_stock_movements_created', 'created_at'),
+        Index('ix_stock_movements_warehouse_created', 'warehouse_id', 'created_at'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     product_id = Column(Integer, ForeignKey('products.id'), nullable=False)
@@ -171,6 +226,12 @@ class StockMovement(Base):
 class ReorderAlert(Base):
     """Tracks reorder alerts for products in warehouses."""
     __tablename__ = 'reorder_alerts'
+    __table_args__ = (
+        Index('ix_reorder_alerts_is_resolved', 'is_resolved'),
+        # At most one open alert per product and warehouse (see reorder_alerts.py)
+        Index('uix_reorder_alerts_open', 'product_id', 'warehouse_id', unique=True,
+              sqlite_where=text('is_resolved = 0'), postgresql_where=text('is_resolved = 0')),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     product_id = Column(Integer, ForeignKey('products.id'), nullable=False)
@@ -184,6 +245,32 @@ class ReorderAlert(Base):
     product = relationship("Product", back_populates="reorder_alerts")
     warehouse = relationship("Warehouse", back_populates="reorder_alerts")
 
+class ProductStockTotal(Base):
+    """On-hand units of a product across all warehouses (maintained incrementally, see stock_totals.py)."""
+    __tablename__ = 'product_stock_totals'
+
+    product_id = Column(Integer, ForeignKey('products.id'), primary_key=True)
+    quantity = Column(Integer, nullable=False, default=0, server_default="0")
+    warehouses_in_stock = Column(Integer, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime, nullable=False, server_default=func.current_timestamp())
+
+class CatalogVersion(Base):
+    """Single row of catalog counters: every product write bumps `revision` in its transaction (see catalog_etag)."""
+    __tablename__ = 'catalog_version'
+
+    id = Column(Integer, primary_key=True)
+    products_deleted = Column(Integer, nullable=False, default=0, server_default="0")
+    revision = Column(Integer, nullable=False, default=0, server_default="0")
+
+class WarehouseStockTotal(Base):
+    """On-hand units across all products in a warehouse (maintained incrementally, see stock_totals.py)."""
+    __tablename__ = 'warehouse_stock_totals'
+
+    warehouse_id = Column(Integer, ForeignKey('warehouses.id'), primary_key=True)
+    quantity = Column(Integer, nullable=False, default=0, server_default="0")
+    products_in_stock = Column(Integer, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime, nullable=False, server_default=func.current_timestamp())
+
 # ---- Pydantic Models ----
 
 class UserRole:
@@ -197,13 +284,32 @@ class UserRole:
         return [cls.WAREHOUSE_WORKER, cls.INVENTORY_MANAGER, cls.PROCUREMENT_OFFICER]
 
 class MovementType:
-    """Constants for stock movement types."""
+    """
+    Constants for stock movement types.
+
+    Ledger rows store the type in lowercase. INBOUND adds `quantity`,
+    OUTBOUND and DAMAGED subtract it; ADJUSTMENT and TRANSFER rows carry a
+    signed quantity (a transfer is a negative row at the source warehouse
+    and a positive row at the destination).
+    """
     INBOUND = "INBOUND"
     OUTBOUND = "OUTBOUND"
     ADJUSTMENT = "ADJUSTMENT"
     TRANSFER = "TRANSFER"
     DAMAGED = "DAMAGED"
 
+    # Ledger spellings that subtract stock ("damage" appears in older data)
+    DECREASING = DECREASING_MOVEMENT_TYPES
+
+    @classmethod
+    def all_types(cls):
+        return [cls.INBOUND, cls.OUTBOUND, cls.ADJUSTMENT, cls.TRANSFER, cls.DAMAGED]
+
+    @classmethod
+    def delta(cls, movement_type: str, quantity: int) -> int:
+        """Signed change in on-hand stock for a ledger row."""
+        return -quantity if movement_type.lower() in cls.DECREASING else quantity
+
 class ProductBase(BaseModel):
     """Base product model with common fields."""
     sku: str = Field(..., example="SKU12345", description="Stock Keeping Unit")
@@ -242,6 +348,7 @@ class ProductResponse(ProductBase):
     """Model for product responses."""
     id: int
     created_at: datetime
+    updated_at: Optional[datetime] = None
     
     @classmethod
     def from_orm(cls, obj):
@@ -260,13 +367,203 @@ class ProductResponse(ProductBase):
             'reorder_quantity': obj.reorder_quantity,
             'lead_time_days': obj.lead_time_days,
             'is_active': bool(obj.is_active),
-            'created_at': obj.created_at
+            'created_at': obj.created_at,
+            'updated_at': obj.updated_at
         }
         return cls(**obj_dict)
 
     class Config:
         from_attributes = True
 
+# Fields that GET /products/?fields= may project, in response order
+PRODUCT_FIELDS = (
+    'id', 'sku', 'name', 'description', 'barcode', 'category', 'price', 'stock', 'supplier_id',
+    'reorder_point', 'reorder_quantity', 'lead_time_days', 'is_active', 'created_at', 'updated_at'
+)
+
+def parse_product_fields(fields: Optional[str]) -> List[str]:
+    """Parse a comma-separated `fields` parameter; id is always included."""
+    if not fields:
+        return list(PRODUCT_FIELDS)
+    requested = [f.strip() for f in fields.split(',') if f.strip()]
+    unknown = [f for f in requested if f not in PRODUCT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Choose from: {', '.join(PRODUCT_FIELDS)}")
+    return [f for f in PRODUCT_FIELDS if f == 'id' or f in requested]
+
+def product_row_to_dict(row) -> dict:
+    """Convert a projected product row mapping to API form (price in dollars, bool is_active)."""
+    data = dict(row)
+    if 'price' in data:
+        data['price'] = (data['price'] or 0) / 100.0
+    if 'is_active' in data:
+        data['is_active'] = bool(data['is_active'])
+    return data
+
+class ProductBulkUpdate(ProductUpdate):
+    """One row of a PUT /products/bulk request: the product id plus the fields to change."""
+    id: int
+
+class BulkRowError(BaseModel):
+    """A rejected row in a bulk request, by its 0-based position in the payload."""
+    index: int
+    sku: Optional[str] = None
+    error: str
+
+class BulkProductResult(BaseModel):
+    """Outcome of a bulk product request."""
+    created: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: List[BulkRowError] = []
+
+# Largest batch accepted by POST /products/lookup, in codes
+PRODUCT_LOOKUP_MAX = 1000
+# Keys a scanned code can be matched against, in the order they are tried
+PRODUCT_LOOKUP_KINDS = {"any": ("barcode", "sku"), "barcode": ("barcode",), "sku": ("sku",)}
+
+class ProductLookupRequest(BaseModel):
+    """Codes read by a scanner, resolved in one request."""
+    codes: List[str] = Field(..., min_items=1, max_items=PRODUCT_LOOKUP_MAX, example=["0012345678905", "MUG-WHT-12"])
+    by: str = Field("any", description="Match codes against 'barcode', 'sku' or 'any' (barcode first)")
+
+    @validator('by')
+    def validate_by(cls, v):
+        if v not in PRODUCT_LOOKUP_KINDS:
+            raise ValueError(f"by must be one of: {', '.join(PRODUCT_LOOKUP_KINDS)}")
+        return v
+
+# Product fields returned to scanners, on top of the code that matched
+SCANNED_PRODUCT_FIELDS = ('id', 'sku', 'barcode', 'name', 'price', 'stock', 'is_active')
+
+class ScannedProduct(BaseModel):
+    """Compact product row for scanner clients (price in dollars)."""
+    code: str
+    id: int
+    sku: str
+    barcode: Optional[str] = None
+    name: str
+    price: float
+    stock: int
+    is_active: bool
+
+class ProductLookupResult(BaseModel):
+    """Products found for a batch of codes, in request order, and the codes that matched nothing."""
+    found: List[ScannedProduct] = []
+    missing: List[str] = []
+
+class SupplierCreate(BaseModel):
+    """Model for creating a supplier."""
+    name: str = Field(..., example="Acme Distribution")
+    contact_name: Optional[str] = Field(None, example="Jane Smith")
+    phone: Optional[str] = Field(None, example="555-0100")
+    email: Optional[str] = Field(None, example="orders@acme.example")
+    address: Optional[str] = None
+    is_active: Optional[bool] = Field(True, example=True)
+
+class InventoryLevelSet(BaseModel):
+    """Sets a product's on-hand quantity in a warehouse; the product is given by id or SKU."""
+    product_id: Optional[int] = Field(None, example=1)
+    sku: Optional[str] = Field(None, example="SKU12345")
+    warehouse_id: int = Field(..., example=1)
+    quantity: int = Field(..., example=120, ge=0)
+
+class StockMovementCreate(BaseModel):
+    """Model for recording a stock movement."""
+    product_id: int = Field(..., example=1)
+    warehouse_id: int = Field(..., example=1, description="Warehouse the stock moves in or out of (source for transfers)")
+    movement_type: str = Field(..., example="INBOUND", description="INBOUND, OUTBOUND, ADJUSTMENT, TRANSFER or DAMAGED")
+    quantity: int = Field(..., example=10, description="Units moved; signed for ADJUSTMENT, positive otherwise")
+    to_warehouse_id: Optional[int] = Field(None, example=2, description="Destination warehouse (TRANSFER only)")
+    user_id: Optional[int] = None
+    reason: Optional[str] = Field(None, example="receiving")
+    reference_number: Optional[str] = Field(None, example="PO-1001")
+
+    @validator('movement_type')
+    def validate_movement_type(cls, v):
+        v = v.upper()
+        if v == "DAMAGE":
+            v = MovementType.DAMAGED
+        if v not in MovementType.all_types():
+            raise ValueError(f"Movement type must be one of: {', '.join(MovementType.all_types())}")
+        return v
+
+    @validator('quantity')
+    def validate_quantity(cls, v, values):
+        if values.get('movement_type') == MovementType.ADJUSTMENT:
+            if v == 0:
+                raise ValueError("Adjustment quantity must be non-zero")
+        elif v <= 0:
+            raise ValueError("Quantity must be positive")
+        return v
+
+    @validator('to_warehouse_id', always=True)
+    def validate_to_warehouse(cls, v, values):
+        if values.get('movement_type') == MovementType.TRANSFER:
+            if v is None:
+                raise ValueError("to_warehouse_id is required for transfers")
+            if v == values.get('warehouse_id'):
+                raise ValueError("to_warehouse_id must differ from warehouse_id")
+        elif v is not None:
+            raise ValueError("to_warehouse_id is only allowed for transfers")
+        return v
+
+class StockMovementResponse(BaseModel):
+    """A stock ledger row."""
+    id: int
+    product_id: int
+    warehouse_id: int
+    user_id: Optional[int] = None
+    movement_type: str
+    quantity: int
+    reason: Optional[str] = None
+    reference_number: Optional[str] = None
+    created_at: datetime
+
+class InventoryLevelResponse(BaseModel):
+    """On-hand quantity of a product in a warehouse."""
+    product_id: int
+    warehouse_id: int
+    quantity: int
+
+class StockMovementResult(BaseModel):
+    """Ledger rows written by a movement request and the resulting inventory levels."""
+    movements: List[StockMovementResponse]
+    levels: List[InventoryLevelResponse]
+
+class ProductStockTotalResponse(BaseModel):
+    """Units of a product on hand across all warehouses."""
+    product_id: int
+    quantity: int
+    warehouses_in_stock: int
+    updated_at: datetime
+
+class WarehouseStockTotalResponse(BaseModel):
+    """Units on hand across all products in a warehouse."""
+    warehouse_id: int
+    quantity: int
+    products_in_stock: int
+    updated_at: datetime
+
+class StockMovementBatch(BaseModel):
+    """Movements applied together: all of them or none."""
+    movements: List[StockMovementCreate] = Field(..., min_items=1, max_items=5000)
+
+class ReorderAlertResponse(BaseModel):
+    """A reorder alert with the product and the level that triggered it."""
+    id: int
+    product_id: int
+    sku: str
+    product_name: str
+    warehouse_id: int
+    warehouse_name: str
+    quantity: int
+    reorder_point: int
+    suggested_quantity: int
+    triggered_at: datetime
+    is_resolved: bool
+    resolved_at: Optional[datetime] = None
+
 class UserBase(BaseModel):
     """Base user model."""
     username: str = Field(..., example="jdoe")
@@ -329,13 +626,61 @@ class RestockSuggestionRequest(BaseModel):
     sku: str = Field(..., example="BOT-BLU-20")
     category: str = Field(..., example="Drinkware")
     quantity: int = Field(..., example=3)
+    use_llm: bool = Field(True, description="Phrase the reorder message with the LLM (a template is used when no client is configured)")
 
 class RestockSuggestionResponse(BaseModel):
     """Model for restock suggestion response."""
-    analyzer_summary: str = Field(..., example="Product 'Blue Water Bottle' in category 'Drinkware' currently has 3 units. Sold 12 units last month.")
-    restock_suggestion: str = Field(..., example="You should order 24 more units to cover the next 4 weeks.")
+    analyzer_summary: str = Field(..., example="Product 'Blue Water Bottle' in category 'Drinkware' currently has 3 units. Sold 12 units in the last 28 days.")
+    restock_suggestion: str = Field(..., example="Order 24 units. Covers the 7-day lead time plus 28 days at about 0.43 units/day, with 3 units of safety stock.")
+    suggested_quantity: int = Field(..., example=24)
     reorder_message: str = Field(..., example="Please arrange reorder for Blue Water Bottle (SKU: BOT-BLU-20), Quantity: 24 units. Contact supplier: [Supplier Name] at [Contact Info].")
 
+class RestockBatchRequest(BaseModel):
+    """Products for /restock_suggestion/batch: explicit SKUs or a filter over active products."""
+    skus: Optional[List[str]] = Field(None, min_items=1, max_items=1000, example=["BOT-BLU-20", "MUG-WHT-12"])
+    below_reorder_point: bool = Field(False, description="All active products at or below their reorder point")
+    needs_reorder: bool = Field(False, description="Only products whose forecast suggests ordering")
+    category: Optional[str] = Field(None, description="Only products in this category")
+    use_llm: bool = Field(True, description="Phrase reorder messages with the LLM (a template is used when no client is configured)")
+    pack_size: Optional[int] = Field(None, ge=1, le=50, description="Products per LLM prompt (default RESTOCK_PACK_SIZE)")
+
+    @validator('pack_size', always=True)
+    def require_selection(cls, v, values):
+        if not values.get('skus') and not values.get('below_reorder_point') and not values.get('needs_reorder'):
+            raise ValueError('Give skus or a filter (below_reorder_point or needs_reorder)')
+        return v
+
+class RestockBatchItem(BaseModel):
+    """Restock suggestion for one product of a batch (or the error for an unknown SKU)."""
+    sku: str
+    product_id: Optional[int] = None
+    product_name: Optional[str] = None
+    analyzer_summary: Optional[str] = None
+    restock_suggestion: Optional[str] = None
+    suggested_quantity: Optional[int] = None
+    reorder_message: Optional[str] = None
+    message_source: Optional[str] = Field(None, description="'llm' or 'template'")
+    error: Optional[str] = None
+
+class RestockBatchResponse(BaseModel):
+    """Model for batch restock suggestion response."""
+    items: List[RestockBatchItem]
+
+class ForecastResponse(BaseModel):
+    """Demand forecast and reorder suggestion for one product."""
+    product_id: int
+    sku: str
+    name: str
+    on_hand: int
+    lead_time_days: int
+    recent_demand: int
+    daily_demand: float
+    demand_std: float
+    safety_stock: int
+    reorder_point: int
+    reorder_quantity: int
+    days_of_cover: Optional[float] = None
+
 # ---- Inventory Question Models ----
 
 class InventoryQuestionRequest(BaseModel):
@@ -357,6 +702,163 @@ def format_product_for_embedding(product: Product) -> str:
            f"Description: {product.description or 'No description'}")
 
 
+def product_embedding_text(name: str, category: Optional[str], description: Optional[str]) -> str:
+    """Text that is embedded for semantic retrieval (descriptive fields only)."""
+    return f"{name} {category or ''} {description or ''}"
+
+# In-memory keyword index for /ask_inventory, kept current by the product write endpoints
+inventory_index = InventorySearchIndex()
+
+# Cached X-Total-Count values, dropped whenever a product is written
+product_count_cache = CountCache(ttl=float(os.getenv("PRODUCT_COUNT_CACHE_TTL", "30")))
+
+# Read-through cache of product rows by id, sku and barcode (see product_cache.py), dropped by the
+# product and stock write paths; PRODUCT_CACHE_PATH adds an SQLite tier shared by workers on this host
+product_cache = ProductCache(
+    max_entries=int(os.getenv("PRODUCT_CACHE_MAX_ENTRIES", "10000")),
+    ttl=float(os.getenv("PRODUCT_CACHE_TTL", "300")),
+    path=os.getenv("PRODUCT_CACHE_PATH") or None,
+    sync_interval=float(os.getenv("PRODUCT_CACHE_SYNC_INTERVAL", "1")),
+)
+
+# Cache of LLM completions (see llm_cache.py); LLM_CACHE_MAX_ENTRIES=0 disables it and
+# LLM_CACHE_PATH adds an SQLite tier that survives restarts
+llm_cache = LLMResponseCache(
+    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024")),
+    ttl=float(os.getenv("LLM_CACHE_TTL", "3600")),
+    path=os.getenv("LLM_CACHE_PATH") or None,
+)
+# Concurrent identical LLM requests share one upstream call; LLM_COALESCE_TIMEOUT bounds each caller's wait
+llm_flights = SingleFlight()
+LLM_COALESCE_TIMEOUT = float(os.getenv("LLM_COALESCE_TIMEOUT", "90"))
+
+# /ask_inventory answers are invalidated when their products change, but which products
+# match a question can change too, so they also expire sooner
+ASK_INVENTORY_CACHE_TTL = float(os.getenv("ASK_INVENTORY_CACHE_TTL", "300"))
+# Keyword and vector hits considered per /ask_inventory question before rank fusion picks the top 3
+ASK_INVENTORY_CANDIDATES = int(os.getenv("ASK_INVENTORY_CANDIDATES", "10"))
+
+def product_tags(product_ids) -> List[str]:
+    """LLM cache tags for answers built from these products."""
+    return [f"product:{product_id}" for product_id in product_ids]
+
+# Background reorder alerts: touched products every REORDER_ALERT_INTERVAL seconds (0 disables the
+# task), every level every REORDER_SWEEP_INTERVAL seconds
+reorder_alert_engine = ReorderAlertEngine(
+    engine, Base.metadata,
+    interval=float(os.getenv("REORDER_ALERT_INTERVAL", "10")),
+    sweep_interval=float(os.getenv("REORDER_SWEEP_INTERVAL", "900")),
+    demand_window_days=int(os.getenv("REORDER_DEMAND_WINDOW_DAYS", "30")),
+)
+
+# Local vector store for semantic retrieval (requires numpy; None disables it)
+EMBEDDING_STORE_PATH = os.getenv("EMBEDDING_STORE_PATH")
+product_vectors = None
+if embeddings_available():
+    encoder_cls = TfidfEncoder if os.getenv("EMBEDDING_ENCODER", "hashing") == "tfidf" else HashingEncoder
+    product_vectors = VectorStore(encoder_cls(dim=int(os.getenv("EMBEDDING_DIM", "1024")), stop_words=COMMON_WORDS))
+else:
+    logger.warning("numpy is not installed; /ask_inventory will use keyword search only")
+
+def index_product(product: Product) -> None:
+    """Add or refresh a product in the /ask_inventory search index and vector store."""
+    product_count_cache.invalidate()
+    product_cache.invalidate([product.id])
+    reorder_alert_engine.mark_touched([product.id])
+    llm_cache.invalidate_tags(product_tags([product.id]))
+    inventory_index.upsert(product.id, product.name, product.sku, product.description, product.category)
+    if product_vectors is not None:
+        product_vectors.upsert(product.id, product_embedding_text(product.name, product.category, product.description))
+
+async def index_products(rows) -> None:
+    """
+    Batch form of index_product for rows with id, name, sku, description and category.
+
+    Cache and alert bookkeeping happens on the event loop; the search and
+    vector upserts (embedding thousands of rows takes seconds) run on the
+    executor so bulk writes don't stall other requests.
+    """
+    rows = list(rows)
+    product_count_cache.invalidate()
+    product_cache.invalidate(row.id for row in rows)
+    reorder_alert_engine.mark_touched(row.id for row in rows)
+    llm_cache.invalidate_tags(product_tags(row.id for row in rows))
+    await asyncio.to_thread(upsert_index_rows, rows)
+
+def upsert_index_rows(rows) -> None:
+    """Add or refresh rows in the search index and vector store (thread-safe; both are lock-protected)."""
+    for row in rows:
+        inventory_index.upsert(row.id, row.name, row.sku, row.description, row.category)
+    if product_vectors is not None:
+        product_vectors.upsert_many(
+            (row.id, product_embedding_text(row.name, row.category, row.description)) for row in rows
+        )
+
+def unindex_product(product_id: int) -> None:
+    """Remove a deleted product from the search index and vector store."""
+    product_count_cache.invalidate()
+    product_cache.invalidate([product_id])
+    llm_cache.invalidate_tags(product_tags([product_id]))
+    inventory_index.remove(product_id)
+    if product_vectors is not None:
+        product_vectors.remove(product_id)
+
+# Each worker holds its own search index; reads catch it up with other workers' writes at most this often
+SEARCH_INDEX_SYNC_INTERVAL = float(os.getenv("SEARCH_INDEX_SYNC_INTERVAL", "1"))
+# Rows stamped this long before the watermark are re-read, so writes that commit after a later-stamped one are not missed
+SEARCH_INDEX_SYNC_OVERLAP = timedelta(seconds=5)
+
+async def sync_search_index(db: AsyncSession) -> None:
+    """
+    Apply product rows written since the last sync, by any worker, to this
+    worker's search index and vector store.
+
+    Rows are found through the updated_at index; re-applying a row this
+    worker already indexed is a no-op. Deleted products are not seen here:
+    q= filters them out in SQL, and /ask_inventory drops ids it can no
+    longer load.
+    """
+    if not inventory_index.sync_due(SEARCH_INDEX_SYNC_INTERVAL):
+        return
+    statement = select(Product.id, Product.name, Product.sku, Product.description, Product.category,
+                       Product.updated_at).where(Product.updated_at.isnot(None))
+    if inventory_index.synced_through is not None:
+        statement = statement.where(Product.updated_at >= inventory_index.synced_through - SEARCH_INDEX_SYNC_OVERLAP)
+    rows = (await db.execute(statement)).all()
+    if rows:
+        await asyncio.to_thread(upsert_index_rows, rows)
+        inventory_index.advance(max(row.updated_at for row in rows))
+
+def rebuild_search_index(db: Session) -> None:
+    """
+    Rebuild the search index from the products table, streaming rows in batches.
+
+    Takes a sync Session; from async code call `await db.run_sync(rebuild_search_index)`.
+
+    The vector store only re-embeds rows whose text differs from what it
+    already holds (e.g. after loading a persisted store).
+    """
+    query = db.query(Product.id, Product.name, Product.sku, Product.description, Product.category)
+    if product_vectors is not None and getattr(product_vectors.encoder, "idf", "absent") is None:
+        product_vectors.encoder.fit(
+            product_embedding_text(row.name, row.category, row.description) for row in query.yield_per(1000)
+        )
+
+    synced_through = db.query(func.max(Product.updated_at)).scalar()
+    seen_ids = set()
+    def rows():
+        for row in query.yield_per(1000):
+            seen_ids.add(row.id)
+            if product_vectors is not None:
+                product_vectors.upsert(row.id, product_embedding_text(row.name, row.category, row.description))
+            yield tuple(row)
+
+    inventory_index.rebuild(rows(), synced_through=synced_through)
+    if product_vectors is not None:
+        product_vectors.retain(seen_ids)
+    logger.info(f"Search index built with {len(inventory_index)} products")
+
+
 # ---- API Endpoints ----
 
 
@@ -364,36 +866,74 @@ def format_product_for_embedding(product: Product) -> str:
 
 from fastapi.encoders import jsonable_encoder
 
+def product_create_to_row(product_in: ProductCreate) -> dict:
+    """Column values for a new product (price in cents, is_active as 0/1)."""
+    return {
+        "sku": product_in.sku,
+        "name": product_in.name,
+        "description": product_in.description,
+        "barcode": product_in.barcode,
+        "category": product_in.category,
+        "price": int((product_in.price or 0) * 100),  # Convert dollars to cents
+        "stock": product_in.stock or 0,
+        "supplier_id": product_in.supplier_id,
+        "reorder_point": product_in.reorder_point or 0,
+        "reorder_quantity": product_in.reorder_quantity or 0,
+        "lead_time_days": product_in.lead_time_days or 0,
+        "is_active": 1 if product_in.is_active else 0,
+    }
+
+def product_update_to_values(update_data: dict) -> dict:
+    """Column values for a partial product update (price in cents, is_active as 0/1), stamped with updated_at."""
+    values = {"updated_at": datetime.utcnow()}
+    for key, value in update_data.items():
+        if key == "is_active":
+            values[key] = 1 if value else 0
+        elif key == "price":
+            values[key] = int(value * 100) if value is not None else 0  # Convert dollars to cents
+        else:
+            values[key] = value
+    return values
+
+# Columns product_cache can look rows up by
+PRODUCT_LOOKUP_COLUMNS = {"id": Product.id, "sku": Product.sku, "barcode": Product.barcode}
+# Columns of a cached product row (the ProductResponse fields)
+PRODUCT_ROW_COLUMNS = [getattr(Product, f) for f in PRODUCT_FIELDS]
+
+async def lookup_product(db: AsyncSession, kind: str, value) -> Optional[dict]:
+    """
+    The product whose `kind` ("id", "sku" or "barcode") is `value`, in API
+    form, read through product_cache; None if there is no such product.
+    """
+    row = product_cache.get(kind, value)
+    if row is not None:
+        return row
+    token = product_cache.token()
+    found = (await db.execute(
+        select(*PRODUCT_ROW_COLUMNS).where(PRODUCT_LOOKUP_COLUMNS[kind] == value)
+    )).mappings().first()
+    if found is None:
+        return None
+    row = product_row_to_dict(found)
+    product_cache.put(row, token)
+    return row
+
 @app.post("/products/", response_model=ProductResponse, status_code=status.HTTP_201_CREATED)
-async def create_product(product_in: ProductCreate, db: Session = Depends(get_db)):
+async def create_product(product_in: ProductCreate, db: AsyncSession = Depends(get_db)):
     """Create a new product (DB-backed)."""
     try:
         # Check for unique SKU and barcode
-        existing = db.query(Product).filter(Product.sku == product_in.sku).first()
-        if existing:
+        if await lookup_product(db, "sku", product_in.sku):
             raise HTTPException(status_code=400, detail="SKU already exists")
-        if product_in.barcode:
-            existing_barcode = db.query(Product).filter(Product.barcode == product_in.barcode).first()
-            if existing_barcode:
-                raise HTTPException(status_code=400, detail="Barcode already exists")
-
-        db_product = Product(
-            sku=product_in.sku,
-            name=product_in.name,
-            description=product_in.description,
-            barcode=product_in.barcode,
-            category=product_in.category,
-            price=int((product_in.price or 0) * 100),  # Convert dollars to cents
-            stock=product_in.stock or 0,
-            supplier_id=product_in.supplier_id,
-            reorder_point=product_in.reorder_point or 0,
-            reorder_quantity=product_in.reorder_quantity or 0,
-            lead_time_days=product_in.lead_time_days or 0,
-            is_active=1 if product_in.is_active else 0
-        )
+        if product_in.barcode and await lookup_product(db, "barcode", product_in.barcode):
+            raise HTTPException(status_code=400, detail="Barcode already exists")
+
+        db_product = Product(**product_create_to_row(product_in))
         db.add(db_product)
-        db.commit()
-        db.refresh(db_product)
+        await bump_catalog_revision(db)
+        await db.commit()
+        await db.refresh(db_product)
+        index_product(db_product)
         logger.info(f"Created product with ID: {db_product.id}")
         return ProductResponse.from_orm(db_product)
     except HTTPException:
@@ -402,24 +942,521 @@ async def create_product(product_in: ProductCreate, db: Session = Depends(get_db
         logger.error(f"Error creating product: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+# ---- Bulk Product Endpoints ----
+
+# Largest payload accepted by the bulk endpoints, in rows
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "50000"))
+# IN-list size for set-based lookups (keeps under SQLite's bound-parameter limit)
+BULK_LOOKUP_CHUNK = 500
+
+async def read_bulk_rows(request: Request) -> List:
+    """
+    Read a bulk payload as a list of row dicts.
+
+    Accepts a JSON array, or NDJSON (one object per line) when the content
+    type is application/x-ndjson. A malformed NDJSON line becomes a
+    ValueError in its slot so the row can be reported without failing the
+    whole request.
+    """
+    body = await request.body()
+    if "ndjson" in request.headers.get("content-type", ""):
+        rows = []
+        for line in body.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                rows.append(ValueError(f"Invalid JSON: {e.msg}"))
+    else:
+        try:
+            rows = json.loads(body or b"null")
+        except json.JSONDecodeError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON: {e.msg}")
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of products")
+    if len(rows) > BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ROWS} rows per request")
+    return rows
+
+def parse_bulk_rows(rows: List, model, result: BulkProductResult) -> List:
+    """Validate rows against `model`; returns (index, model) pairs and records failures in `result`."""
+    valid = []
+    for index, row in enumerate(rows):
+        if isinstance(row, ValueError):
+            result.errors.append(BulkRowError(index=index, error=str(row)))
+            continue
+        if not isinstance(row, dict):
+            result.errors.append(BulkRowError(index=index, error="Expected a JSON object"))
+            continue
+        try:
+            valid.append((index, model(**row)))
+        except ValidationError as e:
+            result.errors.append(BulkRowError(index=index, sku=row.get("sku"), error=format_validation_error(e)))
+    return valid
+
+def _chunks(values: List, size: int = BULK_LOOKUP_CHUNK):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+async def find_existing_products(db: AsyncSession, skus: List[str], barcodes: List[str]) -> List:
+    """(id, sku, barcode) of products holding any of the given SKUs or barcodes, in a few set-based queries."""
+    found = {}
+    for column, values in ((Product.sku, skus), (Product.barcode, barcodes)):
+        for chunk in _chunks(sorted(set(values))):
+            statement = select(Product.id, Product.sku, Product.barcode).where(column.in_(chunk))
+            for row in (await db.execute(statement)).all():
+                found[row.id] = row
+    return list(found.values())
+
+async def load_index_rows(db: AsyncSession, column, values: List) -> List:
+    """Rows needed to refresh the search index for products matching `values` of `column`."""
+    rows = []
+    for chunk in _chunks(values):
+        statement = select(Product.id, Product.name, Product.sku, Product.description,
+                           Product.category).where(column.in_(chunk))
+        rows.extend((await db.execute(statement)).all())
+    return rows
+
+def dialect_insert(db: AsyncSession, model=Product):
+    """The INSERT construct of the session's dialect, which supports ON CONFLICT."""
+    if db.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        return pg_insert(model)
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+    return sqlite_insert(model)
+
+def _reject(result: BulkProductResult, index: int, sku: Optional[str], error: str) -> None:
+    result.errors.append(BulkRowError(index=index, sku=sku, error=error))
+
+@app.post("/products/bulk", response_model=BulkProductResult)
+async def bulk_create_products(
+    request: Request,
+    on_conflict: str = Query("error", pattern="^(error|skip|update)$",
+                             description="What to do with rows whose SKU already exists: error, skip or update"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Create many products in one transaction (DB-backed).
+
+    The body is a JSON array or NDJSON of product objects. Invalid rows are
+    reported individually in `errors` and the remaining rows are written.
+    With on_conflict=update, rows whose SKU exists replace that product's
+    fields (an upsert keyed on SKU).
+    """
+    result = BulkProductResult()
+    rows = parse_bulk_rows(await read_bulk_rows(request), ProductCreate, result)
+
+    # Duplicates inside the payload: the first occurrence wins
+    seen_skus, seen_barcodes, unique_rows = set(), set(), []
+    for index, product_in in rows:
+        if product_in.sku in seen_skus:
+            _reject(result, index, product_in.sku, "Duplicate SKU in request")
+        elif product_in.barcode and product_in.barcode in seen_barcodes:
+            _reject(result, index, product_in.sku, "Duplicate barcode in request")
+        else:
+            seen_skus.add(product_in.sku)
+            if product_in.barcode:
+                seen_barcodes.add(product_in.barcode)
+            unique_rows.append((index, product_in))
+
+    try:
+        existing = await find_existing_products(
+            db, [p.sku for _, p in unique_rows], [p.barcode for _, p in unique_rows if p.barcode]
+        )
+        sku_owner = {row.sku: row.id for row in existing}
+        barcode_owner = {row.barcode: row.id for row in existing if row.barcode}
+
+        inserts, upserts = [], []
+        for index, product_in in unique_rows:
+            owner = sku_owner.get(product_in.sku)
+            if owner is not None and on_conflict == "error":
+                _reject(result, index, product_in.sku, "SKU already exists")
+            elif owner is not None and on_conflict == "skip":
+                continue
+            elif product_in.barcode and barcode_owner.get(product_in.barcode, owner) != owner:
+                _reject(result, index, product_in.sku, "Barcode already exists")
+            elif owner is not None:
+                upserts.append(product_create_to_row(product_in))
+            else:
+                inserts.append(product_create_to_row(product_in))
+
+        if inserts:
+            await db.execute(insert(Product), inserts)
+        if upserts:
+            statement = dialect_insert(db)
+            updatable = [c for c in upserts[0] if c != "sku"]
+            statement = statement.on_conflict_do_update(
+                index_elements=[Product.sku],
+                set_=dict({column: statement.excluded[column] for column in updatable}, updated_at=datetime.utcnow())
+            )
+            await db.execute(statement, upserts)
+        if inserts or upserts:
+            await bump_catalog_revision(db)
+        await db.commit()
+    except HTTPException:
+        raise
+    except IntegrityError as e:
+        await db.rollback()
+        logger.warning(f"Bulk create conflicted with a concurrent write: {e.orig}")
+        raise HTTPException(status_code=409, detail="Conflicting concurrent write; no rows were saved")
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error in bulk product create: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+    written = [row["sku"] for row in inserts + upserts]
+    if written:
+        await index_products(await load_index_rows(db, Product.sku, written))
+    result.created, result.updated = len(inserts), len(upserts)
+    result.failed = len(result.errors)
+    result.errors.sort(key=lambda e: e.index)
+    logger.info(f"Bulk create: {result.created} created, {result.updated} updated, {result.failed} failed")
+    return result
+
+@app.put("/products/bulk", response_model=BulkProductResult)
+async def bulk_update_products(request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Apply partial updates to many products in one transaction (DB-backed).
+
+    The body is a JSON array or NDJSON of objects with an `id` plus the
+    fields to change. Rows for unknown products or that would duplicate a
+    SKU or barcode are reported in `errors`; the rest are written.
+    """
+    result = BulkProductResult()
+    rows = parse_bulk_rows(await read_bulk_rows(request), ProductBulkUpdate, result)
+
+    seen_ids, seen_skus, seen_barcodes, unique_rows = set(), set(), set(), []
+    for index, row in rows:
+        data = row.dict(exclude_unset=True)
+        sku, barcode = data.get("sku"), data.get("barcode")
+        if row.id in seen_ids:
+            _reject(result, index, sku, "Duplicate id in request")
+        elif sku is not None and sku in seen_skus:
+            _reject(result, index, sku, "Duplicate SKU in request")
+        elif barcode is not None and barcode in seen_barcodes:
+            _reject(result, index, sku, "Duplicate barcode in request")
+        else:
+            seen_ids.add(row.id)
+            if sku is not None:
+                seen_skus.add(sku)
+            if barcode is not None:
+                seen_barcodes.add(barcode)
+            unique_rows.append((index, data))
+
+    try:
+        known_ids = set()
+        for chunk in _chunks(sorted(seen_ids)):
+            known_ids.update((await db.execute(select(Product.id).where(Product.id.in_(chunk)))).scalars())
+        existing = await find_existing_products(
+            db,
+            [d["sku"] for _, d in unique_rows if d.get("sku") is not None],
+            [d["barcode"] for _, d in unique_rows if d.get("barcode") is not None],
+        )
+        sku_owner = {row.sku: row.id for row in existing}
+        barcode_owner = {row.barcode: row.id for row in existing if row.barcode}
+
+        updates = []
+        for index, data in unique_rows:
+            product_id, sku, barcode = data["id"], data.get("sku"), data.get("barcode")
+            if product_id not in known_ids:
+                _reject(result, index, sku, "Product not found")
+            elif sku is not None and sku_owner.get(sku, product_id) != product_id:
+                _reject(result, index, sku, "SKU already exists")
+            elif barcode is not None and barcode_owner.get(barcode, product_id) != product_id:
+                _reject(result, index, sku, "Barcode already exists")
+            elif len(data) > 1:
+                updates.append(product_update_to_values(data))
+
+        if updates:
+            # ORM bulk UPDATE by primary key; rows are grouped by the columns they set
+            await db.execute(update(Product), updates)
+            await bump_catalog_revision(db)
+        await db.commit()
+    except HTTPException:
+        raise
+    except IntegrityError as e:
+        await db.rollback()
+        logger.warning(f"Bulk update conflicted with a concurrent write: {e.orig}")
+        raise HTTPException(status_code=409, detail="Conflicting concurrent write; no rows were saved")
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error in bulk product update: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+    if updates:
+        await index_products(await load_index_rows(db, Product.id, [u["id"] for u in updates]))
+    result.updated = len(updates)
+    result.failed = len(result.errors)
+    result.errors.sort(key=lambda e: e.index)
+    logger.info(f"Bulk update: {result.updated} updated, {result.failed} failed")
+    return result
+
+# Columns GET /products/ can sort by; prefix with "-" for descending. Each is paired with id for keyset paging.
+PRODUCT_SORT_COLUMNS = {
+    "id": Product.id,
+    "category": Product.category,
+    "price": Product.price,
+    "stock": Product.stock,
+    "created_at": Product.created_at,
+}
+SORT_PATTERN = "^-?(" + "|".join(PRODUCT_SORT_COLUMNS) + ")$"
+
+# Above this many search matches, q= is applied with LIKE in SQL instead of an id list
+MAX_SEARCH_CANDIDATES = 5000
+
+def _like_pattern(word: str) -> str:
+    escaped = word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+def product_search_condition(q: str):
+    """
+    SQL condition for products containing every word of `q` in name, SKU,
+    description or category. Uses the in-memory search index to resolve
+    candidate ids when it is built, otherwise falls back to LIKE.
+    """
+    words = q.lower().split()
+    if inventory_index.ready:
+        candidates = None
+        for word in words:
+            matches = inventory_index.matching_ids(word)
+            candidates = matches if candidates is None else candidates & matches
+            if not candidates:
+                return false()
+        if candidates is not None and len(candidates) <= MAX_SEARCH_CANDIDATES:
+            return Product.id.in_(sorted(candidates))
+
+    return and_(*(
+        or_(*(column.ilike(_like_pattern(word), escape="\\")
+              for column in (Product.name, Product.sku, Product.description, Product.category)))
+        for word in words
+    ))
+
+def keyset_condition(sort_column, value, last_id: int, descending: bool):
+    """Rows strictly after (value, last_id) in (sort_column, id) order, NULLs first ascending."""
+    if sort_column is Product.id:
+        return Product.id < last_id if descending else Product.id > last_id
+    if descending:
+        # Order: values high to low, then NULLs; ids descending within a value
+        if value is None:
+            return and_(sort_column.is_(None), Product.id < last_id)
+        return or_(
+            sort_column < value,
+            and_(sort_column == value, Product.id < last_id),
+            sort_column.is_(None),
+        )
+    # Order: NULLs, then values low to high; ids ascending within a value
+    if value is None:
+        return or_(sort_column.is_not(None), and_(sort_column.is_(None), Product.id > last_id))
+    return or_(sort_column > value, and_(sort_column == value, Product.id > last_id))
+
+async def bump_catalog_revision(db: AsyncSession, deleted: int = 0) -> None:
+    """Count a product insert, update or delete in CatalogVersion; must run in the write's transaction."""
+    values = {"revision": CatalogVersion.revision + 1}
+    if deleted:
+        values["products_deleted"] = CatalogVersion.products_deleted + deleted
+    await db.execute(update(CatalogVersion).where(CatalogVersion.id == 1).values(**values))
+
+async def catalog_etag(db: AsyncSession, request: Request) -> str:
+    """
+    Weak ETag for a product listing: its query parameters plus the
+    catalog revision.
+
+    Every product insert, update and delete bumps CatalogVersion.revision
+    in its own transaction, so the revision a reader sees moves exactly
+    when committed products change. max(updated_at) would not: stamps are
+    taken in Python before the write lock, so a write stamped earlier can
+    commit later without moving the maximum. The revision is one primary
+    key lookup; counting products would walk a whole index per request.
+    """
+    revision = (await db.execute(
+        select(CatalogVersion.revision).where(CatalogVersion.id == 1)
+    )).scalar_one_or_none()
+    params = sorted((key, value) for key, value in request.query_params.multi_items() if key != "stream")
+    return weak_etag("products", params, revision)
+
+def product_etag(product: dict) -> str:
+    """Weak ETag for one product row in API form."""
+    return weak_etag("product", product["id"], product.get("updated_at") or product["created_at"])
+
 @app.get("/products/", response_model=List[ProductResponse])
-async def list_products(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """List all products with optional pagination (DB-backed)."""
+async def list_products(
+    request: Request,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's X-Next-Cursor header"),
+    sort: str = Query("id", pattern=SORT_PATTERN, description="id, category, price, stock or created_at; prefix - for descending"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,sku,name,stock"),
+    category: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    stock_lt: Optional[int] = Query(None, description="Only products with stock below this value"),
+    price_min: Optional[float] = Query(None, ge=0, description="Minimum price in dollars"),
+    price_max: Optional[float] = Query(None, ge=0, description="Maximum price in dollars"),
+    q: Optional[str] = Query(None, description="Words that must all appear in name, SKU, description or category"),
+    include_total: bool = Query(False, description="Return the number of matching products in X-Total-Count"),
+    skip: int = Query(0, ge=0, description="Deprecated OFFSET paging; ignored when a cursor is given"),
+    stream: bool = Query(False, description="Send the page as a chunked stream, encoded a few hundred rows at a time"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    List products matching the given filters, using keyset pagination (DB-backed).
+
+    Pages are ordered by the sort column and then id. When more rows may
+    follow, the X-Next-Cursor response header holds the cursor for the next
+    page. `fields` selects only those columns in SQL. With include_total, the
+    total match count (cached briefly per filter set) is returned in the
+    X-Total-Count header.
+
+    Rows are plain dicts built from the selected columns, so they are
+    encoded directly (see serialization.py) instead of being validated
+    against the response model and run through jsonable_encoder; the model
+    documents the full row, of which `fields` returns a subset.
+
+    The weak ETag covers the query parameters and the catalog state
+    (see catalog_etag); a matching If-None-Match gets 304 before the page
+    is queried.
+    """
+    descending = sort.startswith("-")
+    sort_name = sort.lstrip("-")
+    sort_column = PRODUCT_SORT_COLUMNS[sort_name]
     try:
-        products = db.query(Product).offset(skip).limit(limit).all()
-        return [ProductResponse.from_orm(product) for product in products]
+        selected = parse_product_fields(fields)
+        key = decode_cursor(cursor, sort) if cursor else None
+        if key is not None and sort_name == "created_at" and key.get(sort_name) is not None:
+            key[sort_name] = datetime.fromisoformat(key[sort_name])
+    except (ValueError, InvalidCursor) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        headers = validator_headers(await catalog_etag(db, request))
+        if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+            return not_modified(headers)
+
+        filters = []
+        if category is not None:
+            filters.append(Product.category == category)
+        if is_active is not None:
+            filters.append(Product.is_active == int(is_active))
+        if stock_lt is not None:
+            filters.append(Product.stock < stock_lt)
+        if price_min is not None:
+            filters.append(Product.price >= int(round(price_min * 100)))  # Convert dollars to cents
+        if price_max is not None:
+            filters.append(Product.price <= int(round(price_max * 100)))
+        if q and q.strip():
+            await sync_search_index(db)
+            filters.append(product_search_condition(q))
+
+        if include_total:
+            count_key = (category, is_active, stock_lt, price_min, price_max, (q or "").strip().lower())
+            total = product_count_cache.get(count_key)
+            if total is None:
+                generation = product_count_cache.generation
+                total = (await db.execute(
+                    select(func.count()).select_from(Product).where(*filters)
+                )).scalar_one()
+                product_count_cache.put(count_key, total, generation)
+            headers["X-Total-Count"] = str(total)
+
+        columns = [getattr(Product, f) for f in selected]
+        if sort_name not in selected:
+            columns.append(sort_column)
+        statement = select(*columns).where(*filters)
+
+        if descending:
+            statement = statement.order_by(sort_column.desc().nulls_last(), Product.id.desc())
+        else:
+            statement = statement.order_by(sort_column.asc().nulls_first(), Product.id.asc())
+        if key is not None:
+            statement = statement.where(keyset_condition(sort_column, key.get(sort_name), key["id"], descending))
+        elif skip:
+            statement = statement.offset(skip)
+
+        rows = (await db.execute(statement.limit(limit))).mappings().all()
+
+        if len(rows) == limit:
+            last = rows[-1]
+            headers["X-Next-Cursor"] = encode_cursor(sort, {"id": last["id"], sort_name: last[sort_name]})
+
+        products = [product_row_to_dict({f: row[f] for f in selected}) for row in rows]
+        if stream:
+            return StreamingResponse(iter_json_array(products), media_type="application/json", headers=headers)
+        return JSONRowsResponse(products, headers=headers)
     except Exception as e:
         logger.error(f"Error listing products: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+# ---- Scanner Lookups ----
+
+@app.get("/products/by-barcode/{code}", response_model=ProductResponse)
+async def get_product_by_barcode(code: str, db: AsyncSession = Depends(get_db)):
+    """Get a product by its barcode (unique index, read through the product cache)."""
+    product = await lookup_product(db, "barcode", code)
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return product
+
+@app.get("/products/by-sku/{sku}", response_model=ProductResponse)
+async def get_product_by_sku(sku: str, db: AsyncSession = Depends(get_db)):
+    """Get a product by its SKU (unique index, read through the product cache)."""
+    product = await lookup_product(db, "sku", sku)
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return product
+
+@app.post("/products/lookup", response_model=ProductLookupResult)
+async def lookup_products(request: ProductLookupRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Resolve up to PRODUCT_LOOKUP_MAX scanned codes at once.
+
+    Cached rows are used first; the remaining codes are resolved with a
+    single query over the unique barcode and SKU indexes (`IN (...)` per
+    key), and the rows found are cached for the next scan.
+    """
+    kinds = PRODUCT_LOOKUP_KINDS[request.by]
+    codes = list(dict.fromkeys(request.codes))
+    resolved = {}
+    for code in codes:
+        for kind in kinds:
+            row = product_cache.get(kind, code)
+            if row is not None:
+                resolved[code] = row
+                break
+
+    pending = [code for code in codes if code not in resolved]
+    if pending:
+        token = product_cache.token()
+        found = (await db.execute(
+            select(*PRODUCT_ROW_COLUMNS).where(or_(*(PRODUCT_LOOKUP_COLUMNS[kind].in_(pending) for kind in kinds)))
+        )).mappings().all()
+        by_kind = {kind: {} for kind in kinds}
+        for row in map(product_row_to_dict, found):
+            product_cache.put(row, token)
+            for kind in kinds:
+                if row[kind] is not None:
+                    by_kind[kind][row[kind]] = row
+        for code in pending:
+            row = next((by_kind[kind][code] for kind in kinds if code in by_kind[kind]), None)
+            if row is not None:
+                resolved[code] = row
+
+    return JSONRowsResponse({
+        "found": [dict({field: resolved[code][field] for field in SCANNED_PRODUCT_FIELDS}, code=code)
+                  for code in codes if code in resolved],
+        "missing": [code for code in codes if code not in resolved],
+    })
+
 @app.get("/products/{product_id}", response_model=ProductResponse)
-async def get_product(product_id: int, db: Session = Depends(get_db)):
-    """Get a product by its ID (DB-backed)."""
+async def get_product(product_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    """Get a product by its ID (DB-backed), with a weak ETag; a matching If-None-Match gets 304."""
     try:
-        product = db.query(Product).filter(Product.id == product_id).first()
+        product = await lookup_product(db, "id", product_id)
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
-        return ProductResponse.from_orm(product)
+        headers = validator_headers(product_etag(product))
+        if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+            return not_modified(headers)
+        response.headers.update(headers)
+        return product
     except HTTPException:
         raise
     except Exception as e:
@@ -427,34 +1464,28 @@ async def get_product(product_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @app.put("/products/{product_id}", response_model=ProductResponse)
-async def update_product(product_id: int, product_in: ProductUpdate, db: Session = Depends(get_db)):
+async def update_product(product_id: int, product_in: ProductUpdate, db: AsyncSession = Depends(get_db)):
     """Update an existing product (DB-backed)."""
     try:
-        product = db.query(Product).filter(Product.id == product_id).first()
+        product = await db.get(Product, product_id)
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
 
         update_data = product_in.dict(exclude_unset=True)
 
         # Check unique constraints
-        if "sku" in update_data:
-            existing = db.query(Product).filter(Product.sku == update_data["sku"], Product.id != product_id).first()
-            if existing:
-                raise HTTPException(status_code=400, detail="SKU already exists")
-        if "barcode" in update_data and update_data["barcode"] is not None:
-            existing_barcode = db.query(Product).filter(Product.barcode == update_data["barcode"], Product.id != product_id).first()
-            if existing_barcode:
-                raise HTTPException(status_code=400, detail="Barcode already exists")
-
-        for key, value in update_data.items():
-            if key == "is_active":
-                setattr(product, key, 1 if value else 0)
-            elif key == "price":
-                setattr(product, key, int(value * 100) if value is not None else 0)  # Convert dollars to cents
-            else:
-                setattr(product, key, value)
-        db.commit()
-        db.refresh(product)
+        for kind in ("sku", "barcode"):
+            if update_data.get(kind) is not None:
+                existing = await lookup_product(db, kind, update_data[kind])
+                if existing and existing["id"] != product_id:
+                    raise HTTPException(status_code=400, detail=f"{'SKU' if kind == 'sku' else 'Barcode'} already exists")
+
+        for key, value in product_update_to_values(update_data).items():
+            setattr(product, key, value)
+        await bump_catalog_revision(db)
+        await db.commit()
+        await db.refresh(product)
+        index_product(product)
         logger.info(f"Updated product with ID: {product_id}")
         return ProductResponse.from_orm(product)
     except HTTPException:
@@ -464,14 +1495,34 @@ async def update_product(product_id: int, product_in: ProductUpdate, db: Session
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @app.delete("/products/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_product(product_id: int, db: Session = Depends(get_db)):
-    """Delete a product by its ID (DB-backed)."""
+async def delete_product(product_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    Delete a product by its ID (DB-backed).
+
+    Its inventory levels, reorder alerts and stock total go with it in the
+    same transaction, and its on-hand units leave the warehouse totals.
+    Products with stock movements are refused with 409: the ledger is
+    history and would no longer match the totals; deactivate them instead.
+    """
     try:
-        product = db.query(Product).filter(Product.id == product_id).first()
+        product = await db.get(Product, product_id)
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
-        db.delete(product)
-        db.commit()
+        # Taken first: holds the write lock (SQLite) / catalog row (PostgreSQL) against concurrent stock writes
+        await bump_catalog_revision(db, deleted=1)
+        if (await db.execute(select(StockMovement.id).where(StockMovement.product_id == product_id).limit(1))).first():
+            await db.rollback()
+            raise HTTPException(status_code=409, detail="Product has stock movements; set is_active to false instead")
+        levels = (await db.execute(
+            select(InventoryLevel.warehouse_id, InventoryLevel.quantity)
+            .where(InventoryLevel.product_id == product_id).with_for_update()
+        )).all()
+        await apply_stock_total_changes(db, [(product_id, w, q, 0) for w, q in levels])
+        for model in (InventoryLevel, ReorderAlert, ProductStockTotal):
+            await db.execute(delete(model).where(model.product_id == product_id))
+        await db.delete(product)
+        await db.commit()
+        unindex_product(product_id)
         logger.info(f"Deleted product with ID: {product_id}")
     except HTTPException:
         raise
@@ -479,17 +1530,664 @@ async def delete_product(product_id: int, db: Session = Depends(get_db)):
         logger.error(f"Error deleting product {product_id}: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+# ---- Catalog Import ----
+
+async def _write_rows_individually(db: AsyncSession, statements: List[Tuple[int, object]]) -> List[Tuple[int, str]]:
+    """Fallback when a batch hits a constraint: apply each row in a savepoint and collect failures."""
+    errors = []
+    for index, statement in statements:
+        try:
+            async with db.begin_nested():
+                await db.execute(statement)
+        except IntegrityError as e:
+            errors.append((index, f"Constraint violation: {e.orig}"))
+    await db.commit()
+    return errors
+
+async def import_product_batch(db: AsyncSession, rows: List[Tuple[int, ProductCreate]]) -> List[Tuple[int, str]]:
+    """Upsert a batch of products by SKU; the last row for a repeated SKU wins."""
+    by_sku = {}
+    for index, product_in in rows:
+        by_sku[product_in.sku] = (index, product_create_to_row(product_in))
+    errors = [(index, "Superseded by a later row with the same SKU")
+              for index, product_in in rows if by_sku[product_in.sku][0] != index]
+
+    values = [row for _, row in by_sku.values()]
+    statement = dialect_insert(db)
+    statement = statement.on_conflict_do_update(
+        index_elements=[Product.sku],
+        set_=dict({column: statement.excluded[column] for column in values[0] if column != "sku"},
+                  updated_at=datetime.utcnow())
+    )
+    try:
+        await db.execute(statement, values)
+        await bump_catalog_revision(db)
+        await db.commit()
+    except IntegrityError:
+        # Most likely a barcode clash; find the offending rows one by one
+        await db.rollback()
+        await bump_catalog_revision(db)
+        errors.extend(await _write_rows_individually(
+            db, [(index, statement.values(**row)) for index, row in by_sku.values()]
+        ))
+    await index_products(await load_index_rows(db, Product.sku, list(by_sku)))
+    return sorted(errors)
+
+async def import_supplier_batch(db: AsyncSession, rows: List[Tuple[int, SupplierCreate]]) -> List[Tuple[int, str]]:
+    """Insert a batch of suppliers."""
+    values = [dict(supplier_in.dict(), is_active=1 if supplier_in.is_active else 0) for _, supplier_in in rows]
+    await db.execute(insert(Supplier), values)
+    await db.commit()
+    return []
+
+async def import_inventory_level_batch(db: AsyncSession, rows: List[Tuple[int, InventoryLevelSet]]) -> List[Tuple[int, str]]:
+    """
+    Set on-hand quantities, resolving SKUs and checking products and warehouses with set-based queries.
+
+    The stock totals and Product.stock move by the difference from the old
+    quantities in the same transaction, as they do for ledger movements. The
+    old quantities are read under the write lock so a concurrent movement
+    cannot land between the read and the upsert: missing levels are first
+    inserted at zero (a write, which takes SQLite's database lock) and the
+    rows are then read FOR UPDATE (row locks on PostgreSQL, in key order).
+    """
+    skus = [level.sku for _, level in rows if level.product_id is None and level.sku]
+    product_ids = {level.product_id for _, level in rows if level.product_id is not None}
+    id_by_sku, known_products = {}, set()
+    for chunk in _chunks(sorted(set(skus))):
+        id_by_sku.update((await db.execute(select(Product.sku, Product.id).where(Product.sku.in_(chunk)))).all())
+    for chunk in _chunks(sorted(product_ids)):
+        known_products.update((await db.execute(select(Product.id).where(Product.id.in_(chunk)))).scalars())
+    known_products.update(id_by_sku.values())
+    known_warehouses = set()
+    for chunk in _chunks(sorted({level.warehouse_id for _, level in rows})):
+        known_warehouses.update((await db.execute(select(Warehouse.id).where(Warehouse.id.in_(chunk)))).scalars())
+
+    errors, by_key = [], {}
+    for index, level in rows:
+        product_id = level.product_id if level.product_id is not None else id_by_sku.get(level.sku)
+        if level.product_id is None and not level.sku:
+            errors.append((index, "product_id or sku is required"))
+        elif product_id not in known_products:
+            errors.append((index, "Product not found"))
+        elif level.warehouse_id not in known_warehouses:
+            errors.append((index, "Warehouse not found"))
+        else:
+            key = (product_id, level.warehouse_id)
+            if key in by_key:
+                errors.append((by_key[key][0], "Superseded by a later row for the same product and warehouse"))
+            by_key[key] = (index, {"product_id": product_id, "warehouse_id": level.warehouse_id,
+                                   "quantity": level.quantity})
+
+    if by_key:
+        keys = sorted(by_key)
+        await db.execute(
+            dialect_insert(db, InventoryLevel).on_conflict_do_nothing(
+                index_elements=[InventoryLevel.product_id, InventoryLevel.warehouse_id]),
+            [{"product_id": p, "warehouse_id": w, "quantity": 0} for p, w in keys]
+        )
+        old_quantities = {}
+        for chunk in _chunks(keys):
+            old_quantities.update(((p, w), q) for p, w, q in (await db.execute(
+                select(InventoryLevel.product_id, InventoryLevel.warehouse_id, InventoryLevel.quantity)
+                .where(tuple_(InventoryLevel.product_id, InventoryLevel.warehouse_id).in_(chunk))
+                .order_by(InventoryLevel.product_id, InventoryLevel.warehouse_id)
+                .with_for_update()
+            )).all())
+        changes = [(p, w, old_quantities[(p, w)], by_key[(p, w)][1]["quantity"]) for p, w in keys]
+        await apply_stock_total_changes(db, changes)
+        await apply_product_stock_changes(db, changes)
+
+        statement = dialect_insert(db, InventoryLevel)
+        statement = statement.on_conflict_do_update(
+            index_elements=[InventoryLevel.product_id, InventoryLevel.warehouse_id],
+            set_={"quantity": statement.excluded.quantity, "last_updated": func.current_timestamp()}
+        )
+        await db.execute(statement, [values for _, values in by_key.values()])
+        await db.commit()
+        touched = {p for p, _ in keys}
+        product_count_cache.invalidate()  # stock_lt counts may have changed
+        product_cache.invalidate(touched)
+        reorder_alert_engine.mark_touched(touched)
+        llm_cache.invalidate_tags(product_tags(touched))
+    return sorted(errors)
+
+# Entities accepted by the catalog importer (CLI and POST /import/{entity})
+IMPORT_ENTITIES = {
+    "products": ImportEntity("products", ProductCreate, import_product_batch),
+    "suppliers": ImportEntity("suppliers", SupplierCreate, import_supplier_batch),
+    "inventory_levels": ImportEntity("inventory_levels", InventoryLevelSet, import_inventory_level_batch),
+}
+
+@app.post("/import/{entity}")
+async def import_catalog(
+    entity: str,
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$", description="Feed format (default: from Content-Type)"),
+    batch_size: int = Query(1000, ge=1, le=50000, description="Rows written per transaction"),
+    session_factory=Depends(get_session_factory)
+):
+    """
+    Import a CSV or NDJSON feed of products, suppliers or inventory levels.
+
+    Rows are imported in batches while the upload is still arriving: the
+    parser pulls the body chunk by chunk, so neither the feed nor a copy of
+    it is ever held whole. The response streams NDJSON `progress` events
+    after each batch and a final `done` event with the totals and the
+    first row errors.
+
+    The response starts once the body has been read (events from batches
+    written during the upload are queued until then): Starlette's
+    streaming response also listens on the request's receive channel,
+    which would race the body reads.
+    """
+    if entity not in IMPORT_ENTITIES:
+        raise HTTPException(status_code=404, detail=f"Unknown entity '{entity}'. Choose from: {', '.join(IMPORT_ENTITIES)}")
+    fmt = format or detect_format(request.headers.get("content-type"))
+    if fmt is None:
+        raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson, or pass format=csv|ndjson")
+
+    body = AsyncChunkReader(request.stream(), asyncio.get_running_loop())
+    lines: asyncio.Queue = asyncio.Queue()
+
+    async def run_import():
+        rows_written = 0
+        try:
+            with io.TextIOWrapper(io.BufferedReader(body), encoding="utf-8", newline="") as stream:
+                async for progress in import_stream(stream, fmt, IMPORT_ENTITIES[entity], session_factory,
+                                                    batch_size=batch_size):
+                    rows_written = progress.rows_written
+                    if progress.done:
+                        logger.info(f"Imported {progress.rows_written} {entity} ({progress.rows_failed} failed)")
+                        await lines.put(_ndjson_line("done", progress.as_dict()))
+                    else:
+                        await lines.put(_ndjson_line(
+                            "progress", {k: v for k, v in progress.as_dict().items() if k != "errors"}))
+        except Exception as e:
+            logger.error(f"Error importing {entity}: {str(e)}")
+            await lines.put(_ndjson_line("error", {"message": "Import failed", "rows_written": rows_written}))
+        finally:
+            await lines.put(None)
+
+    importing = asyncio.create_task(run_import())
+    body_read = asyncio.create_task(body.finished.wait())
+    await asyncio.wait([importing, body_read], return_when=asyncio.FIRST_COMPLETED)
+    body_read.cancel()
+
+    async def events():
+        try:
+            while (line := await lines.get()) is not None:
+                yield line
+        finally:
+            importing.cancel()  # no-op when finished; otherwise the client went away
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+# ---- Data Export ----
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "2000"))
+
+PRODUCT_EXPORT_TYPES = {
+    "id": "int", "sku": "str", "name": "str", "description": "str", "barcode": "str", "category": "str",
+    "price": "float", "stock": "int", "supplier_id": "int", "reorder_point": "int", "reorder_quantity": "int",
+    "lead_time_days": "int", "is_active": "bool", "created_at": "datetime",
+}
+STOCK_MOVEMENT_EXPORT_TYPES = {
+    "id": "int", "product_id": "int", "warehouse_id": "int", "user_id": "int", "movement_type": "str",
+    "quantity": "int", "reason": "str", "reference_number": "str", "created_at": "datetime",
+}
+
+async def stream_row_batches(session_factory, statement, transform=None):
+    """
+    Yield result rows in batches from a server-side cursor.
+
+    The session stays open for the whole export; `yield_per` keeps only one
+    batch of rows buffered on the client side.
+    """
+    async with session_factory() as db:
+        result = await db.stream(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for partition in result.partitions():
+            yield [transform(row) for row in partition] if transform else [tuple(row) for row in partition]
+
+def export_response(fmt: str, name: str, columns: List[str], batches, types: dict) -> StreamingResponse:
+    """Stream encoded batches as a downloadable file."""
+    if fmt == "parquet" and not parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow to be installed")
+
+    async def body():
+        try:
+            async for chunk in encode_rows(fmt, columns, batches, types):
+                yield chunk
+        except Exception as e:
+            # Headers are already sent; log and end the stream early
+            logger.error(f"Error exporting {name}: {str(e)}")
+            raise
+
+    filename = f"{name}-{datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')}.{fmt}"
+    return StreamingResponse(body(), media_type=EXPORT_MEDIA_TYPES[fmt],
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+@app.get("/export/products")
+async def export_products(
+    format: str = Query("csv", pattern="^(csv|ndjson|parquet)$"),
+    category: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    warehouse_id: Optional[int] = Query(None, description="Only products stocked in this warehouse"),
+    created_from: Optional[datetime] = Query(None, description="Created at or after (ISO 8601)"),
+    created_to: Optional[datetime] = Query(None, description="Created before (ISO 8601)"),
+    session_factory=Depends(get_session_factory)
+):
+    """Stream every matching product as CSV, NDJSON or Parquet (prices in dollars)."""
+    columns = list(PRODUCT_FIELDS)
+    statement = select(*(getattr(Product, column) for column in columns)).order_by(Product.id)
+    if category is not None:
+        statement = statement.where(Product.category == category)
+    if is_active is not None:
+        statement = statement.where(Product.is_active == int(is_active))
+    if warehouse_id is not None:
+        statement = statement.where(Product.id.in_(
+            select(InventoryLevel.product_id).where(InventoryLevel.warehouse_id == warehouse_id)
+        ))
+    if created_from is not None:
+        statement = statement.where(Product.created_at >= created_from)
+    if created_to is not None:
+        statement = statement.where(Product.created_at < created_to)
+
+    def transform(row):
+        return tuple(product_row_to_dict(row._mapping).values())
+
+    batches = stream_row_batches(session_factory, statement, transform)
+    return export_response(format, "products", columns, batches, PRODUCT_EXPORT_TYPES)
+
+@app.get("/export/stock_movements")
+async def export_stock_movements(
+    format: str = Query("csv", pattern="^(csv|ndjson|parquet)$"),
+    start: Optional[datetime] = Query(None, description="Movements at or after this time (ISO 8601)"),
+    end: Optional[datetime] = Query(None, description="Movements before this time (ISO 8601)"),
+    warehouse_id: Optional[int] = None,
+    product_id: Optional[int] = None,
+    movement_type: Optional[str] = None,
+    session_factory=Depends(get_session_factory)
+):
+    """Stream the stock movement ledger as CSV, NDJSON or Parquet, oldest first."""
+    columns = list(STOCK_MOVEMENT_EXPORT_TYPES)
+    statement = (
+        select(*(getattr(StockMovement, column) for column in columns))
+        .order_by(StockMovement.created_at, StockMovement.id)
+    )
+    if start is not None:
+        statement = statement.where(StockMovement.created_at >= start)
+    if end is not None:
+        statement = statement.where(StockMovement.created_at < end)
+    if warehouse_id is not None:
+        statement = statement.where(StockMovement.warehouse_id == warehouse_id)
+    if product_id is not None:
+        statement = statement.where(StockMovement.product_id == product_id)
+    if movement_type is not None:
+        statement = statement.where(func.lower(StockMovement.movement_type) == movement_type.lower())
+
+    batches = stream_row_batches(session_factory, statement)
+    return export_response(format, "stock_movements", columns, batches, STOCK_MOVEMENT_EXPORT_TYPES)
+
+# ---- Stock Movement Ledger ----
+
+class InsufficientStockError(Exception):
+    """A movement would take a warehouse's on-hand quantity below zero."""
+    def __init__(self, product_id: int, warehouse_id: int, delta: int):
+        self.product_id, self.warehouse_id, self.delta = product_id, warehouse_id, delta
+        super().__init__(
+            f"Insufficient stock for product {product_id} in warehouse {warehouse_id} (change of {delta})"
+        )
+
+def movement_ledger_rows(movement: StockMovementCreate) -> List[dict]:
+    """Ledger rows for a movement; a transfer becomes a -q row at the source and a +q row at the destination."""
+    common = {
+        "product_id": movement.product_id,
+        "user_id": movement.user_id,
+        "reason": movement.reason,
+        "reference_number": movement.reference_number,
+        "movement_type": movement.movement_type.lower(),
+    }
+    if movement.movement_type == MovementType.TRANSFER:
+        return [
+            dict(common, warehouse_id=movement.warehouse_id, quantity=-movement.quantity),
+            dict(common, warehouse_id=movement.to_warehouse_id, quantity=movement.quantity),
+        ]
+    return [dict(common, warehouse_id=movement.warehouse_id, quantity=movement.quantity)]
+
+async def apply_inventory_delta(db: AsyncSession, product_id: int, warehouse_id: int, delta: int) -> int:
+    """
+    Atomically add `delta` to a warehouse's on-hand quantity; returns the new quantity.
+
+    Increments are a single upsert (quantity = quantity + delta). Decrements
+    are a guarded UPDATE that only matches while enough stock is on hand, so
+    concurrent writers can never drive the level negative or lose updates.
+    """
+    if delta >= 0:
+        statement = dialect_insert(db, InventoryLevel).values(
+            product_id=product_id, warehouse_id=warehouse_id, quantity=delta
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[InventoryLevel.product_id, InventoryLevel.warehouse_id],
+            set_={"quantity": InventoryLevel.quantity + statement.excluded.quantity,
+                  "last_updated": func.current_timestamp()}
+        ).returning(InventoryLevel.quantity)
+        return (await db.execute(statement)).scalar_one()
+
+    statement = (
+        update(InventoryLevel)
+        .where(InventoryLevel.product_id == product_id,
+               InventoryLevel.warehouse_id == warehouse_id,
+               InventoryLevel.quantity + delta >= 0)
+        .values(quantity=InventoryLevel.quantity + delta, last_updated=func.current_timestamp())
+        .returning(InventoryLevel.quantity)
+        .execution_options(synchronize_session=False)
+    )
+    quantity = (await db.execute(statement)).scalar_one_or_none()
+    if quantity is None:
+        raise InsufficientStockError(product_id, warehouse_id, delta)
+    return quantity
+
+async def apply_product_stock_changes(db: AsyncSession, changes: List[LevelChange]) -> None:
+    """
+    Keep the catalog-wide Product.stock figure in step with inventory level changes.
+
+    Runs in the level writes' transaction. Changes are netted per product
+    (transfers net to zero); each changed product gets an atomic
+    `stock = stock + delta` and a new updated_at, so its ETag changes too.
+    """
+    product_deltas = defaultdict(int)
+    for product_id, _, old_quantity, new_quantity in changes:
+        product_deltas[product_id] += new_quantity - old_quantity
+    if any(product_deltas.values()):
+        await bump_catalog_revision(db)
+    for product_id, delta in sorted(product_deltas.items()):
+        if delta:
+            new_stock = Product.stock + delta
+            await db.execute(
+                update(Product).where(Product.id == product_id)
+                .values(stock=case((new_stock < 0, 0), else_=new_stock), updated_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+
+async def record_stock_movements(db: AsyncSession, movements: List[StockMovementCreate]) -> StockMovementResult:
+    """
+    Append movements to the ledger and apply their net effect to inventory levels.
+
+    Runs in the caller's transaction; the caller commits, or rolls back on
+    error so that either every movement lands or none does. Deltas are netted
+    per (product, warehouse) and applied in key order, which keeps the number
+    of row locks small and acquires them in a consistent order.
+    """
+    product_ids = sorted({m.product_id for m in movements})
+    warehouse_ids = sorted({w for m in movements for w in (m.warehouse_id, m.to_warehouse_id) if w is not None})
+    known_products = set((await db.execute(select(Product.id).where(Product.id.in_(product_ids)))).scalars())
+    known_warehouses = set((await db.execute(select(Warehouse.id).where(Warehouse.id.in_(warehouse_ids)))).scalars())
+    if set(product_ids) - known_products:
+        raise HTTPException(status_code=404, detail=f"Unknown product ids: {sorted(set(product_ids) - known_products)}")
+    if set(warehouse_ids) - known_warehouses:
+        raise HTTPException(status_code=404, detail=f"Unknown warehouse ids: {sorted(set(warehouse_ids) - known_warehouses)}")
+
+    ledger_rows = [row for movement in movements for row in movement_ledger_rows(movement)]
+    level_deltas = defaultdict(int)
+    for row in ledger_rows:
+        level_deltas[(row["product_id"], row["warehouse_id"])] += MovementType.delta(row["movement_type"], row["quantity"])
+
+    levels, changes = [], []
+    for (product_id, warehouse_id), delta in sorted(level_deltas.items()):
+        quantity = await apply_inventory_delta(db, product_id, warehouse_id, delta) if delta else None
+        levels.append((product_id, warehouse_id, quantity))
+        if delta:
+            changes.append((product_id, warehouse_id, quantity - delta, quantity))
+    await apply_stock_total_changes(db, changes)
+
+    await apply_product_stock_changes(db, changes)
+
+    inserted = (await db.execute(
+        insert(StockMovement).returning(StockMovement.__table__), ledger_rows
+    )).mappings().all()
+
+    unchanged = [(p, w) for p, w, q in levels if q is None]
+    if unchanged:
+        current = dict(((p, w), q) for p, w, q in (await db.execute(
+            select(InventoryLevel.product_id, InventoryLevel.warehouse_id, InventoryLevel.quantity)
+            .where(tuple_(InventoryLevel.product_id, InventoryLevel.warehouse_id).in_(unchanged))
+        )).all())
+        levels = [(p, w, q if q is not None else current.get((p, w), 0)) for p, w, q in levels]
+
+    return StockMovementResult(
+        movements=[StockMovementResponse(**row) for row in inserted],
+        levels=[InventoryLevelResponse(product_id=p, warehouse_id=w, quantity=q) for p, w, q in levels],
+    )
+
+async def _commit_stock_movements(db: AsyncSession, movements: List[StockMovementCreate]) -> StockMovementResult:
+    try:
+        result = await record_stock_movements(db, movements)
+        await db.commit()
+        product_count_cache.invalidate()  # stock_lt counts may have changed
+        product_cache.invalidate(movement.product_id for movement in movements)
+        reorder_alert_engine.mark_touched(movement.product_id for movement in movements)
+        llm_cache.invalidate_tags(product_tags({movement.product_id for movement in movements}))
+        return result
+    except InsufficientStockError as e:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+    except HTTPException:
+        await db.rollback()
+        raise
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error recording stock movements: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@app.post("/stock_movements", response_model=StockMovementResult, status_code=status.HTTP_201_CREATED)
+async def create_stock_movement(movement: StockMovementCreate, db: AsyncSession = Depends(get_db)):
+    """Record a stock movement and apply it to inventory levels in the same transaction."""
+    result = await _commit_stock_movements(db, [movement])
+    logger.info(f"Recorded {movement.movement_type} of {movement.quantity} for product {movement.product_id}")
+    return result
+
+@app.post("/stock_movements/batch", response_model=StockMovementResult, status_code=status.HTTP_201_CREATED)
+async def create_stock_movements_batch(batch: StockMovementBatch, db: AsyncSession = Depends(get_db)):
+    """
+    Record many movements in one transaction: all of them apply or none do.
+
+    Returns 409 without writing anything if the batch's net effect would
+    take any warehouse's on-hand quantity below zero.
+    """
+    result = await _commit_stock_movements(db, batch.movements)
+    logger.info(f"Recorded batch of {len(batch.movements)} stock movements")
+    return result
+
+# ---- Stock Totals ----
+
+async def apply_stock_total_changes(db: AsyncSession, changes: List[LevelChange]) -> None:
+    """
+    Add inventory level changes to the materialized product and warehouse totals.
+
+    Must run in the same transaction as the level writes. Each total is an
+    atomic `quantity = quantity + delta` upsert, applied in key order.
+    """
+    products, warehouses = total_deltas(changes)
+    for model, key_column, count_column, deltas in (
+        (ProductStockTotal, "product_id", "warehouses_in_stock", products),
+        (WarehouseStockTotal, "warehouse_id", "products_in_stock", warehouses),
+    ):
+        rows = [
+            {key_column: key, "quantity": quantity, count_column: in_stock}
+            for key, (quantity, in_stock) in sorted(deltas.items()) if quantity or in_stock
+        ]
+        if not rows:
+            continue
+        statement = dialect_insert(db, model)
+        statement = statement.on_conflict_do_update(
+            index_elements=[getattr(model, key_column)],
+            set_={"quantity": model.quantity + statement.excluded.quantity,
+                  count_column: getattr(model, count_column) + statement.excluded[count_column],
+                  "updated_at": func.current_timestamp()}
+        )
+        await db.execute(statement, rows)
+
+@app.get("/stock_totals/products", response_model=List[ProductStockTotalResponse])
+async def list_product_stock_totals(
+    product_id: Optional[List[int]] = Query(None, description="Only these products (repeatable)"),
+    limit: int = Query(1000, ge=1, le=10000),
+    db: AsyncSession = Depends(get_db)
+):
+    """On-hand totals per product across all warehouses, read from the maintained aggregate."""
+    statement = (
+        select(ProductStockTotal.product_id, ProductStockTotal.quantity, ProductStockTotal.warehouses_in_stock,
+               ProductStockTotal.updated_at)
+        .order_by(ProductStockTotal.product_id).limit(limit)
+    )
+    if product_id:
+        statement = statement.where(ProductStockTotal.product_id.in_(product_id))
+    # Up to 10,000 rows of plain columns: encoded directly rather than through the response model
+    return JSONRowsResponse([dict(row) for row in (await db.execute(statement)).mappings()])
+
+@app.get("/stock_totals/warehouses", response_model=List[WarehouseStockTotalResponse])
+async def list_warehouse_stock_totals(db: AsyncSession = Depends(get_db)):
+    """On-hand totals per warehouse across all products, read from the maintained aggregate."""
+    totals = (await db.execute(select(WarehouseStockTotal).order_by(WarehouseStockTotal.warehouse_id))).scalars().all()
+    return [WarehouseStockTotalResponse(warehouse_id=t.warehouse_id, quantity=t.quantity,
+                                        products_in_stock=t.products_in_stock, updated_at=t.updated_at)
+            for t in totals]
+
+@app.get("/stock_totals/verify")
+async def verify_stock_totals_endpoint(
+    source: str = Query("levels", pattern="^(levels|ledger)$",
+                        description="Recompute from inventory levels or from the stock movement ledger"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Recompute the totals in one streaming pass and report any drift from the stored values."""
+    try:
+        connection = await db.connection()
+        return await connection.run_sync(verify_stock_totals, Base.metadata, source)
+    except Exception as e:
+        logger.error(f"Error verifying stock totals: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@app.post("/stock_totals/rebuild")
+async def rebuild_stock_totals_endpoint(
+    source: str = Query("levels", pattern="^(levels|ledger)$",
+                        description="Recompute from inventory levels or from the stock movement ledger"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Replace the stored totals with values recomputed from `source`."""
+    try:
+        connection = await db.connection()
+        products, warehouses = await connection.run_sync(rebuild_stock_totals, Base.metadata, source)
+        await db.commit()
+        logger.info(f"Rebuilt stock totals from {source}: {products} products, {warehouses} warehouses")
+        return {"source": source, "products": products, "warehouses": warehouses}
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error rebuilding stock totals: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+# ---- Reorder Alerts ----
+
+@app.get("/reorder_alerts", response_model=List[ReorderAlertResponse])
+async def list_reorder_alerts(
+    alert_status: str = Query("open", alias="status", pattern="^(open|resolved|all)$"),
+    product_id: Optional[int] = Query(None),
+    warehouse_id: Optional[int] = Query(None),
+    category: Optional[str] = Query(None, description="Only products in this category"),
+    since: Optional[datetime] = Query(None, description="Triggered at or after (ISO 8601)"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db)
+):
+    """Reorder alerts, newest first, with the current on-hand quantity of each level."""
+    statement = (
+        select(ReorderAlert, Product.sku, Product.name, Product.reorder_point, Warehouse.name,
+               func.coalesce(InventoryLevel.quantity, 0))
+        .join(Product, Product.id == ReorderAlert.product_id)
+        .join(Warehouse, Warehouse.id == ReorderAlert.warehouse_id)
+        .outerjoin(InventoryLevel, and_(InventoryLevel.product_id == ReorderAlert.product_id,
+                                        InventoryLevel.warehouse_id == ReorderAlert.warehouse_id))
+        .order_by(ReorderAlert.triggered_at.desc(), ReorderAlert.id.desc())
+        .offset(skip).limit(limit)
+    )
+    if alert_status != "all":
+        statement = statement.where(ReorderAlert.is_resolved == (1 if alert_status == "resolved" else 0))
+    if product_id is not None:
+        statement = statement.where(ReorderAlert.product_id == product_id)
+    if warehouse_id is not None:
+        statement = statement.where(ReorderAlert.warehouse_id == warehouse_id)
+    if category is not None:
+        statement = statement.where(Product.category == category)
+    if since is not None:
+        statement = statement.where(ReorderAlert.triggered_at >= since)
+    try:
+        rows = (await db.execute(statement)).all()
+    except Exception as e:
+        logger.error(f"Error listing reorder alerts: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+    return [
+        ReorderAlertResponse(
+            id=alert.id, product_id=alert.product_id, sku=sku, product_name=name,
+            warehouse_id=alert.warehouse_id, warehouse_name=warehouse_name, quantity=quantity,
+            reorder_point=reorder_point or 0, suggested_quantity=alert.suggested_quantity,
+            triggered_at=alert.triggered_at, is_resolved=bool(alert.is_resolved), resolved_at=alert.resolved_at
+        )
+        for alert, sku, name, reorder_point, warehouse_name, quantity in rows
+    ]
+
+@app.post("/reorder_alerts/evaluate")
+async def evaluate_reorder_alerts_endpoint(
+    full: bool = Query(False, description="Sweep every inventory level instead of only recently touched products"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Run the reorder alert engine now instead of waiting for its next scheduled pass."""
+    try:
+        connection = await db.connection()
+        created, resolved = await reorder_alert_engine.run(connection, full=full)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error evaluating reorder alerts: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+    logger.info(f"Reorder alerts evaluated ({'sweep' if full else 'incremental'}): {created} opened, {resolved} resolved")
+    return {"full": full, "created": created, "resolved": resolved}
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
     return {"status": "healthy", "timestamp": datetime.utcnow()}
 
+@app.get("/health/llm")
+async def llm_readiness_check():
+    """Readiness of the shared LLM clients used by the AI endpoints, plus response cache metrics."""
+    report = dict(llm_registry.status(), cache=llm_cache.metrics(), coalescing=llm_flights.metrics())
+    if not report["ready"]:
+        raise HTTPException(status_code=503, detail=report)
+    return report
+
+@app.get("/health/product_cache")
+async def product_cache_metrics():
+    """Product lookup cache hit/miss counters per key kind and the most-hit products."""
+    return product_cache.metrics()
+
+@app.delete("/product_cache", status_code=status.HTTP_204_NO_CONTENT)
+async def clear_product_cache():
+    """Drop every cached product row."""
+    product_cache.clear()
+    logger.info("Cleared the product cache")
+
+@app.delete("/llm_cache", status_code=status.HTTP_204_NO_CONTENT)
+async def clear_llm_cache():
+    """Drop every cached LLM response (both tiers)."""
+    llm_cache.clear()
+    logger.info("Cleared the LLM response cache")
+
 @app.post("/seed-data")
-async def seed_data(db: Session = Depends(get_db)):
+async def seed_data(db: AsyncSession = Depends(get_db)):
     """Seed the database with sample products for testing."""
     try:
         # Check if data already exists
-        existing_count = db.query(Product).count()
+        existing_count = (await db.execute(select(func.count()).select_from(Product))).scalar_one()
         if existing_count > 0:
             return {"message": f"Database already has {existing_count} products"}
         
@@ -552,11 +2250,12 @@ async def seed_data(db: Session = Depends(get_db)):
             }
         ]
         
-        for product_data in sample_products:
-            db_product = Product(**product_data)
-            db.add(db_product)
-        
-        db.commit()
+        db_products = [Product(**product_data) for product_data in sample_products]
+        db.add_all(db_products)
+        await bump_catalog_revision(db)
+        await db.commit()
+        for db_product in db_products:
+            index_product(db_product)
         logger.info(f"Seeded database with {len(sample_products)} sample products")
         return {"message": f"Successfully seeded {len(sample_products)} products"}
         
@@ -577,8 +2276,8 @@ async def autofill_product_info(request: AutofillRequest):
     - quantity: Extracted quantity if mentioned in description
     """
     try:
-        # Initialize LLM client using utils
-        client, model_name, api_provider = setup_llm_client("gpt-4o")
+        # Shared LLM client from the process-wide registry
+        client, model_name, api_provider = llm_registry.get_async(LLM_MODEL_NAME)
         
         if not client:
             raise HTTPException(
@@ -611,7 +2310,7 @@ Return ONLY valid JSON with these exact field names:
         # Get completion using utils
         logger.info(f"Making LLM API call for description: {request.description[:50]}...")
         
-        ai_response = get_completion(
+        ai_response = await cached_completion(
             prompt=system_prompt,
             client=client,
             model_name=model_name,
@@ -650,61 +2349,197 @@ Return ONLY valid JSON with these exact field names:
         logger.error(f"Unexpected error in autofill: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
-@app.post("/restock_suggestion", response_model=RestockSuggestionResponse)
-async def get_restock_suggestion(request: RestockSuggestionRequest):
+# ---- Demand Forecasting ----
+
+# (product_id, on-hand units, lead time in days, minimum order quantity, configured reorder point)
+ForecastInput = Tuple[int, int, int, int, int]
+
+async def forecast_products(db: AsyncSession, products: List[ForecastInput], settings: ForecastSettings) -> List[dict]:
     """
-    Multi-agent system for restock suggestions.
-    
-    Agent 1 (Analyzer): Analyzes current stock and simulated sales history
-    Agent 2 (Forecaster): Provides restock quantity recommendations  
-    Agent 3 (Reorder Assistant): Generates draft reorder message
+    Forecast demand for `products` from the stock movement ledger.
+
+    Outbound history is summed per product and day in SQL; the forecast
+    itself runs over every product at once in forecasting.py.
     """
+    end = datetime.utcnow().date()
+    start = datetime.combine(end - timedelta(days=settings.history_days - 1), datetime.min.time())
+    day = func.date(StockMovement.created_at)
+    statement = (
+        select(StockMovement.product_id, day, func.sum(StockMovement.quantity))
+        .where(func.lower(StockMovement.movement_type) == "outbound", StockMovement.created_at >= start)
+        .group_by(StockMovement.product_id, day)
+    )
+    product_ids = [product[0] for product in products]
+    if len(product_ids) <= BULK_LOOKUP_CHUNK:
+        statement = statement.where(StockMovement.product_id.in_(product_ids))
+    daily_rows = (await db.execute(statement)).all()
+
+    demand = demand_matrix(product_ids, daily_rows, end, settings.history_days)
+    result = forecast(
+        demand,
+        on_hand=[on_hand for _, on_hand, _, _, _ in products],
+        lead_time_days=[lead_time for _, _, lead_time, _, _ in products],
+        settings=settings,
+        min_order=[min_order for _, _, _, min_order, _ in products],
+        min_reorder_point=[reorder_point for _, _, _, _, reorder_point in products],
+    )
+    return forecast_rows(product_ids, result)
+
+@app.get("/forecast", response_model=List[ForecastResponse])
+async def forecast_demand(
+    product_id: Optional[List[int]] = Query(None, description="Only these products (repeatable)"),
+    sku: Optional[List[str]] = Query(None, description="Only these SKUs (repeatable)"),
+    category: Optional[str] = Query(None, description="Only products in this category"),
+    method: str = Query("sma", pattern="^(sma|ses)$", description="Simple moving average or exponential smoothing"),
+    history_days: int = Query(90, ge=1, le=730, description="Days of outbound history to read"),
+    window: int = Query(28, ge=1, le=365, description="Days averaged by sma (and summed for recent_demand)"),
+    alpha: float = Query(0.3, gt=0, le=1, description="Smoothing factor for ses"),
+    horizon_days: int = Query(28, ge=0, le=365, description="Days of demand an order should cover once it arrives"),
+    service_level: float = Query(0.95, ge=0.5, lt=1, description="Probability of not running out during the lead time"),
+    needs_reorder: bool = Query(False, description="Only products with a positive reorder quantity"),
+    limit: int = Query(1000, ge=1, le=100000),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Demand forecast, safety stock and suggested reorder quantity for active products.
+
+    Computed from OUTBOUND stock movements for every selected SKU in one
+    pass; no LLM is involved.
+    """
+    if not forecasting_available():
+        raise HTTPException(status_code=501, detail="Demand forecasting requires numpy")
+    settings = ForecastSettings(method=method, history_days=history_days, window=window, alpha=alpha,
+                                horizon_days=horizon_days, service_level=service_level)
+    statement = (
+        select(Product.id, Product.sku, Product.name, Product.stock, Product.lead_time_days,
+               Product.reorder_quantity, Product.reorder_point)
+        .where(Product.is_active == 1)
+        .order_by(Product.id)
+    )
+    if product_id:
+        statement = statement.where(Product.id.in_(product_id))
+    if sku:
+        statement = statement.where(Product.sku.in_(sku))
+    if category is not None:
+        statement = statement.where(Product.category == category)
     try:
-        # Initialize LLM client using utils
-        client, model_name, api_provider = setup_llm_client("gpt-4o")
-        
-        if not client:
-            raise HTTPException(
-                status_code=503, 
-                detail="Restock suggestion service unavailable: LLM client could not be initialized. Check your API keys in .env file."
-            )
-        
-        # Step 1: Agent 1 (Analyzer) - Analyze current stock and sales history
-        logger.info(f"Agent 1 analyzing stock for: {request.product_name}")
-        
-        # Check if quantity is below threshold
-        low_stock_threshold = 5
-        is_low_stock = request.quantity < low_stock_threshold
-        
-        # Simulate sales history lookup (placeholder data)
-        import random
-        simulated_monthly_sales = random.randint(8, 25)  # Simulate 8-25 units sold per month
-        
-        # Agent 1 output
-        analyzer_summary = (
-            f"Product '{request.product_name}' in category '{request.category}' "
-            f"currently has {request.quantity} units. "
-            f"{'LOW STOCK ALERT: ' if is_low_stock else ''}"
-            f"Sold {simulated_monthly_sales} units last month."
+        products = (await db.execute(statement)).all()
+        forecasts = await forecast_products(
+            db, [(p.id, p.stock or 0, p.lead_time_days or 0, p.reorder_quantity or 0, p.reorder_point or 0)
+                 for p in products], settings
         )
-        
-        # Step 2: Agent 2 (Forecaster) - Use LLM to suggest restock quantity
-        logger.info(f"Agent 2 forecasting restock needs...")
-        
-        forecasting_question = "How many units should we reorder to avoid running out in the next 4 weeks?"
-        
-        forecasting_response = get_completion(
-            prompt=f"You are an inventory forecasting expert. Based on this data: {analyzer_summary}\n\nQuestion: {forecasting_question}\n\nProvide a BRIEF, direct recommendation in 1-2 sentences maximum. Format: 'Order X units. [Short reason].' Be concise and specific.",
+    except Exception as e:
+        logger.error(f"Error forecasting demand: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+    results = []
+    for product, row in zip(products, forecasts):
+        if needs_reorder and not row["reorder_quantity"]:
+            continue
+        results.append(ForecastResponse(sku=product.sku, name=product.name, on_hand=product.stock or 0,
+                                        lead_time_days=product.lead_time_days or 0, **row))
+        if len(results) >= limit:
+            break
+    return results
+
+# ---- LLM Calls ----
+
+def is_llm_error(text: Optional[str]) -> bool:
+    """True for the placeholder strings the utils completion helpers return instead of raising."""
+    return not text or text.startswith("An API error occurred") or text == "API client not initialized."
+
+async def cached_completion(prompt: str, client, model_name: str, api_provider: str, temperature: float = 0.7,
+                            tags=(), ttl: Optional[float] = None) -> str:
+    """
+    get_completion_async behind the LLM response cache and request coalescing.
+
+    On a cache miss, concurrent callers with the same key share one
+    upstream call. `tags` name the objects the prompt was built from (see
+    product_tags) so their writes invalidate the entry. Error responses
+    are not cached.
+    """
+    key = cache_key(model_name, api_provider, temperature, prompt)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        return cached
+
+    async def fetch() -> str:
+        generation = llm_cache.generation
+        response = await get_completion_async(
+            prompt=prompt,
             client=client,
             model_name=model_name,
             api_provider=api_provider,
-            temperature=0.3
+            temperature=temperature
         )
-        
-        # Step 3: Agent 3 (Reorder Assistant) - Generate draft reorder message
-        logger.info(f"Agent 3 generating reorder message...")
-        
-        reorder_prompt = f"""
+        if not is_llm_error(response):
+            llm_cache.put(key, response, tags=tags, ttl=ttl, generation=generation)
+        return response
+
+    try:
+        return await llm_flights.do(key, fetch, timeout=LLM_COALESCE_TIMEOUT)
+    except asyncio.TimeoutError:
+        return f"An API error occurred: request timed out after {LLM_COALESCE_TIMEOUT:g}s"
+    except Exception as e:
+        return f"An API error occurred: {e}"
+
+# ---- Restock Agent Helpers ----
+
+# Forecast used by the restock agents: four weeks of cover after the lead time
+RESTOCK_FORECAST = ForecastSettings(method=os.getenv("RESTOCK_FORECAST_METHOD", "sma"))
+
+async def forecast_restock_request(db: AsyncSession, request: RestockSuggestionRequest) -> dict:
+    """Forecast the requested SKU from its ledger history, taking the caller's stock figure as on hand."""
+    if not forecasting_available():
+        raise HTTPException(status_code=503, detail="Restock suggestion service unavailable: forecasting requires numpy")
+    product = (await db.execute(
+        select(Product.id, Product.lead_time_days, Product.reorder_quantity, Product.reorder_point)
+        .where(Product.sku == request.sku)
+    )).first()
+    if product is None:
+        raise HTTPException(status_code=404, detail=f"Product with SKU {request.sku} not found")
+    lead_time = product.lead_time_days or 0
+    [row] = await forecast_products(
+        db, [(product.id, request.quantity, lead_time, product.reorder_quantity or 0, product.reorder_point or 0)],
+        RESTOCK_FORECAST
+    )
+    row["lead_time_days"] = lead_time
+    return row
+
+def analyze_restock_request(request: RestockSuggestionRequest, forecast_row: dict) -> str:
+    """Agent 1 (Analyzer): summarize current stock and recent sales from the ledger."""
+    is_low_stock = request.quantity <= forecast_row["reorder_point"]
+    return (
+        f"Product '{request.product_name}' in category '{request.category}' "
+        f"currently has {request.quantity} units. "
+        f"{'LOW STOCK ALERT: ' if is_low_stock else ''}"
+        f"Sold {forecast_row['recent_demand']} units in the last {RESTOCK_FORECAST.window} days."
+    )
+
+def restock_recommendation(forecast_row: dict) -> str:
+    """Agent 2 (Forecaster): the order quantity and the reason for it, from the demand forecast."""
+    quantity = forecast_row["reorder_quantity"]
+    if not quantity:
+        cover = forecast_row["days_of_cover"]
+        reason = ("No outbound demand recorded recently." if cover is None
+                  else f"Current stock covers about {cover:g} days of demand.")
+        return f"Order 0 units. {reason}"
+    return (
+        f"Order {quantity} units. Covers the {forecast_row['lead_time_days']}-day lead time plus "
+        f"{RESTOCK_FORECAST.horizon_days} days at about {forecast_row['daily_demand']:g} units/day, "
+        f"with {forecast_row['safety_stock']} units of safety stock."
+    )
+
+def template_reorder_message(request: RestockSuggestionRequest, quantity: int) -> str:
+    """Agent 3 without the LLM: a fixed-format reorder request."""
+    return (
+        f"Please arrange a reorder for {request.product_name} (SKU: {request.sku}), quantity: {quantity} units. "
+        f"Contact supplier: [Supplier Name] at [Contact Info]."
+    )
+
+def build_reorder_prompt(request: RestockSuggestionRequest, forecasting_recommendation: str) -> str:
+    """Agent 3 (Reorder Assistant) prompt."""
+    return f"""
 You are a purchasing assistant. Generate a short, professional message requesting a reorder for the given product.
 
 Product Details:
@@ -712,7 +2547,7 @@ Product Details:
 - SKU: {request.sku}
 - Category: {request.category}
 - Current Stock: {request.quantity}
-- Forecasting Recommendation: {forecasting_response}
+- Forecasting Recommendation: {forecasting_recommendation}
 
 Generate a concise reorder request message that includes:
 - Product name and SKU
@@ -722,194 +2557,396 @@ Generate a concise reorder request message that includes:
 
 Keep it brief and actionable.
 """
-        
-        reorder_message = get_completion(
-            prompt=reorder_prompt,
-            client=client,
-            model_name=model_name,
-            api_provider=api_provider,
-            temperature=0.4
-        )
-        
-        # Combine all agent outputs
-        response = RestockSuggestionResponse(
+
+def restock_llm(request):
+    """(client, model_name, api_provider) for phrasing the reorder message, or Nones to use the template."""
+    if not request.use_llm:
+        return None, None, None
+    return llm_registry.get_async(LLM_MODEL_NAME)
+
+def _ndjson_line(event: str, data=None) -> bytes:
+    return (json.dumps({"event": event, "data": data}) + "\n").encode("utf-8")
+
+async def _restock_event_stream(request: RestockSuggestionRequest, forecast_row: dict, client, model_name, api_provider):
+    """
+    Yield NDJSON events for the restock pipeline.
+
+    The analyzer summary and the forecast are computed up front and sent
+    immediately; only the reorder message streams, token by token, when
+    the LLM phrases it.
+    """
+    yield _ndjson_line("analyzer_summary", analyze_restock_request(request, forecast_row))
+    recommendation = restock_recommendation(forecast_row)
+    yield _ndjson_line("restock_suggestion", recommendation)
+    try:
+        prompt = build_reorder_prompt(request, recommendation)
+        key = cache_key(model_name, api_provider, 0.4, prompt) if client else None
+        cached = llm_cache.get(key) if client else None
+        if cached is not None:
+            yield _ndjson_line("reorder_token", cached)
+            reorder_message = cached
+        elif client:
+            parts, failed = [], False
+            generation = llm_cache.generation
+            async for chunk in stream_completion_async(
+                prompt=prompt,
+                client=client,
+                model_name=model_name,
+                api_provider=api_provider,
+                temperature=0.4
+            ):
+                failed = failed or is_llm_error(chunk)
+                parts.append(chunk)
+                yield _ndjson_line("reorder_token", chunk)
+            reorder_message = "".join(parts).strip()
+            if not failed and reorder_message:
+                llm_cache.put(key, reorder_message, tags=product_tags([forecast_row["product_id"]]),
+                              generation=generation)
+        else:
+            reorder_message = template_reorder_message(request, forecast_row["reorder_quantity"])
+        yield _ndjson_line("reorder_message", reorder_message)
+    except Exception as e:
+        logger.error(f"Unexpected error in restock_suggestion stream: {str(e)}")
+        yield _ndjson_line("error", "Internal server error")
+        return
+    logger.info(f"Successfully streamed restock suggestion for {request.product_name}")
+    yield _ndjson_line("done")
+
+@app.post("/restock_suggestion", response_model=RestockSuggestionResponse)
+async def get_restock_suggestion(request: RestockSuggestionRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Multi-agent system for restock suggestions.
+
+    Agent 1 (Analyzer): Summarizes current stock and recent sales from the ledger
+    Agent 2 (Forecaster): Computes the order quantity from a demand forecast (no LLM call)
+    Agent 3 (Reorder Assistant): Drafts the reorder message, with the LLM when
+    `use_llm` is set and a client is configured, otherwise from a template
+    """
+    try:
+        forecast_row = await forecast_restock_request(db, request)
+        analyzer_summary = analyze_restock_request(request, forecast_row)
+        recommendation = restock_recommendation(forecast_row)
+
+        client, model_name, api_provider = restock_llm(request)
+        if client:
+            logger.info(f"Agent 3 generating reorder message...")
+            reorder_message = (await cached_completion(
+                prompt=build_reorder_prompt(request, recommendation),
+                client=client,
+                model_name=model_name,
+                api_provider=api_provider,
+                temperature=0.4,
+                tags=product_tags([forecast_row["product_id"]])
+            )).strip()
+        else:
+            reorder_message = template_reorder_message(request, forecast_row["reorder_quantity"])
+
+        logger.info(f"Successfully processed restock suggestion for {request.product_name}")
+        return RestockSuggestionResponse(
             analyzer_summary=analyzer_summary,
-            restock_suggestion=forecasting_response.strip(),
-            reorder_message=reorder_message.strip()
+            restock_suggestion=recommendation,
+            suggested_quantity=forecast_row["reorder_quantity"],
+            reorder_message=reorder_message
         )
-        
-        logger.info(f"Successfully processed restock suggestion for {request.product_name}")
-        return response
-        
+
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Unexpected error in restock_suggestion: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@app.post("/restock_suggestion/stream")
+async def stream_restock_suggestion(request: RestockSuggestionRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Streaming variant of /restock_suggestion (NDJSON, one event per line).
+
+    Events, in order: analyzer_summary, restock_suggestion, reorder_token*
+    (only when the LLM phrases the message), reorder_message, then done
+    (or error).
+    """
+    forecast_row = await forecast_restock_request(db, request)
+    return StreamingResponse(
+        _restock_event_stream(request, forecast_row, *restock_llm(request)),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# ---- Batch Restock Suggestions ----
+
+# Products phrased per LLM prompt, and packed prompts in flight at once, for /restock_suggestion/batch
+RESTOCK_PACK_SIZE = int(os.getenv("RESTOCK_PACK_SIZE", "10"))
+RESTOCK_BATCH_CONCURRENCY = int(os.getenv("RESTOCK_BATCH_CONCURRENCY", "4"))
+# Products selected by a filter are capped at this many (most urgent first)
+RESTOCK_BATCH_MAX = 1000
+
+# (product_id, per-product request, forecast row)
+RestockBatchEntry = Tuple[int, RestockSuggestionRequest, dict]
+
+async def prepare_restock_batch(db: AsyncSession, batch: RestockBatchRequest) -> Tuple[List[RestockBatchEntry], List[str]]:
+    """Select the batch's products and forecast them in one pass; returns the entries and the unknown SKUs."""
+    statement = select(Product.id, Product.sku, Product.name, Product.category, Product.stock,
+                       Product.lead_time_days, Product.reorder_quantity, Product.reorder_point)
+    if batch.skus:
+        statement = statement.where(Product.sku.in_(set(batch.skus)))
+    else:
+        statement = statement.where(Product.is_active == 1)
+    if batch.category is not None:
+        statement = statement.where(Product.category == batch.category)
+    if batch.below_reorder_point:
+        statement = statement.where(Product.reorder_point > 0, Product.stock <= Product.reorder_point)
+    products = (await db.execute(statement.order_by(Product.id))).all()
+    if batch.skus:
+        by_sku = {product.sku: product for product in products}
+        products = [by_sku[sku] for sku in dict.fromkeys(batch.skus) if sku in by_sku]
+        missing = [sku for sku in dict.fromkeys(batch.skus) if sku not in by_sku]
+    else:
+        missing = []
+
+    forecasts = await forecast_products(
+        db, [(p.id, p.stock or 0, p.lead_time_days or 0, p.reorder_quantity or 0, p.reorder_point or 0)
+             for p in products], RESTOCK_FORECAST
+    )
+    entries = []
+    for product, row in zip(products, forecasts):
+        if batch.needs_reorder and not row["reorder_quantity"]:
+            continue
+        row["lead_time_days"] = product.lead_time_days or 0
+        request = RestockSuggestionRequest(product_name=product.name, sku=product.sku, category=product.category or "",
+                                           quantity=product.stock or 0, use_llm=batch.use_llm)
+        entries.append((product.id, request, row))
+    if not batch.skus and len(entries) > RESTOCK_BATCH_MAX:
+        # Least days of cover first; products with no demand sort last
+        entries.sort(key=lambda entry: (entry[2]["days_of_cover"] is None, entry[2]["days_of_cover"] or 0))
+        logger.warning(f"Restock batch filter matched {len(entries)} products; keeping the {RESTOCK_BATCH_MAX} most urgent")
+        entries = entries[:RESTOCK_BATCH_MAX]
+    return entries, missing
+
+def build_packed_reorder_prompt(entries: List[RestockBatchEntry]) -> str:
+    """Agent 3 (Reorder Assistant) prompt for several products at once, answered as a JSON array."""
+    products = [
+        {"sku": request.sku, "name": request.product_name, "category": request.category,
+         "current_stock": request.quantity, "recommendation": restock_recommendation(row)}
+        for _, request, row in entries
+    ]
+    return f"""
+You are a purchasing assistant. For each product below, write a short, professional message requesting a reorder.
+
+Each message must include:
+- Product name and SKU
+- Suggested quantity to order (from the recommendation)
+- Placeholder fields for supplier information
+- Professional tone
+
+Products (JSON):
+{json.dumps(products, indent=2)}
+
+Respond with ONLY a JSON array containing one object per product, in the same order, shaped like
+[{{"sku": "<sku>", "reorder_message": "<message>"}}]
+"""
+
+def parse_packed_reorder_messages(response: str) -> dict:
+    """SKU -> reorder message from a packed prompt's response; anything unparseable maps to nothing."""
+    try:
+        parsed = json.loads(clean_llm_output(response, 'json'))
+    except (TypeError, ValueError):
+        return {}
+    if not isinstance(parsed, list):
+        return {}
+    return {
+        str(item["sku"]): item["reorder_message"].strip()
+        for item in parsed
+        if isinstance(item, dict) and item.get("sku") is not None and isinstance(item.get("reorder_message"), str)
+        and item["reorder_message"].strip()
+    }
+
+def _restock_batch_item(product_id: int, request: RestockSuggestionRequest, row: dict,
+                        message: Optional[str]) -> RestockBatchItem:
+    return RestockBatchItem(
+        sku=request.sku,
+        product_id=product_id,
+        product_name=request.product_name,
+        analyzer_summary=analyze_restock_request(request, row),
+        restock_suggestion=restock_recommendation(row),
+        suggested_quantity=row["reorder_quantity"],
+        reorder_message=message or template_reorder_message(request, row["reorder_quantity"]),
+        message_source="llm" if message else "template",
+    )
+
+async def phrase_restock_batch(entries: List[RestockBatchEntry], client, model_name, api_provider,
+                               pack_size: int):
+    """
+    Yield lists of batch items as each packed prompt completes.
+
+    Products are packed `pack_size` to a prompt and at most
+    RESTOCK_BATCH_CONCURRENCY prompts run at once. Products the model
+    leaves out of its answer, or whose prompt fails, get the template
+    message. Without a client every item uses the template.
+    """
+    if not client:
+        if entries:
+            yield [_restock_batch_item(product_id, request, row, None) for product_id, request, row in entries]
+        return
+    semaphore = asyncio.Semaphore(RESTOCK_BATCH_CONCURRENCY)
+
+    async def phrase(pack: List[RestockBatchEntry]) -> List[RestockBatchItem]:
+        async with semaphore:
+            response = await cached_completion(
+                prompt=build_packed_reorder_prompt(pack),
+                client=client,
+                model_name=model_name,
+                api_provider=api_provider,
+                temperature=0.4,
+                tags=product_tags(product_id for product_id, _, _ in pack)
+            )
+        messages = parse_packed_reorder_messages(response)
+        if len(messages) < len(pack):
+            logger.warning(f"Packed reorder prompt answered {len(messages)} of {len(pack)} products; using templates")
+        return [_restock_batch_item(product_id, request, row, messages.get(request.sku))
+                for product_id, request, row in pack]
+
+    tasks = [asyncio.create_task(phrase(pack)) for pack in _chunks(entries, pack_size)]
+    try:
+        for next_pack in asyncio.as_completed(tasks):
+            yield await next_pack
+    finally:
+        for task in tasks:
+            task.cancel()
+
+@app.post("/restock_suggestion/batch", response_model=RestockBatchResponse)
+async def restock_suggestion_batch(
+    batch: RestockBatchRequest,
+    stream: bool = Query(False, description="Stream NDJSON `suggestion` events as each pack completes"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Restock suggestions for many products in one request.
+
+    Select products by `skus` or by a filter (`below_reorder_point`,
+    `needs_reorder`, `category`). Quantities come from one forecast pass
+    over all of them; reorder messages are phrased by the LLM several
+    products per prompt, with a bounded number of prompts in flight.
+    Unknown SKUs are reported as items with an `error`.
+    """
+    try:
+        entries, missing = await prepare_restock_batch(db, batch)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error preparing restock batch: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+    client, model_name, api_provider = restock_llm(batch)
+    pack_size = batch.pack_size or RESTOCK_PACK_SIZE
+    missing_items = [RestockBatchItem(sku=sku, error="Product not found") for sku in missing]
+    logger.info(f"Restock batch: {len(entries)} products, {len(missing)} unknown SKUs")
+
+    if stream:
+        async def events():
+            try:
+                for item in missing_items:
+                    yield _ndjson_line("suggestion", item.dict())
+                async for items in phrase_restock_batch(entries, client, model_name, api_provider, pack_size):
+                    for item in items:
+                        yield _ndjson_line("suggestion", item.dict())
+            except Exception as e:
+                logger.error(f"Unexpected error in restock_suggestion batch stream: {str(e)}")
+                yield _ndjson_line("error", "Internal server error")
+                return
+            yield _ndjson_line("done", {"products": len(entries), "missing": len(missing)})
+        return StreamingResponse(events(), media_type="application/x-ndjson",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    try:
+        phrased = {}
+        async for items in phrase_restock_batch(entries, client, model_name, api_provider, pack_size):
+            phrased.update((item.sku, item) for item in items)
+    except Exception as e:
+        logger.error(f"Unexpected error in restock_suggestion batch: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+    return RestockBatchResponse(items=[phrased[request.sku] for _, request, _ in entries] + missing_items)
+
 @app.post("/ask_inventory", response_model=InventoryQuestionResponse)
-async def ask_inventory_question(request: InventoryQuestionRequest, db: Session = Depends(get_db)):
+async def ask_inventory_question(request: InventoryQuestionRequest, db: AsyncSession = Depends(get_db)):
     """
     Answer questions about inventory using keyword matching and LLM processing.
     
     This endpoint:
-    1. Loads all products from the database
-    2. Converts each product to readable text
-    3. Uses keyword matching to find relevant products
-    4. Uses LLM to generate a natural language answer
+    1. Finds relevant products via indexed SQL filters, or the keyword search
+       index and vector similarity merged by reciprocal-rank fusion
+    2. Converts the top matches to readable text
+    3. Uses LLM to generate a natural language answer
     """
     try:
-        # Step 1: Connect to inventory.db and load all product records
+        # Step 1: Make sure the search index over the products table is built
         logger.info(f"Processing inventory question: {request.question}")
-        products = db.query(Product).all()
+        if not inventory_index.ready:
+            await db.run_sync(rebuild_search_index)
+        await sync_search_index(db)
         
-        if not products:
+        if len(inventory_index) == 0:
             return InventoryQuestionResponse(
                 answer="I don't have any product information available in the inventory database."
             )
         
-        # Step 2: Convert each record into readable sentences
-        product_texts = []
-        for product in products:
-            text = format_product_for_embedding(product)
-            product_texts.append((product, text))
-        
-        logger.info(f"Formatted {len(product_texts)} products for analysis")
-        
-        # Step 3: Smart keyword-based filtering for relevant products
+        # Step 2: Smart keyword-based filtering for relevant products.
+        # Status and category questions become indexed SQL lookups; free-text
+        # questions are scored against the search index.
         question_lower = request.question.lower()
+        query = select(Product)
+        statement = None
         relevant_products = []
         
         # Check for specific status/condition keywords first
         if "out of stock" in question_lower or "zero" in question_lower or "empty" in question_lower:
-            relevant_products = [(product, text) for product, text in product_texts if product.stock == 0]
+            statement = query.where(Product.stock == 0).order_by(Product.id).limit(3)
         elif "low inventory" in question_lower or "low stock" in question_lower:
-            relevant_products = [(product, text) for product, text in product_texts if 0 < product.stock <= 10]
+            statement = query.where(Product.stock > 0, Product.stock <= 10).order_by(Product.id).limit(3)
         elif "expensive" in question_lower or "highest price" in question_lower or "most expensive" in question_lower:
-            sorted_products = sorted(product_texts, key=lambda x: x[0].price or 0, reverse=True)
-            relevant_products = sorted_products[:3]
+            statement = query.order_by(func.coalesce(Product.price, 0).desc(), Product.id).limit(3)
         elif "cheap" in question_lower or "lowest price" in question_lower or "least expensive" in question_lower:
-            sorted_products = sorted(product_texts, key=lambda x: x[0].price or 0)
-            relevant_products = sorted_products[:3]
+            statement = query.order_by(func.coalesce(Product.price, 0), Product.id).limit(3)
         # Check for category keywords
         elif "electronics" in question_lower:
-            relevant_products = [(product, text) for product, text in product_texts if product.category and "electronics" in product.category.lower()]
+            statement = query.where(func.lower(Product.category).contains("electronics")).order_by(Product.id).limit(3)
         elif "furniture" in question_lower:
-            relevant_products = [(product, text) for product, text in product_texts if product.category and "furniture" in product.category.lower()]
+            statement = query.where(func.lower(Product.category).contains("furniture")).order_by(Product.id).limit(3)
         elif "apparel" in question_lower or "clothing" in question_lower:
-            relevant_products = [(product, text) for product, text in product_texts if product.category and "apparel" in product.category.lower()]
+            statement = query.where(func.lower(Product.category).contains("apparel")).order_by(Product.id).limit(3)
         elif "wellness" in question_lower or "health" in question_lower:
-            relevant_products = [(product, text) for product, text in product_texts if product.category and "wellness" in product.category.lower()]
+            statement = query.where(func.lower(Product.category).contains("wellness")).order_by(Product.id).limit(3)
         else:
             # Search for specific product names/terms in the question
-            # Extract potential product search terms (ignore common words)
-            import re
-            common_words = {'do', 'we', 'have', 'any', 'is', 'are', 'there', 'what', 'which', 'how', 'many', 'much', 'the', 'a', 'an', 'of', 'in', 'on', 'at', 'to', 'for', 'with', 'by', 'show', 'me', 'get', 'find', 'list', 'tell', 'give', 'available', 'products', 'items', 'stock', 'inventory'}
-            
-            # Add synonym mapping for common product types
-            synonyms = {
-                'laptop': ['macbook', 'notebook', 'computer', 'programming'],
-                'laptops': ['macbook', 'macbooks', 'notebooks', 'computers'],
-                'phone': ['smartphone', 'mobile', 'iphone', 'android'],
-                'tablet': ['ipad'],
-                'headphones': ['earphones', 'earbuds', 'headset'],
-                'watch': ['smartwatch'],
-                'computer': ['pc', 'desktop', 'laptop', 'macbook', 'programming'],
-                'computers': ['pcs', 'desktops', 'laptops', 'macbooks']
-            }
-            
-            # Extract words and also handle common variations
-            question_words = re.findall(r'\b\w+\b', question_lower)
-            search_terms = []
-            
-            for word in question_words:
-                if len(word) > 2 and word not in common_words:
-                    search_terms.append(word)
-                    # Add singular/plural variations
-                    if word.endswith('s') and len(word) > 3:
-                        singular = word[:-1]
-                        if singular not in search_terms:
-                            search_terms.append(singular)
-                    elif not word.endswith('s'):
-                        plural = word + 's'
-                        if plural not in search_terms:
-                            search_terms.append(plural)
-                    
-                    # Add synonyms
-                    if word in synonyms:
-                        for synonym in synonyms[word]:
-                            if synonym not in search_terms:
-                                search_terms.append(synonym)
-            
-            # Score products based on how many search terms match
-            product_scores = []
-            for product, text in product_texts:
-                score = 0
-                text_lower = text.lower()
-                name_lower = product.name.lower()
-                sku_lower = product.sku.lower()
-                category_lower = (product.category or '').lower()
-                description_lower = (product.description or '').lower()
-                
-                for term in search_terms:
-                    # Higher score for exact name matches
-                    if term in name_lower:
-                        score += 10
-                    # Medium score for SKU matches
-                    elif term in sku_lower:
-                        score += 5
-                    # Good score for description matches (increased from 3 to 6)
-                    elif term in description_lower:
-                        score += 6
-                    # Lower score for category matches
-                    elif term in category_lower:
-                        score += 2
-                    
-                    # Special handling for partial matches in product names
-                    # This helps with "macbook" matching "MacBook Pro 16-Inch"
-                    name_words = name_lower.split()
-                    for name_word in name_words:
-                        if term in name_word or name_word in term:
-                            score += 8
-                    
-                    # Also check description words for better matching
-                    # This helps with "laptop" finding "programming" descriptions
-                    if description_lower:
-                        desc_words = description_lower.split()
-                        for desc_word in desc_words:
-                            if len(desc_word) > 3 and (term in desc_word or desc_word in term):
-                                score += 4
-                
-                if score > 0:
-                    product_scores.append((score, product, text))
-            
-            # Sort by score and take top matches
-            if product_scores:
-                product_scores.sort(key=lambda x: x[0], reverse=True)
-                relevant_products = [(product, text) for score, product, text in product_scores[:5]]
-            else:
-                # If no matches found, return all products (general inventory question)
-                relevant_products = product_texts[:5]
+            search_terms = extract_search_terms(question_lower)
+            rankings = [inventory_index.search(search_terms, limit=ASK_INVENTORY_CANDIDATES)]
+            if product_vectors is not None:
+                rankings.append(product_vectors.search(request.question, k=ASK_INVENTORY_CANDIDATES))
+            ranked_ids = fuse_rankings(*rankings, limit=3)
+            if ranked_ids:
+                by_id = {p.id: p for p in (await db.execute(query.where(Product.id.in_(ranked_ids)))).scalars()}
+                relevant_products = [by_id[pid] for pid in ranked_ids if pid in by_id]
+                for product_id in set(ranked_ids) - set(by_id):
+                    unindex_product(product_id)  # deleted by another worker
+        if statement is not None:
+            relevant_products = (await db.execute(statement)).scalars().all()
         
-        # Step 4: If no specific matches, fall back to all products
+        # Step 3: If no specific matches, fall back to the first products
         if not relevant_products:
-            relevant_products = product_texts[:3]
+            relevant_products = (await db.execute(query.order_by(Product.id).limit(3))).scalars().all()
         
-        # Step 5: Limit to top 3 most relevant
+        # Step 4: Limit to top 3 most relevant
         top_3_products = relevant_products[:3]
         
         logger.info(f"Found {len(top_3_products)} relevant products")
         
-        # Step 6: Create context string from relevant products
+        # Step 5: Create context string from relevant products
         context_parts = []
-        for product, text in top_3_products:
-            context_parts.append(f"Product: {text}")
+        for product in top_3_products:
+            context_parts.append(f"Product: {format_product_for_embedding(product)}")
         
         context = "\n".join(context_parts)
         
-        # Step 7: Generate answer using LLM
+        # Step 6: Generate answer using LLM
         try:
-            client, model_name, api_provider = setup_llm_client("gpt-4o")
+            client, model_name, api_provider = llm_registry.get_async(LLM_MODEL_NAME)
             
             if not client:
                 raise HTTPException(
@@ -928,12 +2965,14 @@ User Question: {request.question}
 Please provide a clear, informative answer based on the inventory data provided. If the question asks about specific products, include relevant details like names, SKUs, quantities, categories, and prices. Be specific and helpful in your response.
 """
             
-            answer = get_completion(
+            answer = await cached_completion(
                 prompt=prompt,
                 client=client,
                 model_name=model_name,
                 api_provider=api_provider,
-                temperature=0.3
+                temperature=0.3,
+                tags=product_tags(product.id for product in top_3_products),
+                ttl=ASK_INVENTORY_CACHE_TTL
             )
             
             if not answer:
@@ -946,7 +2985,7 @@ Please provide a clear, informative answer based on the inventory data provided.
                 detail="AI service unavailable: Could not generate answer. Check your OpenAI API key in .env file."
             )
         
-        # Step 8: Return the answer in JSON response
+        # Step 7: Return the answer in JSON response
         logger.info("Successfully processed inventory question")
         return InventoryQuestionResponse(answer=answer.strip())
         
@@ -960,12 +2999,44 @@ Please provide a clear, informative answer based on the inventory data provided.
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database tables on startup."""
+    """Migrate the database schema, build the search index and warm LLM clients on startup."""
+    asyncio.get_running_loop().set_default_executor(db_executor)
     try:
-        Base.metadata.create_all(bind=engine)
-        logger.info("Database tables created successfully")
+        async with engine.begin() as connection:
+            applied = await connection.run_sync(run_migrations, Base.metadata)
+        logger.info(f"Database schema up to date (applied migrations: {applied or 'none'})")
     except Exception as e:
-        logger.error(f"Error creating database tables: {str(e)}")
+        logger.error(f"Error migrating database schema: {str(e)}")
+
+    if product_vectors is not None and EMBEDDING_STORE_PATH:
+        if product_vectors.load(EMBEDDING_STORE_PATH):
+            logger.info(f"Loaded {len(product_vectors)} product vectors from {EMBEDDING_STORE_PATH}")
+
+    try:
+        async with SessionLocal() as db:
+            await db.run_sync(rebuild_search_index)
+    except Exception as e:
+        logger.error(f"Error building search index: {str(e)}")
+
+    llm_registry.warm_up([LLM_MODEL_NAME])
+    if not llm_registry.status()["ready"]:
+        logger.warning("LLM client not ready; AI endpoints will return 503 until API keys are configured")
+
+    reorder_alert_engine.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background work, release pooled LLM and database connections and persist product vectors."""
+    await reorder_alert_engine.stop()
+    await llm_registry.aclose()
+    llm_cache.close()
+    product_cache.close()
+    await engine.dispose()
+    if product_vectors is not None and EMBEDDING_STORE_PATH:
+        try:
+            product_vectors.save(EMBEDDING_STORE_PATH)
+        except Exception as e:
+            logger.error(f"Error saving product vectors: {str(e)}")
 
 # ---- Main Entry Point ----
 
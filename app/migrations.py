@@ -0,0 +1,134 @@
+"""
+Versioned schema migrations for the inventory database.
+
+Applied versions are recorded in the `schema_migrations` table. On startup
+`run_migrations` applies every migration newer than the recorded versions,
+in order, inside the caller's transaction. Migrations must be safe to run
+against a database whose tables were created from the current models
+(fresh installs get the full schema from the initial migration), so
+index/column changes use IF NOT EXISTS or check the live schema first.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence
+
+from sqlalchemy import DateTime, MetaData, inspect, text
+from sqlalchemy.engine import Connection
+
+from stock_totals import rebuild_stock_totals
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Migration:
+    """A schema change: optional Python step followed by SQL statements."""
+    version: int
+    name: str
+    statements: Sequence[str] = ()
+    run: Optional[Callable[[Connection, MetaData], None]] = None
+
+
+def _create_initial_schema(connection: Connection, metadata: MetaData) -> None:
+    # Replaces the old bare create_all; a no-op for tables that already exist
+    metadata.create_all(connection)
+
+
+def _create_stock_totals(connection: Connection, metadata: MetaData) -> None:
+    tables = [metadata.tables["product_stock_totals"], metadata.tables["warehouse_stock_totals"]]
+    metadata.create_all(connection, tables=tables)
+    rebuild_stock_totals(connection, metadata, source="levels")
+
+
+def _add_product_updated_at(connection: Connection, metadata: MetaData) -> None:
+    # Fresh installs already have the column from the models
+    if any(column["name"] == "updated_at" for column in inspect(connection).get_columns("products")):
+        return
+    # SQLite cannot add a column with a CURRENT_TIMESTAMP default; the models supply it on write
+    column_type = DateTime().compile(dialect=connection.dialect)
+    connection.execute(text(f"ALTER TABLE products ADD COLUMN updated_at {column_type}"))
+    connection.execute(text("UPDATE products SET updated_at = created_at"))
+
+
+def _create_catalog_version(connection: Connection, metadata: MetaData) -> None:
+    metadata.create_all(connection, tables=[metadata.tables["catalog_version"]])
+
+
+def _add_catalog_revision(connection: Connection, metadata: MetaData) -> None:
+    # Fresh installs already have the column from the models
+    if any(column["name"] == "revision" for column in inspect(connection).get_columns("catalog_version")):
+        return
+    connection.execute(text("ALTER TABLE catalog_version ADD COLUMN revision INTEGER NOT NULL DEFAULT 0"))
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "initial_schema", run=_create_initial_schema),
+    Migration(2, "hot_path_indexes", statements=(
+        "CREATE INDEX IF NOT EXISTS ix_stock_movements_product_warehouse_created "
+        "ON stock_movements (product_id, warehouse_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_reorder_alerts_is_resolved ON reorder_alerts (is_resolved)",
+        "CREATE INDEX IF NOT EXISTS ix_products_category_is_active ON products (category, is_active)",
+        "CREATE INDEX IF NOT EXISTS ix_inventory_levels_warehouse_id ON inventory_levels (warehouse_id)",
+    )),
+    Migration(3, "product_keyset_index", statements=(
+        "CREATE INDEX IF NOT EXISTS ix_products_category_id ON products (category, id)",
+    )),
+    Migration(4, "product_filter_indexes", statements=(
+        "CREATE INDEX IF NOT EXISTS ix_products_price_id ON products (price, id)",
+        "CREATE INDEX IF NOT EXISTS ix_products_stock_id ON products (stock, id)",
+    )),
+    Migration(5, "stock_movement_export_indexes", statements=(
+        "CREATE INDEX IF NOT EXISTS ix_stock_movements_created ON stock_movements (created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_stock_movements_warehouse_created ON stock_movements (warehouse_id, created_at)",
+    )),
+    Migration(6, "stock_totals", run=_create_stock_totals),
+    Migration(7, "reorder_alert_dedupe", statements=(
+        # Keep the oldest open alert per product and warehouse before enforcing uniqueness
+        "UPDATE reorder_alerts SET is_resolved = 1, resolved_at = CURRENT_TIMESTAMP "
+        "WHERE is_resolved = 0 AND id NOT IN ("
+        "SELECT MIN(id) FROM reorder_alerts WHERE is_resolved = 0 GROUP BY product_id, warehouse_id)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS uix_reorder_alerts_open "
+        "ON reorder_alerts (product_id, warehouse_id) WHERE is_resolved = 0",
+    )),
+    Migration(8, "product_updated_at", run=_add_product_updated_at, statements=(
+        "CREATE INDEX IF NOT EXISTS ix_products_updated_at ON products (updated_at)",
+    )),
+    Migration(9, "catalog_version", run=_create_catalog_version, statements=(
+        "INSERT INTO catalog_version (id, products_deleted) "
+        "SELECT 1, 0 WHERE NOT EXISTS (SELECT 1 FROM catalog_version)",
+    )),
+    Migration(10, "catalog_revision", run=_add_catalog_revision),
+]
+
+
+def current_version(connection: Connection) -> int:
+    """Highest applied migration version (0 for an unmanaged database)."""
+    connection.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, "
+        "name VARCHAR NOT NULL, "
+        "applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+    ))
+    return connection.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")).scalar()
+
+
+def run_migrations(connection: Connection, metadata: MetaData,
+                   migrations: Sequence[Migration] = MIGRATIONS) -> List[int]:
+    """Apply pending migrations on `connection`; returns the versions applied."""
+    applied = []
+    version = current_version(connection)
+    for migration in sorted(migrations, key=lambda m: m.version):
+        if migration.version <= version:
+            continue
+        logger.info(f"Applying migration {migration.version}: {migration.name}")
+        if migration.run is not None:
+            migration.run(connection, metadata)
+        for statement in migration.statements:
+            connection.execute(text(statement))
+        connection.execute(
+            text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+            {"version": migration.version, "name": migration.name}
+        )
+        applied.append(migration.version)
+    return applied
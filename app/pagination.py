@@ -0,0 +1,80 @@
+"""
+Opaque cursors for keyset pagination.
+
+A cursor records the sort order it was issued for and the sort key of the
+last row on the page; the next page starts strictly after that key, so
+fetching page N costs the same as fetching page 1 (no OFFSET scan).
+Optional total counts are cached per filter set by `CountCache`.
+"""
+
+import base64
+import json
+import time
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor is malformed or was issued for another sort order."""
+
+
+def encode_cursor(sort: str, key: Dict[str, Any]) -> str:
+    """Encode the last row's sort key as an opaque, URL-safe token."""
+    payload = json.dumps({"sort": sort, "key": key}, separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> Dict[str, Any]:
+    """Decode a token from `encode_cursor`, checking it belongs to `sort`."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        key = payload["key"]
+        issued_for = payload["sort"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor("Malformed cursor") from e
+    if issued_for != sort or not isinstance(key, dict):
+        raise InvalidCursor(f"Cursor was issued for sort '{issued_for}', not '{sort}'")
+    return key
+
+
+class CountCache:
+    """
+    Small TTL cache of COUNT(*) results keyed by filter parameters.
+
+    Total counts are only advisory for paged listings, so entries are reused
+    until they expire or the writer calls `invalidate()`. The generation
+    counter keeps a count computed before an invalidation from being stored
+    after it.
+    """
+
+    def __init__(self, ttl: float = 30.0, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[Any, Tuple[float, int]] = {}
+        self._lock = Lock()
+        self.generation = 0
+
+    def get(self, key: Any) -> Optional[int]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, count = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            return count
+
+    def put(self, key: Any, count: int, generation: int) -> None:
+        with self._lock:
+            if generation != self.generation:
+                return
+            if len(self._entries) >= self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = (time.monotonic() + self.ttl, count)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
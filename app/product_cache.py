@@ -0,0 +1,289 @@
+"""
+Read-through cache of product rows for hot lookups.
+
+Rows (in API form) are cached by id and reachable by sku and barcode, so
+scanner traffic and the uniqueness checks on create/update resolve
+repeated codes without a query. The memory tier is an LRU bounded by
+entry count and TTL. Only rows that exist are cached: a miss always goes
+to the database.
+
+Writers call `invalidate(product_ids)` after committing. A row loaded
+with a `token()` taken before an invalidation is discarded by `put`, so
+a read that raced a write never caches the old row.
+
+With `path` set, an SQLite file acts as a shared tier for every worker on
+the host (a local stand-in for a shared store such as Redis): rows are
+also stored there, and invalidations are appended to a log that each
+worker replays at most every `sync_interval` seconds to drop its own
+stale memory entries.
+"""
+
+import json
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+KEY_KINDS = ("id", "sku", "barcode")
+
+# Invalidation log entries older than this are pruned; a worker that has
+# been idle longer than this clears its memory tier instead of replaying
+INVALIDATION_LOG_RETENTION = 3600.0
+
+
+class _Entry:
+    __slots__ = ("expires_at", "row", "hits")
+
+    def __init__(self, expires_at: float, row: dict):
+        self.expires_at = expires_at
+        self.row = row
+        self.hits = 0
+
+
+class ProductCache:
+    """
+    Two-tier (memory LRU, optional shared SQLite) cache of product rows.
+
+    `max_entries=0` disables caching entirely.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 300.0, path: Optional[str] = None,
+                 sync_interval: float = 1.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.sync_interval = sync_interval
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._ids: Dict[str, Dict[str, int]] = {"sku": {}, "barcode": {}}
+        self._lock = Lock()
+        self.generation = 0
+        self._stats = {kind: {"hits": 0, "shared_hits": 0, "misses": 0} for kind in KEY_KINDS}
+        self._counters = {"puts": 0, "discarded": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+        self._shared: Optional[sqlite3.Connection] = None
+        self._seen_seq = 0
+        self._synced_at = 0.0
+        if path and max_entries > 0:
+            self._open_shared(path)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _open_shared(self, path: str) -> None:
+        try:
+            shared = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+            shared.execute("PRAGMA journal_mode=WAL")
+            shared.execute("CREATE TABLE IF NOT EXISTS product_cache (id INTEGER PRIMARY KEY, sku TEXT, "
+                           "barcode TEXT, row TEXT NOT NULL, expires_at REAL NOT NULL)")
+            shared.execute("CREATE INDEX IF NOT EXISTS ix_product_cache_sku ON product_cache (sku)")
+            shared.execute("CREATE INDEX IF NOT EXISTS ix_product_cache_barcode ON product_cache (barcode)")
+            shared.execute("CREATE TABLE IF NOT EXISTS product_cache_invalidations ("
+                           "seq INTEGER PRIMARY KEY AUTOINCREMENT, product_id INTEGER NOT NULL, at REAL NOT NULL)")
+            self._seen_seq = shared.execute(
+                "SELECT COALESCE(MAX(seq), 0) FROM product_cache_invalidations"
+            ).fetchone()[0]
+            self._synced_at = time.monotonic()
+            self._shared = shared
+        except sqlite3.Error as e:
+            logger.error(f"Product cache shared tier disabled ({path}): {e}")
+
+    # ---- memory tier (callers hold the lock) ----
+
+    def _forget(self, product_id: int) -> None:
+        entry = self._entries.pop(product_id, None)
+        if entry is None:
+            return
+        for kind in ("sku", "barcode"):
+            value = entry.row.get(kind)
+            if value is not None and self._ids[kind].get(value) == product_id:
+                del self._ids[kind][value]
+
+    def _remember(self, row: dict, expires_at: float) -> None:
+        product_id = row["id"]
+        self._forget(product_id)
+        self._entries[product_id] = _Entry(expires_at, row)
+        for kind in ("sku", "barcode"):
+            if row.get(kind) is not None:
+                self._ids[kind][row[kind]] = product_id
+        while len(self._entries) > self.max_entries:
+            self._forget(next(iter(self._entries)))
+            self._counters["evictions"] += 1
+
+    def _sync(self, force: bool = False) -> None:
+        """Replay invalidations logged by other workers since the last sync."""
+        if self._shared is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._synced_at < self.sync_interval:
+            return
+        self._synced_at = now
+        try:
+            oldest = self._shared.execute("SELECT MIN(seq) FROM product_cache_invalidations").fetchone()[0]
+            rows = self._shared.execute(
+                "SELECT seq, product_id FROM product_cache_invalidations WHERE seq > ? ORDER BY seq",
+                (self._seen_seq,)
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Product cache sync failed: {e}")
+            return
+        if oldest is not None and oldest > self._seen_seq + 1 and self._seen_seq:
+            # Part of the log we never saw was pruned: nothing in memory can be trusted
+            self.generation += 1
+            self._entries.clear()
+            self._ids = {"sku": {}, "barcode": {}}
+        elif rows:
+            self.generation += 1
+            for _, product_id in rows:
+                self._forget(product_id)
+        if rows:
+            self._seen_seq = rows[-1][0]
+
+    # ---- public API ----
+
+    def token(self) -> Tuple[int, int]:
+        """Take before loading a row from the database; pass to `put`."""
+        with self._lock:
+            self._sync()
+            return self.generation, self._seen_seq
+
+    def get(self, kind: str, value) -> Optional[dict]:
+        """The cached row whose `kind` ("id", "sku" or "barcode") equals `value`, or None."""
+        if not self.enabled or value is None:
+            return None
+        stats = self._stats[kind]
+        now = time.time()
+        with self._lock:
+            self._sync()
+            product_id = value if kind == "id" else self._ids[kind].get(value)
+            entry = self._entries.get(product_id) if product_id is not None else None
+            if entry is not None:
+                if entry.expires_at >= now:
+                    self._entries.move_to_end(product_id)
+                    entry.hits += 1
+                    stats["hits"] += 1
+                    return entry.row
+                self._forget(product_id)
+                self._counters["expirations"] += 1
+            if self._shared is not None:
+                try:
+                    found = self._shared.execute(
+                        f"SELECT row, expires_at FROM product_cache WHERE {kind} = ? AND expires_at >= ?",
+                        (value, now)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    logger.warning(f"Product cache shared read failed: {e}")
+                    found = None
+                if found is not None:
+                    row = json.loads(found[0])
+                    self._remember(row, found[1])
+                    stats["hits"] += 1
+                    stats["shared_hits"] += 1
+                    return row
+            stats["misses"] += 1
+            return None
+
+    def put(self, row: dict, token: Tuple[int, int]) -> bool:
+        """
+        Cache `row` (must carry "id"); returns False if it was discarded
+        because the product may have changed since `token` was taken.
+        """
+        if not self.enabled:
+            return False
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            generation, seen_seq = token
+            if generation != self.generation:
+                self._counters["discarded"] += 1
+                return False
+            if self._shared is not None:
+                try:
+                    self._shared.execute("BEGIN IMMEDIATE")
+                    changed = self._shared.execute(
+                        "SELECT 1 FROM product_cache_invalidations WHERE seq > ? AND product_id = ?",
+                        (seen_seq, row["id"])
+                    ).fetchone()
+                    if changed is None:
+                        self._shared.execute(
+                            "INSERT OR REPLACE INTO product_cache (id, sku, barcode, row, expires_at) "
+                            "VALUES (?, ?, ?, ?, ?)",
+                            (row["id"], row.get("sku"), row.get("barcode"), json.dumps(row, default=str), expires_at)
+                        )
+                    self._shared.execute("COMMIT")
+                except sqlite3.Error as e:
+                    self._shared.execute("ROLLBACK")
+                    logger.warning(f"Product cache shared write failed: {e}")
+                    changed = None
+                if changed is not None:
+                    self._counters["discarded"] += 1
+                    return False
+            self._remember(row, expires_at)
+            self._counters["puts"] += 1
+        return True
+
+    def invalidate(self, product_ids: Iterable[int]) -> None:
+        """Drop the given products from every tier (call after the write commits)."""
+        ids = sorted(set(product_ids))
+        if not ids or not self.enabled:
+            return
+        with self._lock:
+            self.generation += 1
+            for product_id in ids:
+                self._forget(product_id)
+            self._counters["invalidations"] += len(ids)
+            if self._shared is not None:
+                now = time.time()
+                try:
+                    self._shared.execute("BEGIN IMMEDIATE")
+                    self._shared.executemany("DELETE FROM product_cache WHERE id = ?", [(i,) for i in ids])
+                    self._shared.executemany(
+                        "INSERT INTO product_cache_invalidations (product_id, at) VALUES (?, ?)",
+                        [(i, now) for i in ids]
+                    )
+                    if self._counters["invalidations"] % 1000 < len(ids):
+                        self._prune_shared(now)
+                    self._shared.execute("COMMIT")
+                except sqlite3.Error as e:
+                    self._shared.execute("ROLLBACK")
+                    logger.warning(f"Product cache shared invalidation failed: {e}")
+
+    def _prune_shared(self, now: float) -> None:
+        self._shared.execute("DELETE FROM product_cache WHERE expires_at < ?", (now,))
+        # Keep the newest entry so the sequence (and MIN(seq) gap detection) never restarts
+        self._shared.execute(
+            "DELETE FROM product_cache_invalidations WHERE at < ? "
+            "AND seq < (SELECT MAX(seq) FROM product_cache_invalidations)",
+            (now - INVALIDATION_LOG_RETENTION,)
+        )
+
+    def clear(self) -> None:
+        """Drop every entry from the memory tier and the shared rows."""
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._ids = {"sku": {}, "barcode": {}}
+            if self._shared is not None:
+                self._shared.execute("DELETE FROM product_cache")
+
+    def metrics(self, hot: int = 10) -> dict:
+        """Hit/miss counters per key kind, overall counters and the `hot` most-hit products."""
+        with self._lock:
+            by_kind = {kind: dict(stats) for kind, stats in self._stats.items()}
+            counters = dict(self._counters)
+            entries = len(self._entries)
+            hottest = sorted(self._entries.items(), key=lambda item: item[1].hits, reverse=True)[:hot]
+            hot_keys = [{"id": product_id, "sku": entry.row.get("sku"), "hits": entry.hits}
+                        for product_id, entry in hottest if entry.hits]
+        for stats in by_kind.values():
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else None
+        return dict(counters, keys=by_kind, hot=hot_keys, entries=entries, enabled=self.enabled,
+                    max_entries=self.max_entries, ttl=self.ttl, shared=self._shared is not None)
+
+    def close(self) -> None:
+        if self._shared is not None:
+            self._shared.close()
+            self._shared = None
@@ -0,0 +1,237 @@
+"""
+Reorder alert engine.
+
+An inventory level is low when its product is active, has a positive
+`reorder_point` and the warehouse holds `reorder_point` units or fewer.
+`evaluate_reorder_alerts` finds low levels with one INSERT ... SELECT and
+opens a `reorder_alerts` row for each one that has no open alert yet; the
+partial unique index `uix_reorder_alerts_open` (one open alert per product
+and warehouse) keeps concurrent runs from opening duplicates. A second
+UPDATE resolves open alerts whose level has recovered.
+
+The suggested quantity is the larger of the product's `reorder_quantity`
+and the units needed to get back to the reorder point and cover demand
+over the supplier lead time, where demand is the average daily outbound
+quantity over the last `demand_window_days`:
+
+    max(reorder_quantity, reorder_point - on_hand + ceil(daily_demand * lead_time_days))
+
+`ReorderAlertEngine` runs the evaluation in the background: every
+`interval` seconds for products touched since the last run (see
+`mark_touched`), and over the whole catalog every `sweep_interval`
+seconds. `evaluate_reorder_alerts` takes a sync Connection; from async
+code use `connection.run_sync(...)`.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import MetaData, and_, case, func, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+# Product ids per IN (...) list when evaluating touched products
+EVALUATE_CHUNK_SIZE = 500
+
+
+def _dialect_insert(connection: Connection, table):
+    if connection.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        return pg_insert(table)
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+    return sqlite_insert(table)
+
+
+def _is_low(levels, products):
+    return and_(
+        products.c.is_active == 1,
+        products.c.reorder_point > 0,
+        levels.c.quantity <= products.c.reorder_point,
+    )
+
+
+def suggested_quantity(levels, products, demand_units, demand_window_days: int):
+    """SQL expression for the units to reorder for a low inventory level."""
+    lead_time_demand = (
+        func.coalesce(demand_units, 0) * func.coalesce(products.c.lead_time_days, 0) + (demand_window_days - 1)
+    ) // demand_window_days
+    shortfall = products.c.reorder_point - levels.c.quantity + lead_time_demand
+    reorder_quantity = func.coalesce(products.c.reorder_quantity, 0)
+    return case(
+        (and_(reorder_quantity >= shortfall, reorder_quantity > 0), reorder_quantity),
+        (shortfall > 0, shortfall),
+        else_=1
+    )
+
+
+def _evaluate(connection: Connection, metadata: MetaData, product_ids: Optional[Sequence[int]],
+              demand_window_days: int, now: datetime) -> Tuple[int, int]:
+    levels = metadata.tables["inventory_levels"]
+    products = metadata.tables["products"]
+    alerts = metadata.tables["reorder_alerts"]
+    movements = metadata.tables["stock_movements"]
+
+    demand = (
+        select(movements.c.product_id, movements.c.warehouse_id, func.sum(movements.c.quantity).label("units"))
+        .where(func.lower(movements.c.movement_type) == "outbound",
+               movements.c.created_at >= now - timedelta(days=demand_window_days))
+        .group_by(movements.c.product_id, movements.c.warehouse_id)
+    )
+    if product_ids is not None:
+        demand = demand.where(movements.c.product_id.in_(product_ids))
+    demand = demand.subquery("demand")
+
+    open_alert = (
+        select(alerts.c.id)
+        .where(alerts.c.product_id == levels.c.product_id,
+               alerts.c.warehouse_id == levels.c.warehouse_id,
+               alerts.c.is_resolved == 0)
+        .exists()
+    )
+    candidates = (
+        select(levels.c.product_id, levels.c.warehouse_id,
+               suggested_quantity(levels, products, demand.c.units, demand_window_days))
+        .select_from(
+            levels.join(products, products.c.id == levels.c.product_id)
+            .outerjoin(demand, and_(demand.c.product_id == levels.c.product_id,
+                                    demand.c.warehouse_id == levels.c.warehouse_id))
+        )
+        .where(_is_low(levels, products), ~open_alert)
+    )
+    if product_ids is not None:
+        candidates = candidates.where(levels.c.product_id.in_(product_ids))
+    statement = _dialect_insert(connection, alerts).from_select(
+        ["product_id", "warehouse_id", "suggested_quantity"], candidates
+    ).on_conflict_do_nothing(
+        index_elements=[alerts.c.product_id, alerts.c.warehouse_id],
+        index_where=alerts.c.is_resolved == 0
+    )
+    created = connection.execute(statement).rowcount
+
+    still_low = (
+        select(levels.c.id)
+        .select_from(levels.join(products, products.c.id == levels.c.product_id))
+        .where(levels.c.product_id == alerts.c.product_id,
+               levels.c.warehouse_id == alerts.c.warehouse_id,
+               _is_low(levels, products))
+        .exists()
+    )
+    resolve = (
+        update(alerts)
+        .where(alerts.c.is_resolved == 0, ~still_low)
+        .values(is_resolved=1, resolved_at=func.current_timestamp())
+    )
+    if product_ids is not None:
+        resolve = resolve.where(alerts.c.product_id.in_(product_ids))
+    resolved = connection.execute(resolve).rowcount
+    return created, resolved
+
+
+def evaluate_reorder_alerts(connection: Connection, metadata: MetaData,
+                            product_ids: Optional[Iterable[int]] = None,
+                            demand_window_days: int = 30) -> Tuple[int, int]:
+    """
+    Open alerts for low inventory levels and resolve recovered ones.
+
+    Evaluates every level when `product_ids` is None, otherwise only the
+    levels of those products. Returns (alerts created, alerts resolved).
+    """
+    now = datetime.utcnow()
+    if product_ids is None:
+        return _evaluate(connection, metadata, None, demand_window_days, now)
+    ids = sorted(set(product_ids))
+    created = resolved = 0
+    for start in range(0, len(ids), EVALUATE_CHUNK_SIZE):
+        c, r = _evaluate(connection, metadata, ids[start:start + EVALUATE_CHUNK_SIZE], demand_window_days, now)
+        created += c
+        resolved += r
+    return created, resolved
+
+
+class ReorderAlertEngine:
+    """
+    Keeps reorder alerts current in the background.
+
+    Writers call `mark_touched` with the products whose stock or reorder
+    settings changed; `start` launches a task that evaluates those every
+    `interval` seconds and sweeps every level every `sweep_interval`
+    seconds (the first run after startup is a sweep).
+    """
+
+    def __init__(self, engine: AsyncEngine, metadata: MetaData, interval: float = 10.0,
+                 sweep_interval: float = 900.0, demand_window_days: int = 30):
+        self.engine = engine
+        self.metadata = metadata
+        self.interval = interval
+        self.sweep_interval = sweep_interval
+        self.demand_window_days = demand_window_days
+        self._touched: Set[int] = set()
+        self._last_sweep: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def mark_touched(self, product_ids: Iterable[int]) -> None:
+        """Queue products for the next incremental evaluation."""
+        self._touched.update(product_ids)
+
+    def pending(self) -> int:
+        return len(self._touched)
+
+    async def run(self, connection: AsyncConnection, full: bool = False) -> Tuple[int, int]:
+        """
+        Evaluate the touched products (or everything, when `full`) on `connection`.
+
+        The caller commits. If evaluation fails, the touched products are
+        queued again for the next run.
+        """
+        touched, self._touched = self._touched, set()
+        try:
+            result = await connection.run_sync(
+                evaluate_reorder_alerts, self.metadata, None if full else touched, self.demand_window_days
+            )
+        except Exception:
+            self._touched |= touched
+            raise
+        if full:
+            self._last_sweep = time.monotonic()
+        return result
+
+    async def run_once(self) -> Tuple[int, int]:
+        """One scheduled pass in its own transaction: a sweep if one is due, else the touched products."""
+        full = self._last_sweep is None or time.monotonic() - self._last_sweep >= self.sweep_interval
+        if not full and not self._touched:
+            return 0, 0
+        async with self.engine.begin() as connection:
+            created, resolved = await self.run(connection, full=full)
+        if created or resolved:
+            logger.info(f"Reorder alerts ({'sweep' if full else 'incremental'}): "
+                        f"{created} opened, {resolved} resolved")
+        return created, resolved
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error evaluating reorder alerts: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Launch the background task (no-op if already running or `interval` <= 0)."""
+        if self.interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
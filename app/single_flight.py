@@ -0,0 +1,74 @@
+"""
+Request coalescing ("single flight") for async calls.
+
+`SingleFlight.do(key, fn)` runs `fn()` once per key at a time: callers
+that arrive while a call for the same key is in flight wait for it and
+all receive its result (or its exception) instead of starting their own.
+
+The shared call runs in its own task, so cancelling or timing out one
+caller never cancels it for the others. Only when every caller waiting
+on a key has gone away is the shared call cancelled. Each caller's
+`timeout` bounds its own wait.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key within one event loop."""
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._stats = {"calls": 0, "flights": 0, "coalesced": 0, "timeouts": 0, "abandoned": 0}
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def metrics(self) -> dict:
+        return dict(self._stats, in_flight=len(self._flights))
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        """
+        Await the in-flight call for `key`, starting `fn()` if there is none.
+
+        Raises asyncio.TimeoutError if the result is not ready within
+        `timeout` seconds (the shared call keeps running for other callers).
+        """
+        self._stats["calls"] += 1
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            self._stats["flights"] += 1
+            flight.task.add_done_callback(lambda _, key=key, flight=flight: self._finished(key, flight))
+        else:
+            self._stats["coalesced"] += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(flight.task), timeout)
+        except asyncio.TimeoutError:
+            self._stats["timeouts"] += 1
+            raise
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody is waiting any more: stop the upstream call
+                self._stats["abandoned"] += 1
+                flight.task.cancel()
+                self._finished(key, flight)
+
+    def _finished(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if flight.task.done() and not flight.task.cancelled():
+            flight.task.exception()  # retrieved here so an unawaited failure is not logged as lost
@@ -0,0 +1,168 @@
+"""
+Materialized stock totals per product and per warehouse.
+
+`product_stock_totals` and `warehouse_stock_totals` hold on-hand units
+summed across warehouses / products, plus how many warehouses (products)
+have the item in stock. The API keeps them current incrementally: every
+change to an inventory level adds its delta to both tables in the same
+transaction (`apply_stock_total_changes` in main.py), so dashboards read
+a row instead of summing levels or the movement ledger.
+
+`rebuild_stock_totals` and `verify_stock_totals` recompute the totals in
+one streaming pass over either the inventory levels or the stock movement
+ledger. Both take a sync Connection; from async code use
+`connection.run_sync(...)`. Command line use:
+
+    python app/stock_totals.py verify --source ledger
+    python app/stock_totals.py rebuild
+"""
+
+import argparse
+import asyncio
+import sys
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import MetaData, case, delete, func, insert, select
+from sqlalchemy.engine import Connection
+
+# Ledger movement types that subtract their quantity; every other type adds its (signed) quantity
+DECREASING_MOVEMENT_TYPES = ("outbound", "damaged", "damage")
+SOURCES = ("levels", "ledger")
+# Rows fetched per round trip while streaming the source
+STREAM_BATCH_SIZE = 5000
+
+# (product_id, warehouse_id, old quantity, new quantity)
+LevelChange = Tuple[int, int, int, int]
+
+
+def ledger_delta(movements):
+    """SQL expression for the signed stock change of a stock_movements row."""
+    return case(
+        (func.lower(movements.c.movement_type).in_(DECREASING_MOVEMENT_TYPES), -movements.c.quantity),
+        else_=movements.c.quantity
+    )
+
+
+def total_deltas(changes: Iterable[LevelChange]) -> Tuple[Dict[int, List[int]], Dict[int, List[int]]]:
+    """Fold level changes into per-product and per-warehouse [quantity delta, in-stock count delta]."""
+    products: Dict[int, List[int]] = defaultdict(lambda: [0, 0])
+    warehouses: Dict[int, List[int]] = defaultdict(lambda: [0, 0])
+    for product_id, warehouse_id, old, new in changes:
+        in_stock = int(new > 0) - int(old > 0)
+        for totals, key in ((products, product_id), (warehouses, warehouse_id)):
+            totals[key][0] += new - old
+            totals[key][1] += in_stock
+    return products, warehouses
+
+
+def _source_rows(connection: Connection, metadata: MetaData, source: str):
+    """Stream (product_id, warehouse_id, quantity) from the chosen source of truth."""
+    if source == "levels":
+        levels = metadata.tables["inventory_levels"]
+        statement = select(levels.c.product_id, levels.c.warehouse_id, levels.c.quantity)
+    elif source == "ledger":
+        movements = metadata.tables["stock_movements"]
+        statement = (
+            select(movements.c.product_id, movements.c.warehouse_id, func.sum(ledger_delta(movements)))
+            .group_by(movements.c.product_id, movements.c.warehouse_id)
+        )
+    else:
+        raise ValueError(f"Unknown source '{source}'. Choose from: {', '.join(SOURCES)}")
+    result = connection.execution_options(yield_per=STREAM_BATCH_SIZE).execute(statement)
+    for partition in result.partitions():
+        yield from partition
+
+
+def compute_stock_totals(connection: Connection, metadata: MetaData, source: str = "levels"):
+    """
+    Recompute totals in one pass over `source`.
+
+    Memory is proportional to the number of products and warehouses, not to
+    the size of the ledger.
+    """
+    return total_deltas((product_id, warehouse_id, 0, quantity or 0)
+                        for product_id, warehouse_id, quantity in _source_rows(connection, metadata, source))
+
+
+def rebuild_stock_totals(connection: Connection, metadata: MetaData, source: str = "levels") -> Tuple[int, int]:
+    """Replace both totals tables with values recomputed from `source`; returns the row counts."""
+    products, warehouses = compute_stock_totals(connection, metadata, source)
+    product_totals = metadata.tables["product_stock_totals"]
+    warehouse_totals = metadata.tables["warehouse_stock_totals"]
+    connection.execute(delete(product_totals))
+    connection.execute(delete(warehouse_totals))
+    if products:
+        connection.execute(insert(product_totals), [
+            {"product_id": key, "quantity": quantity, "warehouses_in_stock": in_stock}
+            for key, (quantity, in_stock) in products.items()
+        ])
+    if warehouses:
+        connection.execute(insert(warehouse_totals), [
+            {"warehouse_id": key, "quantity": quantity, "products_in_stock": in_stock}
+            for key, (quantity, in_stock) in warehouses.items()
+        ])
+    return len(products), len(warehouses)
+
+
+def verify_stock_totals(connection: Connection, metadata: MetaData, source: str = "levels",
+                        max_mismatches: int = 100) -> dict:
+    """Compare the stored totals with `source`; returns mismatch counts and the first mismatches."""
+    expected = dict(zip(("products", "warehouses"), compute_stock_totals(connection, metadata, source)))
+    report = {"source": source, "ok": True}
+    for kind, table_name, key_column, count_column in (
+        ("products", "product_stock_totals", "product_id", "warehouses_in_stock"),
+        ("warehouses", "warehouse_stock_totals", "warehouse_id", "products_in_stock"),
+    ):
+        table = metadata.tables[table_name]
+        stored = {
+            row[0]: [row[1], row[2]]
+            for row in connection.execute(select(table.c[key_column], table.c.quantity, table.c[count_column]))
+        }
+        mismatches = []
+        for key in sorted(set(stored) | set(expected[kind])):
+            want = list(expected[kind].get(key, [0, 0]))
+            have = stored.get(key, [0, 0])
+            if want != have:
+                mismatches.append({key_column: key, "expected": {"quantity": want[0], count_column: want[1]},
+                                   "stored": {"quantity": have[0], count_column: have[1]}})
+        report[kind] = {"checked": len(set(stored) | set(expected[kind])), "mismatched": len(mismatches),
+                        "mismatches": mismatches[:max_mismatches]}
+        report["ok"] = report["ok"] and not mismatches
+    return report
+
+
+async def _run_cli(args) -> int:
+    # Imported lazily so the module can be used without starting the app
+    import main as app_main
+    from migrations import run_migrations
+
+    try:
+        async with app_main.engine.begin() as connection:
+            await connection.run_sync(run_migrations, app_main.Base.metadata)
+            if args.command == "rebuild":
+                products, warehouses = await connection.run_sync(
+                    rebuild_stock_totals, app_main.Base.metadata, args.source)
+                print(f"Rebuilt totals from {args.source}: {products} products, {warehouses} warehouses")
+                return 0
+            report = await connection.run_sync(verify_stock_totals, app_main.Base.metadata, args.source)
+    finally:
+        await app_main.engine.dispose()
+
+    for kind in ("products", "warehouses"):
+        print(f"{kind}: {report[kind]['checked']} checked, {report[kind]['mismatched']} mismatched")
+        for mismatch in report[kind]["mismatches"]:
+            print(f"  {mismatch}")
+    return 0 if report["ok"] else 1
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Rebuild or verify the materialized stock totals.")
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    parser.add_argument("--source", choices=SOURCES, default="levels",
+                        help="Recompute from inventory levels (default) or from the stock movement ledger")
+    return asyncio.run(_run_cli(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
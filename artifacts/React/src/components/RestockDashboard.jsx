@@ -37,32 +37,30 @@ const RestockDashboard = ({ products, api, showNotification }) => {
         return;
       }
 
-      // Get AI recommendations for each candidate
+      // One batch request per 1000 candidates instead of one request per product
       const recommendations = [];
       let criticalCount = 0;
-
-      for (const product of candidates) {
+      const bySku = new Map();
+      const skuOf = product => product.sku || `SKU-${product.id}`;
+      for (let start = 0; start < candidates.length; start += 1000) {
+        const chunk = candidates.slice(start, start + 1000);
         try {
-          const requestData = {
-            product_name: product.name,
-            sku: product.sku || `SKU-${product.id}`,
-            category: product.category || 'General',
-            quantity: product.stock || 0
-          };
-          
-          console.log('Requesting restock suggestion for:', requestData);
-          const response = await api.getRestockSuggestion(requestData);
+          const items = await api.getRestockSuggestionsBatch(chunk.map(skuOf));
+          items.forEach(item => bySku.set(item.sku, item));
+        } catch (error) {
+          console.error('Failed to get restock recommendations:', error);
+        }
+      }
 
-          const isCritical = product.stock <= 5;
-          if (isCritical) criticalCount++;
+      for (const product of candidates) {
+        const isCritical = product.stock <= 5;
+        if (isCritical) criticalCount++;
+        const priority = isCritical ? 'critical' : product.stock <= 10 ? 'high' : 'medium';
+        const response = bySku.get(skuOf(product));
 
-          recommendations.push({
-            product,
-            ...response,
-            priority: isCritical ? 'critical' : product.stock <= 10 ? 'high' : 'medium'
-          });
-        } catch (error) {
-          console.error(`Failed to get recommendation for ${product.name}:`, error);
+        if (response && !response.error) {
+          recommendations.push({ product, ...response, priority });
+        } else {
           recommendations.push({
             product,
             analyzer_summary: "Analysis unavailable",
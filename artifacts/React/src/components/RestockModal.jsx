@@ -11,14 +11,30 @@ const RestockModal = ({ isOpen, onClose, product, api, showNotification }) => {
     
     setIsLoading(true);
     try {
-      const response = await api.getRestockSuggestion({
+      // Render each agent's output as soon as it streams in
+      await api.streamRestockSuggestion({
         product_name: product.name,
         sku: product.sku,
         category: product.category || 'General',
         quantity: product.stock || 0
+      }, ({ event, data }) => {
+        setSuggestionData(prev => {
+          const next = prev || { analyzer_summary: '', restock_suggestion: '', reorder_message: '' };
+          switch (event) {
+            case 'analyzer_summary':
+              return { ...next, analyzer_summary: data };
+            case 'restock_suggestion':
+              return { ...next, restock_suggestion: data };
+            case 'reorder_token':
+              return { ...next, reorder_message: next.reorder_message + data };
+            case 'reorder_message':
+              return { ...next, reorder_message: data };
+            default:
+              return next;
+          }
+        });
       });
       
-      setSuggestionData(response);
       showNotification('Restock suggestion generated successfully!', 'success');
     } catch (error) {
       showNotification('Failed to get restock suggestion: ' + error.message, 'error');
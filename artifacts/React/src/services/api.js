@@ -12,6 +12,31 @@ export const api = {
       return [];
     }
   },
+
+  // Server-side filtered, keyset-paginated product listing; pass nextCursor back in to fetch the following page.
+  // Filters: category, is_active, stock_lt, price_min, price_max (dollars), q (search words); sort e.g. '-price'.
+  async getProductsPage({ cursor, limit = 100, sort = 'id', fields, includeTotal = false, ...filters } = {}) {
+    const params = new URLSearchParams({ limit, sort });
+    if (cursor) params.set('cursor', cursor);
+    if (fields) params.set('fields', Array.isArray(fields) ? fields.join(',') : fields);
+    if (includeTotal) params.set('include_total', 'true');
+    Object.entries(filters).forEach(([name, value]) => {
+      if (value !== undefined && value !== null && value !== '') params.set(name, value);
+    });
+    try {
+      const response = await fetch(`${API_BASE_URL}/products/?${params}`);
+      if (!response.ok) throw new Error('Failed to fetch products');
+      const total = response.headers.get('X-Total-Count');
+      return {
+        items: await response.json(),
+        nextCursor: response.headers.get('X-Next-Cursor'),
+        total: total === null ? null : Number(total),
+      };
+    } catch (error) {
+      console.error('Error fetching products:', error);
+      return { items: [], nextCursor: null, total: null };
+    }
+  },
   
   async createProduct(product) {
     try {
@@ -86,6 +111,54 @@ export const api = {
     }
   },
   
+  async getRestockSuggestionsBatch(skus) {
+    try {
+      const response = await fetch(`${API_BASE_URL}/restock_suggestion/batch`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ skus }),
+      });
+      if (!response.ok) throw new Error('Failed to get restock suggestions');
+      const data = await response.json();
+      return data.items;
+    } catch (error) {
+      console.error('Error getting restock suggestions:', error);
+      throw error;
+    }
+  },
+
+  async streamRestockSuggestion(productData, onEvent) {
+    try {
+      const response = await fetch(`${API_BASE_URL}/restock_suggestion/stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(productData),
+      });
+      if (!response.ok || !response.body) throw new Error('Failed to get restock suggestion');
+
+      // NDJSON: one {event, data} object per line
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const message = JSON.parse(line);
+          if (message.event === 'error') throw new Error(message.data);
+          onEvent(message);
+        }
+      }
+    } catch (error) {
+      console.error('Error streaming restock suggestion:', error);
+      throw error;
+    }
+  },
+  
   async askInventory(question) {
     try {
       const response = await fetch(`${API_BASE_URL}/ask_inventory`, {
@@ -35,12 +35,16 @@ CREATE TABLE products (
     name TEXT NOT NULL,
     description TEXT,
     barcode TEXT UNIQUE,
+    category TEXT,
+    price INTEGER DEFAULT 0, -- in cents
+    stock INTEGER DEFAULT 0,
     supplier_id INTEGER,
     reorder_point INTEGER DEFAULT 0,
     reorder_quantity INTEGER DEFAULT 0,
     lead_time_days INTEGER DEFAULT 0,
     is_active INTEGER NOT NULL DEFAULT 1,
     created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME, -- set by the application on every write
     FOREIGN KEY (supplier_id) REFERENCES suppliers(id)
 );
 
@@ -80,4 +84,42 @@ CREATE TABLE reorder_alerts (
     resolved_at DATETIME,
     FOREIGN KEY (product_id) REFERENCES products(id),
     FOREIGN KEY (warehouse_id) REFERENCES warehouses(id)
-);
\ No newline at end of file
+);
+
+-- Materialized stock totals, kept in sync with inventory_levels by the API (see app/stock_totals.py)
+CREATE TABLE product_stock_totals (
+    product_id INTEGER PRIMARY KEY,
+    quantity INTEGER NOT NULL DEFAULT 0,
+    warehouses_in_stock INTEGER NOT NULL DEFAULT 0,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (product_id) REFERENCES products(id)
+);
+
+CREATE TABLE warehouse_stock_totals (
+    warehouse_id INTEGER PRIMARY KEY,
+    quantity INTEGER NOT NULL DEFAULT 0,
+    products_in_stock INTEGER NOT NULL DEFAULT 0,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (warehouse_id) REFERENCES warehouses(id)
+);
+
+-- Catalog counters; every product write bumps revision, the product list ETag (see catalog_etag in app/main.py)
+CREATE TABLE catalog_version (
+    id INTEGER PRIMARY KEY,
+    products_deleted INTEGER NOT NULL DEFAULT 0,
+    revision INTEGER NOT NULL DEFAULT 0
+);
+INSERT INTO catalog_version (id, products_deleted, revision) VALUES (1, 0, 0);
+
+-- Indexes for hot lookups (see app/migrations.py)
+CREATE INDEX ix_stock_movements_product_warehouse_created ON stock_movements (product_id, warehouse_id, created_at);
+CREATE INDEX ix_stock_movements_created ON stock_movements (created_at);
+CREATE INDEX ix_stock_movements_warehouse_created ON stock_movements (warehouse_id, created_at);
+CREATE INDEX ix_reorder_alerts_is_resolved ON reorder_alerts (is_resolved);
+CREATE UNIQUE INDEX uix_reorder_alerts_open ON reorder_alerts (product_id, warehouse_id) WHERE is_resolved = 0;
+CREATE INDEX ix_products_category_is_active ON products (category, is_active);
+CREATE INDEX ix_products_category_id ON products (category, id);
+CREATE INDEX ix_products_price_id ON products (price, id);
+CREATE INDEX ix_products_stock_id ON products (stock, id);
+CREATE INDEX ix_products_updated_at ON products (updated_at);
+CREATE INDEX ix_inventory_levels_warehouse_id ON inventory_levels (warehouse_id);
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of product list serialization.
+
+Times turning N product rows (as the database returns them: price in
+cents, is_active as 0/1) into the JSON response body, per path:
+
+- model:  ProductResponse.from_orm per row, then FastAPI's response_model
+          handling for List[ProductResponse] (validate + serialize)
+- dict:   product_row_to_dict per row, then FastAPI's response_model
+          handling for List[dict] (the previous GET /products/ path)
+- fast:   product_row_to_dict per row, encoded by JSONRowsResponse
+- stream: product_row_to_dict per row, encoded in chunks by iter_json_array
+
+FastAPI's own serialize_response is called, with the same settings the
+router uses for its default JSON response, so "model" and "dict" follow
+whatever the installed FastAPI does.
+
+    python bench_serialization.py --sizes 100,1000,10000
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "app"))
+
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_model_field  # noqa: E402
+from starlette.responses import Response  # noqa: E402
+
+import main  # noqa: E402
+from serialization import JSONRowsResponse, iter_json_array, orjson_available  # noqa: E402
+
+MODEL_FIELD = create_model_field("Response_list_products", List[main.ProductResponse], mode="serialization")
+DICT_FIELD = create_model_field("Response_list_products", List[dict], mode="serialization")
+
+
+def make_rows(count: int) -> List[dict]:
+    created = datetime(2026, 1, 1, 8, 0, 0)
+    return [{
+        "id": i, "sku": f"SKU-{i:06d}", "name": f"Product {i}", "description": "A product used for benchmarking",
+        "barcode": f"{i:013d}", "category": "Electronics", "price": 1999 + i, "stock": i % 50, "supplier_id": 1,
+        "reorder_point": 10, "reorder_quantity": 25, "lead_time_days": 7, "is_active": 1,
+        "created_at": created + timedelta(seconds=i),
+    } for i in range(count)]
+
+
+async def model_path(rows):
+    content = [main.ProductResponse.from_orm(SimpleNamespace(**row)) for row in rows]
+    body = await serialize_response(field=MODEL_FIELD, response_content=content, dump_json=True)
+    return Response(content=body, media_type="application/json").body
+
+
+async def dict_path(rows):
+    content = [main.product_row_to_dict(row) for row in rows]
+    body = await serialize_response(field=DICT_FIELD, response_content=content, dump_json=True)
+    return Response(content=body, media_type="application/json").body
+
+
+async def fast_path(rows):
+    return JSONRowsResponse([main.product_row_to_dict(row) for row in rows]).body
+
+
+async def stream_path(rows):
+    return b"".join(iter_json_array([main.product_row_to_dict(row) for row in rows]))
+
+
+PATHS = {"model": model_path, "dict": dict_path, "fast": fast_path, "stream": stream_path}
+
+
+async def best_of(path, rows, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await path(rows)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+async def run(sizes, repeat: int) -> None:
+    print(f"encoder: {'orjson' if orjson_available() else 'json (orjson not installed)'}; best of {repeat}, ms")
+    print(f"{'rows':>7} " + " ".join(f"{name:>9}" for name in PATHS) + f" {'vs dict':>8} {'vs model':>8}")
+    for size in sizes:
+        rows = make_rows(size)
+        bodies = {name: await path(rows) for name, path in PATHS.items()}
+        if len({json.dumps(json.loads(body), sort_keys=True) for body in bodies.values()}) != 1:
+            sys.exit(f"Paths disagree on the JSON for {size} rows")
+        timings = {name: await best_of(path, rows, repeat) for name, path in PATHS.items()}
+        print(f"{size:>7} " + " ".join(f"{timings[name] * 1000:>9.2f}" for name in PATHS)
+              + f" {timings['dict'] / timings['fast']:>7.1f}x {timings['model'] / timings['fast']:>7.1f}x")
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100,1000,10000", type=lambda value: [int(n) for n in value.split(",")])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.sizes, args.repeat))
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,94 @@
+"""
+Shared fixtures for the in-process API tests.
+
+Each test gets a fresh SQLite database, migrated through the normal
+runner and wired into the app through dependency overrides, so no server
+needs to be running.
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+sys.path.insert(0, str(Path(__file__).parent / "app"))
+import main  # noqa: E402
+from database import DatabaseSettings, create_db_engine  # noqa: E402
+from migrations import run_migrations  # noqa: E402
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_db_engine(DatabaseSettings(url=f"sqlite:///{tmp_path / 'test.db'}", profile="development"))
+
+    async def migrate():
+        async with engine.begin() as connection:
+            await connection.run_sync(run_migrations, main.Base.metadata)
+        await engine.dispose()
+
+    asyncio.run(migrate())
+    return async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+
+@pytest.fixture
+def client(session_factory):
+    async def get_test_db():
+        async with session_factory() as db:
+            yield db
+
+    main.app.dependency_overrides[main.get_db] = get_test_db
+    main.app.dependency_overrides[main.get_session_factory] = lambda: session_factory
+    main.inventory_index.rebuild([])
+    main.product_count_cache.invalidate()
+    main.llm_cache.clear()
+    main.product_cache.clear()
+    try:
+        yield TestClient(main.app)
+    finally:
+        main.app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def seed(session_factory):
+    """Adds ORM objects to the test database in one committed session: seed(Warehouse(...), Product(...))."""
+    def add(*objects):
+        async def populate():
+            async with session_factory() as db:
+                db.add_all(objects)
+                await db.commit()
+        asyncio.run(populate())
+    return add
+
+
+@pytest.fixture
+def warehouses(seed):
+    """Warehouses 1 (North) and 2 (South)."""
+    seed(main.Warehouse(id=1, name="North"), main.Warehouse(id=2, name="South"))
+
+
+@pytest.fixture
+def move(client):
+    """Posts a stock movement through the API and checks it was recorded: move(product_id=1, ...)."""
+    def post(**movement):
+        response = client.post("/stock_movements", json=movement)
+        assert response.status_code == 201, response.text
+        return response
+    return post
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """
+    Routes the AI endpoints to a stand-in for get_completion_async:
+    fake_llm(completion), where `completion` is an async function with the
+    same signature. The registry hands out a dummy client; fake_llm() alone
+    only does that.
+    """
+    def install(completion=None):
+        monkeypatch.setattr(main.llm_registry, "get_async", lambda model_name: (object(), model_name, "openai"))
+        if completion is not None:
+            monkeypatch.setattr(main, "get_completion_async", completion)
+        return completion
+    return install
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Load test for concurrent product lookups.
+
+By default the app runs in-process (httpx ASGITransport) against a
+temporary SQLite catalog, once per connection pool size, and prints
+throughput and latency percentiles for each:
+
+    python load_test_products.py --pool-sizes 1,2,4,8 --requests 4000 --concurrency 64
+
+`--slow-query SECONDS` keeps one connection busy with a long-running
+query during every run, which is the case the async session and sized
+pool exist for: with a pool of one every lookup queues behind the slow
+query, with larger pools the remaining connections keep serving.
+
+`--scenario` picks the request: "id" (GET /products/{id}), "barcode"
+(GET /products/by-barcode/{code}) or "lookup" (POST /products/lookup with
+`--batch` codes). With `--p99-target MS` the script exits non-zero when
+any run's p99 latency is above the target.
+
+`--url http://localhost:8000` runs the same workload against a live
+server instead (its pool is whatever DB_POOL_SIZE it was started with).
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "app"))
+
+# A CPU-bound recursive CTE; ~10M rows take a few seconds in SQLite
+SLOW_QUERY = (
+    "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < :rows) "
+    "SELECT count(*) FROM n"
+)
+
+
+def make_request(args, products):
+    """A coroutine function issuing request number i of the chosen scenario."""
+    if args.scenario == "id":
+        return lambda client, i: client.get(f"/products/{products[i % len(products)]['id']}")
+    if args.scenario == "barcode":
+        return lambda client, i: client.get(f"/products/by-barcode/{products[i % len(products)]['barcode']}")
+
+    def lookup(client, i):
+        start = i * args.batch
+        codes = [products[(start + k) % len(products)]["barcode"] for k in range(args.batch)]
+        return client.post("/products/lookup", json={"codes": codes})
+    return lookup
+
+
+async def run_load(client: httpx.AsyncClient, request, requests: int, concurrency: int) -> dict:
+    """Issue `requests` requests from `concurrency` workers; returns throughput and latency stats."""
+    latencies, errors = [], 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            response = await request(client, i)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": elapsed,
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+async def seed(session_factory, count: int):
+    import main
+    async with session_factory() as db:
+        db.add_all([
+            main.Product(sku=f"LOAD-{i:06d}", barcode=f"{i:013d}", name=f"Load test product {i}", category="Load",
+                         price=100 + i, description="Seeded by load_test_products.py")
+            for i in range(count)
+        ])
+        await db.commit()
+        rows = await db.execute(main.select(main.Product.id, main.Product.barcode))
+        return [{"id": product_id, "barcode": barcode} for product_id, barcode in rows]
+
+
+def report(label, stats, target) -> bool:
+    """Print one result row; False when it misses the p99 target."""
+    ok = target is None or stats["p99_ms"] <= target
+    print(f"{label:>5} {stats['requests']:>9} {stats['errors']:>7} {stats['rps']:>9.0f} "
+          f"{stats['p50_ms']:>8.1f} {stats['p99_ms']:>8.1f}{'' if ok else '  above p99 target'}")
+    return ok and not stats["errors"]
+
+
+async def run_in_process(args) -> bool:
+    import main
+    from database import DatabaseSettings, create_db_engine
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+    workdir = tempfile.mkdtemp(prefix="inventory-load-")
+    url = f"sqlite:///{os.path.join(workdir, 'load.db')}"
+
+    setup_engine = create_db_engine(DatabaseSettings(url=url))
+    async with setup_engine.begin() as connection:
+        await connection.run_sync(main.Base.metadata.create_all)
+    products = await seed(async_sessionmaker(setup_engine, class_=AsyncSession, expire_on_commit=False),
+                          args.products)
+    await setup_engine.dispose()
+    print(f"Seeded {len(products)} products in {url}; scenario {args.scenario}")
+    print(f"{'pool':>5} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    request, passed = make_request(args, products), True
+
+    for pool_size in args.pool_sizes:
+        engine = create_db_engine(DatabaseSettings(url=url, pool_size=pool_size, max_overflow=0))
+        session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+        async def override_get_db():
+            async with session_factory() as db:
+                yield db
+
+        main.app.dependency_overrides[main.get_db] = override_get_db
+        slow = None
+        try:
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://load") as client:
+                # Open every pooled connection once so the runs compare steady-state pools
+                await asyncio.gather(*(client.get(f"/products/{products[0]['id']}") for _ in range(pool_size)))
+                if args.slow_query:
+                    async def hold_connection():
+                        deadline = time.monotonic() + args.slow_query
+                        async with engine.connect() as connection:
+                            while time.monotonic() < deadline:
+                                await connection.execute(text(SLOW_QUERY), {"rows": 2_000_000})
+                    slow = asyncio.create_task(hold_connection())
+                    await asyncio.sleep(0.05)
+                main.product_cache.clear()
+                stats = await run_load(client, request, args.requests, args.concurrency)
+        finally:
+            if slow is not None:
+                slow.cancel()
+                await asyncio.gather(slow, return_exceptions=True)
+            main.app.dependency_overrides.pop(main.get_db, None)
+            await engine.dispose()
+        passed = report(pool_size, stats, args.p99_target) and passed
+    return passed
+
+
+async def run_remote(args) -> bool:
+    async with httpx.AsyncClient(base_url=args.url, timeout=60,
+                                 limits=httpx.Limits(max_connections=args.concurrency)) as client:
+        response = await client.get("/products/", params={"limit": min(args.products, 1000),
+                                                          "fields": "id,barcode"})
+        response.raise_for_status()
+        products = response.json()
+        if args.scenario != "id":
+            products = [product for product in products if product.get("barcode")]
+        if not products:
+            sys.exit("The server has no suitable products; seed it first (POST /seed-data)")
+        stats = await run_load(client, make_request(args, products), args.requests, args.concurrency)
+    print(f"{args.url} ({args.scenario})")
+    print(f"{'':>5} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    return report("", stats, args.p99_target)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pool-sizes", default="1,2,4,8",
+                        type=lambda value: [int(size) for size in value.split(",")])
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--slow-query", type=float, default=0.0, metavar="SECONDS",
+                        help="keep one connection busy with a slow query during each run")
+    parser.add_argument("--scenario", choices=("id", "barcode", "lookup"), default="id")
+    parser.add_argument("--batch", type=int, default=100, help="codes per POST /products/lookup")
+    parser.add_argument("--p99-target", type=float, metavar="MS", help="fail when p99 latency exceeds this")
+    parser.add_argument("--url", help="load test a running server instead of the in-process app")
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    passed = asyncio.run(run_remote(args) if args.url else run_in_process(args))
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming catalog importer and POST /import/{entity}.
+"""
+import asyncio
+import io
+import json
+
+from sqlalchemy import select
+
+import main
+from catalog_import import AsyncChunkReader, ImportEntity, import_stream, validated_batches
+
+
+def _events(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_csv_product_import(client):
+    feed = "sku,name,price,stock,category\n" + "".join(
+        f"IMP-{i},Imported {i},{i}.5,{i},Tools\n" for i in range(25)
+    ) + "IMP-BAD,,abc,1,Tools\nIMP-3,Imported again,9,9,Tools\n"
+    response = client.post("/import/products", params={"batch_size": 10}, content=feed,
+                           headers={"Content-Type": "text/csv"})
+    events = _events(response)
+    assert [e["event"] for e in events] == ["progress"] * 3 + ["done"]
+    done = events[-1]["data"]
+    assert (done["rows_read"], done["rows_written"], done["rows_failed"]) == (27, 26, 1)
+    assert done["errors"][0]["index"] == 25
+
+    products = {p["sku"]: p for p in client.get("/products/", params={"category": "Tools", "limit": 100}).json()}
+    assert len(products) == 25
+    assert products["IMP-3"]["name"] == "Imported again" and products["IMP-3"]["price"] == 9
+
+
+def test_ndjson_inventory_level_import(client, session_factory, seed):
+    seed(main.Warehouse(id=1, name="Main"))
+    client.post("/products/", json={"sku": "INV-1", "name": "Stocked"})
+
+    feed = "\n".join(json.dumps(row) for row in [
+        {"sku": "INV-1", "warehouse_id": 1, "quantity": 5},
+        {"sku": "INV-1", "warehouse_id": 1, "quantity": 7},
+        {"sku": "NOPE", "warehouse_id": 1, "quantity": 1},
+        {"sku": "INV-1", "warehouse_id": 2, "quantity": 1},
+    ])
+    done = _events(client.post("/import/inventory_levels", content=feed,
+                               headers={"Content-Type": "application/x-ndjson"}))[-1]["data"]
+    assert done["rows_written"] == 1
+    assert [e["error"] for e in done["errors"]] == [
+        "Superseded by a later row for the same product and warehouse", "Product not found", "Warehouse not found",
+    ]
+
+    async def quantities():
+        async with session_factory() as db:
+            return (await db.execute(select(main.InventoryLevel.quantity))).scalars().all()
+    assert asyncio.run(quantities()) == [7]
+
+
+def test_unknown_entity_and_format(client):
+    assert client.post("/import/widgets", content="", headers={"Content-Type": "text/csv"}).status_code == 404
+    assert client.post("/import/products", content="", headers={"Content-Type": "text/plain"}).status_code == 415
+
+
+class CountingStream(io.TextIOBase):
+    """NDJSON product feed generated on demand, recording how many lines were read."""
+
+    def __init__(self, rows):
+        self.consumed = 0
+        self._rows = rows
+
+    def __iter__(self):
+        for i in range(self._rows):
+            self.consumed += 1
+            yield json.dumps({"sku": f"L-{i}", "name": "Lazy"}) + "\n"
+
+
+class NullSession:
+    """Stands in for the session factory when the entity writer does not touch the database."""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def test_pipeline_is_lazy():
+    stream = CountingStream(10_000)
+    batches = validated_batches(stream, "ndjson", main.ProductCreate, batch_size=100)
+    count, valid, errors = next(batches)
+    assert count == 100 and not errors
+    assert stream.consumed <= 101
+
+
+def test_writer_backpressure():
+    stream = CountingStream(2000)
+    written, read_ahead = [], []
+
+    async def slow_write(session, rows):
+        read_ahead.append(stream.consumed - sum(written))
+        await asyncio.sleep(0.002)
+        written.append(len(rows))
+        return []
+
+    entity = ImportEntity("products", main.ProductCreate, slow_write)
+
+    async def run():
+        return [p.as_dict() async for p in import_stream(stream, "ndjson", entity, NullSession,
+                                                         batch_size=50, max_pending_batches=2)]
+
+    reports = asyncio.run(run())
+    assert written == [50] * 40
+    assert reports[-1]["done"] and reports[-1]["rows_written"] == 2000
+    # Batch being written + queued batches + one in the reader's hands (+1 row of lookahead)
+    assert max(read_ahead) <= 50 * 4 + 1
+
+
+def test_upload_is_imported_while_it_arrives():
+    written, written_before_last_chunk = [], []
+
+    async def write(session, rows):
+        written.append(len(rows))
+        return []
+
+    async def upload():
+        for start in (0, 10):
+            yield "".join(json.dumps({"sku": f"U-{i}", "name": "Upload"}) + "\n"
+                          for i in range(start, start + 10)).encode()
+        # Not sent until the importer asks for it, after the first batches are written
+        for _ in range(500):
+            if written:
+                break
+            await asyncio.sleep(0.01)
+        written_before_last_chunk.append(sum(written))
+        yield b'{"sku": "U-20", "name": "Upload"}\n'
+
+    async def run():
+        body = AsyncChunkReader(upload(), asyncio.get_running_loop())
+        stream = io.TextIOWrapper(io.BufferedReader(body), encoding="utf-8", newline="")
+        entity = ImportEntity("products", main.ProductCreate, write)
+        reports = [p async for p in import_stream(stream, "ndjson", entity, NullSession, batch_size=10)]
+        return reports[-1], body.finished.is_set()
+
+    done, finished = asyncio.run(run())
+    assert written_before_last_chunk[0] >= 10
+    assert (done.rows_read, done.rows_written, finished) == (21, 21, True)
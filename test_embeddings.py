@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for the local vector store and its on-disk persistence.
+"""
+import pytest
+
+from embeddings import HashingEncoder, TfidfEncoder, VectorStore, embeddings_available, fuse_rankings
+
+pytestmark = pytest.mark.skipif(not embeddings_available(), reason="numpy not installed")
+
+CATALOG = [
+    (1, "MacBook Pro laptop Electronics"),
+    (2, "Standing desk Furniture oak top"),
+    (3, "Wireless earbuds Electronics"),
+]
+
+
+def _store(encoder=None, items=CATALOG):
+    store = VectorStore(encoder or HashingEncoder(dim=256), capacity=2)
+    store.upsert_many(items)
+    return store
+
+
+def _ids(store, text, k=1):
+    return [item_id for _, item_id in store.search(text, k=k)]
+
+
+def test_search_upsert_and_remove():
+    store = _store()
+    assert len(store) == 3
+    assert _ids(store, "macbooks") == [1]
+    assert _ids(store, "oak desk") == [2]
+    assert not store.upsert(2, "Standing desk Furniture oak top")  # unchanged text is not re-embedded
+
+    store.remove(1)
+    assert 1 not in _ids(store, "macbook laptop", k=3)
+    store.retain({3})
+    assert len(store) == 1 and _ids(store, "earbuds") == [3]
+
+
+def test_save_load_save_round_trips(tmp_path):
+    path = str(tmp_path / "vectors" / "products")
+    # Large enough that most of the mapped matrix is never paged in
+    filler = [(item_id, f"Spare part number {item_id}") for item_id in range(10, 2000)]
+    _store(items=CATALOG + filler).save(path)
+
+    # The loaded matrix is memory-mapped from the files the next save replaces
+    loaded = _store(items=[])
+    assert loaded.load(path) and len(loaded) == 3 + len(filler)
+    assert _ids(loaded, "macbooks") == [1]
+    loaded.upsert(2, "Ergonomic office chair Furniture")
+    loaded.save(path)
+    loaded.upsert(4, "USB-C charging cable Electronics")
+    loaded.save(path)
+
+    reloaded = _store(items=[])
+    assert reloaded.load(path) and len(reloaded) == 4 + len(filler)
+    assert _ids(reloaded, "office chair") == [2]
+    assert _ids(reloaded, "charging cable") == [4]
+    assert _ids(reloaded, "spare part number 1500") == [1500]
+    assert not list(tmp_path.glob("vectors/*.tmp"))
+
+
+def test_tfidf_weights_are_persisted(tmp_path):
+    path = str(tmp_path / "products")
+    encoder = TfidfEncoder(dim=256).fit(text for _, text in CATALOG)
+    _store(encoder).save(path)
+
+    restored = VectorStore(TfidfEncoder(dim=256))
+    assert restored.load(path)
+    assert restored.encoder.idf.tolist() == encoder.idf.tolist()
+    assert _ids(restored, "wireless earbuds") == [3]
+
+
+def test_unusable_store_is_ignored(tmp_path):
+    path = tmp_path / "products"
+    assert not _store(items=[]).load(str(path))  # nothing saved yet
+
+    _store().save(str(path))
+    assert not VectorStore(HashingEncoder(dim=128)).load(str(path))  # different dimension
+
+    vectors = path.with_suffix(".vectors.npy")
+    vectors.write_bytes(vectors.read_bytes()[:200])  # truncated by a crash mid-write
+    store = _store(items=[])
+    assert not store.load(str(path))
+    assert len(store) == 0
+    store.upsert_many(CATALOG)
+    assert _ids(store, "macbooks") == [1]
+
+
+def test_fuse_rankings_prefers_items_ranked_by_both():
+    keyword = [(30, 1), (12, 2), (4, 3)]
+    vector = [(0.9, 4), (0.7, 2), (0.1, 5)]
+    assert fuse_rankings(keyword, vector, limit=3) == [2, 1, 4]
+    assert fuse_rankings([], vector, limit=2) == [4, 2]
+    assert fuse_rankings([], []) == []
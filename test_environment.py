@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Tests that settings kept in .env are honoured by the API process.
+
+Settings are read when main is imported, so each case imports it in a
+fresh interpreter started in a directory holding only the .env file.
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent
+
+
+def _import_main(tmp_path, dotenv, expression):
+    """Imports main with `dotenv` as the working directory's .env and returns `expression` evaluated after it."""
+    (tmp_path / ".env").write_text(dotenv)
+    names = {line.split("=", 1)[0] for line in dotenv.splitlines() if "=" in line}
+    env = {key: value for key, value in os.environ.items() if key not in names}
+    env["PYTHONPATH"] = os.pathsep.join([str(ROOT / "app"), str(ROOT)])
+    code = f"import json, main, utils; print(json.dumps({expression}))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_llm_settings_from_dotenv(tmp_path):
+    dotenv = "LLM_MODEL_NAME=gpt-4.1-mini\nLLM_MAX_CONCURRENCY=3\nLLM_REQUEST_TIMEOUT=12.5\nLLM_HTTP_MAX_CONNECTIONS=7\n"
+    values = _import_main(tmp_path, dotenv, "[main.LLM_MODEL_NAME, utils.LLM_MAX_CONCURRENCY, "
+                                            "utils.LLM_REQUEST_TIMEOUT, utils.llm_registry.max_connections]")
+    assert values == ["gpt-4.1-mini", 3, 12.5, 7]
+
+
+def test_database_settings_from_dotenv(tmp_path):
+    dotenv = "DATABASE_URL=sqlite:///./from_dotenv.db\nDB_POOL_SIZE=3\nDB_MAX_OVERFLOW=1\nSQLITE_CACHE_SIZE=-2000\n"
+    values = _import_main(tmp_path, dotenv, "[main.SQLALCHEMY_DATABASE_URL, main.engine.sync_engine.pool.size(), "
+                                            "main.db_executor._max_workers, main.db_settings.cache_size]")
+    assert values == ["sqlite:///./from_dotenv.db", 3, 4, -2000]
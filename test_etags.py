@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Tests for product ETags and conditional GET.
+"""
+from datetime import datetime
+
+from sqlalchemy import create_engine, inspect, text
+
+import main
+from migrations import run_migrations
+
+
+def _revalidate(client, url, etag):
+    return client.get(url, headers={"If-None-Match": etag})
+
+
+def test_product_etag(client):
+    product_id = client.post("/products/", json={"sku": "E-1", "name": "Lamp"}).json()["id"]
+    url = f"/products/{product_id}"
+
+    first = client.get(url)
+    etag = first.headers["etag"]
+    assert etag.startswith('W/"')
+    assert first.headers["cache-control"] == "no-cache"
+    assert first.json()["updated_at"] is not None
+
+    not_modified = _revalidate(client, url, etag)
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["etag"] == etag
+    # Strong and list forms of the same tag match too
+    assert _revalidate(client, url, etag.removeprefix("W/")).status_code == 304
+    assert _revalidate(client, url, f'"other", {etag}').status_code == 304
+
+    client.put(url, json={"name": "Desk lamp"})
+    changed = _revalidate(client, url, etag)
+    assert changed.status_code == 200
+    assert changed.json()["name"] == "Desk lamp"
+    assert changed.headers["etag"] != etag
+
+
+def test_list_etag_follows_catalog_changes(client, warehouses, move):
+    product_id = client.post("/products/", json={"sku": "E-1", "name": "Lamp"}).json()["id"]
+    url = "/products/?limit=10"
+
+    def current_etag():
+        response = client.get(url)
+        assert response.status_code == 200
+        return response.headers["etag"]
+
+    etag = current_etag()
+    assert _revalidate(client, url, etag).status_code == 304
+    assert _revalidate(client, url + "&stream=true", etag).status_code == 304
+    # Different parameters are a different representation
+    assert _revalidate(client, "/products/?limit=5", etag).status_code == 200
+
+    move(product_id=product_id, warehouse_id=1, movement_type="inbound", quantity=2)
+    assert _revalidate(client, url, etag).status_code == 200
+    etag = current_etag()
+
+    spare_id = client.post("/products/", json={"sku": "E-2", "name": "Spare"}).json()["id"]
+    assert _revalidate(client, url, etag).status_code == 200
+    etag = current_etag()
+
+    client.delete(f"/products/{spare_id}")
+    assert _revalidate(client, url, etag).status_code == 200
+    etag = current_etag()
+
+    # Deleting a product that is not the latest update leaves max(updated_at) alone
+    older_id = client.post("/products/", json={"sku": "E-3", "name": "Shade"}).json()["id"]
+    client.post("/products/", json={"sku": "E-4", "name": "Bulb"})
+    etag = current_etag()
+    assert client.delete(f"/products/{older_id}").status_code == 204
+    assert _revalidate(client, url, etag).status_code == 200
+
+
+def test_list_etag_changes_for_writes_stamped_before_the_latest(client, warehouses, move, monkeypatch):
+    product_id = client.post("/products/", json={"sku": "E-5", "name": "Vase"}).json()["id"]
+    url = "/products/?limit=10"
+    etag = client.get(url).headers["etag"]
+
+    # A write stamped before the catalog's latest updated_at but committed after it
+    class Earlier(datetime):
+        @classmethod
+        def utcnow(cls):
+            return datetime(2000, 1, 1)
+    monkeypatch.setattr(main, "datetime", Earlier)
+    move(product_id=product_id, warehouse_id=1, movement_type="inbound", quantity=4)
+    monkeypatch.undo()
+
+    changed = _revalidate(client, url, etag)
+    assert changed.status_code == 200
+    assert changed.json()[0]["stock"] == 4
+
+
+def test_updated_at_migration_backfills_existing_rows():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        run_migrations(conn, main.Base.metadata)
+        conn.execute(text("INSERT INTO products (sku, name, created_at) VALUES ('OLD-1', 'Old', '2025-03-01 10:00:00')"))
+        # Roll the database back to before migration 8
+        conn.execute(text("DROP INDEX ix_products_updated_at"))
+        conn.execute(text("ALTER TABLE products DROP COLUMN updated_at"))
+        conn.execute(text("ALTER TABLE catalog_version DROP COLUMN revision"))
+        conn.execute(text("DELETE FROM schema_migrations WHERE version >= 8"))
+
+        assert run_migrations(conn, main.Base.metadata) == [8, 9, 10]
+        assert "ix_products_updated_at" in {index["name"] for index in inspect(conn).get_indexes("products")}
+        assert conn.execute(text("SELECT updated_at FROM products")).scalar() == "2025-03-01 10:00:00"
+        # Re-applying later migrations is harmless: still one catalog version row
+        assert conn.execute(text("SELECT products_deleted, revision FROM catalog_version")).all() == [(0, 0)]
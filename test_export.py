@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming /export endpoints.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+
+import pytest
+
+import main
+from exporting import parquet_available
+
+
+@pytest.fixture
+def ledger(client, warehouses, seed):
+    """Two warehouses, three products and a few dated stock movements."""
+    seed(
+        main.Product(id=1, sku="EX-1", name="Widget, large", price=1250, stock=3, category="Tools"),
+        main.Product(id=2, sku="EX-2", name="Gadget", price=500, stock=0, category="Tools", is_active=0),
+        main.Product(id=3, sku="EX-3", name="Lamp", price=2000, stock=9, category="Lighting"),
+        main.InventoryLevel(product_id=1, warehouse_id=1, quantity=3),
+        main.InventoryLevel(product_id=3, warehouse_id=2, quantity=9),
+        main.StockMovement(product_id=1, warehouse_id=1, movement_type="inbound", quantity=5,
+                           created_at=datetime(2024, 1, 5)),
+        main.StockMovement(product_id=1, warehouse_id=1, movement_type="outbound", quantity=2,
+                           created_at=datetime(2024, 2, 1)),
+        main.StockMovement(product_id=3, warehouse_id=2, movement_type="inbound", quantity=9,
+                           created_at=datetime(2024, 1, 20)),
+    )
+    return client
+
+
+def test_products_csv(ledger):
+    response = ledger.get("/export/products")
+    assert response.headers["content-type"].startswith("text/csv")
+    assert "attachment" in response.headers["content-disposition"]
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["sku"] for row in rows] == ["EX-1", "EX-2", "EX-3"]
+    assert rows[0]["name"] == "Widget, large" and rows[0]["price"] == "12.5"
+
+
+def test_products_filters(ledger):
+    lines = ledger.get("/export/products", params={"format": "ndjson", "category": "Tools", "is_active": True}).text
+    assert [json.loads(line)["sku"] for line in lines.splitlines()] == ["EX-1"]
+    lines = ledger.get("/export/products", params={"format": "ndjson", "warehouse_id": 2}).text
+    assert [json.loads(line)["sku"] for line in lines.splitlines()] == ["EX-3"]
+
+
+def test_stock_movements_time_range(ledger, monkeypatch):
+    monkeypatch.setattr(main, "EXPORT_BATCH_SIZE", 1)
+    params = {"format": "ndjson", "start": "2024-01-01T00:00:00", "end": "2024-02-01T00:00:00"}
+    rows = [json.loads(line) for line in ledger.get("/export/stock_movements", params=params).text.splitlines()]
+    assert [(r["product_id"], r["created_at"]) for r in rows] == [(1, "2024-01-05T00:00:00"), (3, "2024-01-20T00:00:00")]
+
+    rows = ledger.get("/export/stock_movements", params=dict(params, format="ndjson", warehouse_id=2)).text.splitlines()
+    assert len(rows) == 1
+
+
+def test_empty_csv_has_header(client):
+    assert client.get("/export/stock_movements").text.strip() == (
+        "id,product_id,warehouse_id,user_id,movement_type,quantity,reason,reference_number,created_at"
+    )
+
+
+@pytest.mark.skipif(not parquet_available(), reason="pyarrow not installed")
+def test_stock_movements_parquet(ledger, monkeypatch):
+    import pyarrow.parquet as pq
+
+    monkeypatch.setattr(main, "EXPORT_BATCH_SIZE", 2)
+    response = ledger.get("/export/stock_movements", params={"format": "parquet"})
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.num_rows == 3
+    assert table.column("movement_type").to_pylist() == ["inbound", "inbound", "outbound"]
+    assert table.column("user_id").to_pylist() == [None, None, None]
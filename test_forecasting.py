@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Tests for the demand forecaster and the restock endpoints built on it.
+"""
+import asyncio
+import json
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import main
+import utils
+from forecasting import ForecastSettings, daily_demand_rate, demand_matrix, forecast, forecasting_available
+
+pytestmark = pytest.mark.skipif(not forecasting_available(), reason="numpy not installed")
+
+
+def test_ses_matches_recursive_smoothing():
+    import numpy as np
+
+    demand = np.array([[4.0, 0.0, 7.0, 2.0, 5.0], [1.0, 1.0, 1.0, 1.0, 1.0]])
+    level = demand[0, 0]
+    for value in demand[0, 1:]:
+        level = 0.3 * value + 0.7 * level
+    rates = daily_demand_rate(demand, ForecastSettings(method="ses", alpha=0.3))
+    assert rates == pytest.approx([level, 1.0])
+
+
+def test_forecast_quantities():
+    end = date(2024, 3, 31)
+    rows = [(1, "2024-03-31", 6), (1, date(2024, 3, 30), 4), (2, "2024-03-31 00:00:00", 1), (3, "2023-01-01", 99)]
+    matrix = demand_matrix([1, 2], rows, end, days=10)
+    assert matrix.sum(axis=1).tolist() == [10.0, 1.0]
+
+    settings = ForecastSettings(window=10, horizon_days=20, service_level=0.5)  # z = 0: no safety stock
+    result = forecast(matrix, on_hand=[5, 100], lead_time_days=[10, 10], settings=settings, min_order=[25, 25])
+    # Product 1: 1 unit/day * (10 + 20) days - 5 on hand = 25; product 2 has 1000 days of cover
+    assert result["reorder_quantity"].tolist() == [25, 0]
+    assert result["reorder_point"].tolist() == pytest.approx([10.0, 1.0])
+    assert result["days_of_cover"].tolist() == pytest.approx([5.0, 1000.0])
+
+    # A configured reorder point still triggers an order without demand history
+    result = forecast(matrix[:, :0], on_hand=[3, 30], lead_time_days=[7, 7], settings=settings,
+                      min_order=[25, 25], min_reorder_point=[10, 10])
+    assert result["reorder_quantity"].tolist() == [25, 0]
+
+
+@pytest.fixture
+def demand_client(client, warehouses, seed):
+    """Product 1 sold 2 units/day for the last 28 days; product 2 never sold."""
+    now = datetime.utcnow()
+    seed(
+        main.Product(id=1, sku="FC-1", name="Tape", category="Packing", stock=10,
+                     lead_time_days=7, reorder_quantity=10),
+        main.Product(id=2, sku="FC-2", name="Box", category="Packing", stock=10, lead_time_days=7),
+        *(main.StockMovement(product_id=1, warehouse_id=1, movement_type="outbound", quantity=2,
+                             created_at=now - timedelta(days=day))
+          for day in range(28)),
+    )
+    return client
+
+
+def test_forecast_endpoint(demand_client):
+    rows = demand_client.get("/forecast", params={"service_level": 0.5}).json()
+    by_sku = {row["sku"]: row for row in rows}
+    assert by_sku["FC-1"]["recent_demand"] == 56
+    assert by_sku["FC-1"]["daily_demand"] == pytest.approx(2.0)
+    # 2/day over 7 + 28 days = 70, minus 10 on hand
+    assert by_sku["FC-1"]["reorder_quantity"] == 60
+    assert by_sku["FC-2"]["reorder_quantity"] == 0 and by_sku["FC-2"]["days_of_cover"] is None
+
+    assert [row["sku"] for row in demand_client.get("/forecast", params={"needs_reorder": True}).json()] == ["FC-1"]
+    assert demand_client.get("/forecast", params={"method": "naive"}).status_code == 422
+
+
+def test_restock_suggestion_without_llm(demand_client):
+    request = {"product_name": "Tape", "sku": "FC-1", "category": "Packing", "quantity": 4, "use_llm": False}
+    result = demand_client.post("/restock_suggestion", json=request).json()
+    assert "Sold 56 units in the last 28 days" in result["analyzer_summary"]
+    assert "LOW STOCK ALERT" in result["analyzer_summary"]
+    assert result["restock_suggestion"].startswith(f"Order {result['suggested_quantity']} units.")
+    assert "FC-1" in result["reorder_message"]
+
+    # Deterministic: the same request gives the same answer
+    assert demand_client.post("/restock_suggestion", json=request).json() == result
+
+    events = [line for line in demand_client.post("/restock_suggestion/stream", json=request).iter_lines() if line]
+    assert [json.loads(line)["event"] for line in events] == [
+        "analyzer_summary", "restock_suggestion", "reorder_message", "done"
+    ]
+
+    missing = dict(request, sku="NOPE")
+    assert demand_client.post("/restock_suggestion", json=missing).status_code == 404
+
+
+@pytest.fixture
+def reorder_stream(fake_llm, monkeypatch):
+    """The LLM streams the reorder message in three chunks, or hangs after the first when `stall` is set."""
+    stream = {"calls": 0, "stall": False}
+
+    async def chunks(prompt, client, model_name, api_provider, temperature):
+        stream["calls"] += 1
+        yield "Please reorder "
+        if stream["stall"]:
+            await asyncio.sleep(60)
+        yield "FC-1 "
+        yield "today."
+
+    fake_llm()
+    monkeypatch.setattr(utils, "_stream_chunks_async", chunks)
+    return stream
+
+
+def _restock_events(client):
+    request = {"product_name": "Tape", "sku": "FC-1", "category": "Packing", "quantity": 4}
+    return [json.loads(line) for line in client.post("/restock_suggestion/stream", json=request).iter_lines() if line]
+
+
+def test_restock_stream_sends_reorder_tokens(demand_client, reorder_stream):
+    events = _restock_events(demand_client)
+    assert [e["event"] for e in events] == [
+        "analyzer_summary", "restock_suggestion", "reorder_token", "reorder_token", "reorder_token",
+        "reorder_message", "done",
+    ]
+    assert events[-2]["data"] == "Please reorder FC-1 today."
+    # The finished message is cached and replayed as a single token
+    assert [e["event"] for e in _restock_events(demand_client)].count("reorder_token") == 1
+    assert reorder_stream["calls"] == 1
+
+
+def test_restock_stream_timeout(demand_client, reorder_stream, monkeypatch):
+    reorder_stream["stall"] = True
+    monkeypatch.setattr(utils, "LLM_REQUEST_TIMEOUT", 0.1)
+    events = _restock_events(demand_client)
+    assert [e["data"] for e in events if e["event"] == "reorder_token"] == [
+        "Please reorder ", "An API error occurred: request timed out after 0.1s",
+    ]
+    assert events[-1]["event"] == "done"
+    # A timed-out message is not cached
+    _restock_events(demand_client)
+    assert reorder_stream["calls"] == 2
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Tests for the /ask_inventory search index and its cross-worker sync.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import update
+
+import main
+from inventory_search import InventorySearchIndex, extract_search_terms
+
+
+def test_search_terms_add_variants_and_synonyms():
+    assert extract_search_terms("Do we have any laptops in stock?") == [
+        "laptops", "laptop", "macbook", "macbooks", "notebooks", "computers",
+    ]
+    assert extract_search_terms("is the red mug available") == ["red", "reds", "mug", "mugs"]
+
+
+def test_matching_and_ranking():
+    index = InventorySearchIndex()
+    index.rebuild([
+        (1, "Standing Desk", "DSK-1", "Adjustable desk with oak top", "Furniture"),
+        (2, "Desk Lamp", "LMP-1", "LED lamp for any desk", "Lighting"),
+        (3, "Oak Shelf", "SHF-1", None, "Furniture"),
+    ])
+    assert index.ready and len(index) == 3
+    # Substring of any field, case-insensitive
+    assert index.matching_ids("DESK") == {1, 2}
+    assert index.matching_ids("furn") == {1, 3}
+    assert index.matching_ids("lmp-") == {2}
+
+    # Name matches outrank description matches; ties break by id
+    assert index.search(["desk"]) == [(22, 1), (22, 2)]
+    assert index.search(["oak"])[0] == (18, 3)
+
+    index.upsert(2, "Floor Lamp", "LMP-1", "LED lamp", "Lighting")
+    assert index.matching_ids("desk") == {1}
+    index.remove(1)
+    assert index.matching_ids("desk") == set() and len(index) == 2
+
+
+def test_sync_is_throttled_and_watermark_only_moves_forward():
+    index = InventorySearchIndex()
+    assert not index.sync_due(0)  # nothing to catch up before the first build
+    start = datetime(2026, 1, 1)
+    index.rebuild([], synced_through=start)
+    assert index.sync_due(0)
+    assert not index.sync_due(60)
+
+    index.advance(start + timedelta(seconds=5))
+    index.advance(start)
+    index.advance(None)
+    assert index.synced_through == start + timedelta(seconds=5)
+
+
+def test_q_sees_writes_made_by_another_worker(client, session_factory, monkeypatch):
+    monkeypatch.setattr(main, "SEARCH_INDEX_SYNC_INTERVAL", 0)
+    product_id = client.post("/products/", json={"sku": "WS-1", "name": "Walnut stool"}).json()["id"]
+    search = lambda q: [p["sku"] for p in client.get("/products/", params={"q": q}).json()]
+    assert search("walnut") == ["WS-1"]
+
+    # Written through another worker: this worker's index never saw it
+    async def rename():
+        async with session_factory() as db:
+            await db.execute(update(main.Product).where(main.Product.id == product_id)
+                             .values(name="Cherry stool", updated_at=datetime.utcnow()))
+            await db.commit()
+    asyncio.run(rename())
+
+    assert search("cherry") == ["WS-1"]
+    assert search("walnut") == []
+
+
+def test_sync_interval_throttles_table_checks(client, seed, monkeypatch):
+    monkeypatch.setattr(main, "SEARCH_INDEX_SYNC_INTERVAL", 3600)
+    seed(main.Product(sku="WS-2", name="Birch bench", updated_at=datetime.utcnow()))
+    assert client.get("/products/", params={"q": "birch"}).json() == []
+
+    monkeypatch.setattr(main, "SEARCH_INDEX_SYNC_INTERVAL", 0)
+    assert [p["sku"] for p in client.get("/products/", params={"q": "birch"}).json()] == ["WS-2"]
+
+
+def test_ask_merges_keyword_and_vector_matches(client, fake_llm, monkeypatch):
+    ids = {}
+    # Only the vector store sees that a reading light answers a question about lamps
+    monkeypatch.setattr(main, "product_vectors", SimpleNamespace(
+        search=lambda text, k: [(0.8, ids["LGT-9"]), (0.6, ids["LMP-1"])], upsert=lambda *args: None))
+    for sku, name in (("LMP-1", "Desk lamp"), ("LGT-9", "Reading light"), ("MUG-1", "Mug")):
+        ids[sku] = client.post("/products/", json={"sku": sku, "name": name}).json()["id"]
+    prompts = []
+
+    async def completion(prompt, client, model_name, api_provider, temperature=0.7, timeout=None):
+        prompts.append(prompt)
+        return "Two options"
+
+    fake_llm(completion)
+    assert client.post("/ask_inventory", json={"question": "any lamp?"}).json()["answer"] == "Two options"
+    assert "Desk lamp" in prompts[0] and "Reading light" in prompts[0] and "Mug" not in prompts[0]
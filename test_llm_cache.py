@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Tests for the LLM response cache and its use by the AI endpoints.
+"""
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+import main
+from llm_cache import LLMResponseCache, cache_key
+
+
+def test_key_normalizes_whitespace_but_not_parameters():
+    key = cache_key("gpt-4o", "openai", 0.3, "  What is\n\nin   stock? ")
+    assert key == cache_key("gpt-4o", "openai", 0.3, "What is in stock?")
+    assert key != cache_key("gpt-4o", "openai", 0.4, "What is in stock?")
+    assert key != cache_key("gpt-4o-mini", "openai", 0.3, "What is in stock?")
+
+
+def test_lru_eviction_ttl_and_metrics(monkeypatch):
+    cache = LLMResponseCache(max_entries=2, ttl=60)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"  # b is now least recently used
+    cache.put("c", "C")
+    assert cache.get("b") is None and cache.get("c") == "C"
+
+    cache.put("short", "S", ttl=-1)
+    assert cache.get("short") is None
+    metrics = cache.metrics()
+    assert (metrics["hits"], metrics["misses"], metrics["evictions"], metrics["expirations"]) == (2, 2, 2, 1)
+    assert metrics["hit_rate"] == 0.5
+
+
+def test_tags_and_generation():
+    cache = LLMResponseCache()
+    cache.put("q1", "answer 1", tags=["product:1", "product:2"])
+    cache.put("q2", "answer 2", tags=["product:3"])
+    generation = cache.generation
+    assert cache.invalidate_tags(["product:2"]) == 1
+    assert cache.get("q1") is None and cache.get("q2") == "answer 2"
+    # Computed before the invalidation: discarded
+    assert not cache.put("q1", "stale", tags=["product:1", "product:2"], generation=generation)
+    assert cache.get("q1") is None
+    # Invalidating other products does not discard it
+    assert cache.put("q3", "answer 3", tags=["product:1"], generation=generation)
+    assert cache.metrics()["discarded"] == 1
+
+
+def test_forgotten_invalidations_discard_older_puts():
+    cache = LLMResponseCache(max_invalidated_tags=2)
+    generation = cache.generation
+    for product_id in (1, 2, 3):
+        cache.invalidate_tags([f"product:{product_id}"])
+    # product:1's record was forgotten, so a put that may predate it is dropped
+    assert not cache.put("q1", "stale", tags=["product:1"], generation=generation)
+    assert cache.put("q1", "fresh", tags=["product:1"], generation=cache.generation)
+
+    generation = cache.generation
+    cache.clear()
+    assert not cache.put("q2", "stale", tags=[], generation=generation)
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "llm_cache.db")
+    cache = LLMResponseCache(path=path)
+    cache.put("q1", "answer 1", tags=["product:1"])
+    cache.put("q2", "answer 2", tags=["product:2"])
+    cache.close()
+
+    restarted = LLMResponseCache(path=path)
+    assert restarted.get("q1") == "answer 1"
+    assert restarted.metrics()["disk_hits"] == 1
+    restarted.invalidate_tags(["product:2"])
+    restarted.close()
+    assert LLMResponseCache(path=path).get("q2") is None
+
+
+def test_disabled_cache_stores_nothing():
+    cache = LLMResponseCache(max_entries=0)
+    assert not cache.put("a", "A")
+    assert cache.get("a") is None
+
+
+@pytest.fixture
+def numbered_llm(fake_llm):
+    calls = []
+
+    async def completion(prompt, client, model_name, api_provider, temperature=0.7, timeout=None):
+        calls.append(prompt)
+        return f"Answer #{len(calls)}"
+
+    fake_llm(completion)
+    return calls
+
+
+def test_ask_inventory_is_cached_until_its_products_change(client, numbered_llm):
+    product = client.post("/products/", json={"sku": "LC-1", "name": "Desk lamp", "category": "Lighting", "stock": 4})
+    product_id = product.json()["id"]
+
+    ask = lambda: client.post("/ask_inventory", json={"question": "Do we have a desk lamp?"}).json()["answer"]
+    hits = main.llm_cache.metrics()["hits"]  # counters outlive clear(), so compare deltas
+    assert ask() == "Answer #1"
+    assert ask() == "Answer #1"
+    assert len(numbered_llm) == 1
+    assert main.llm_cache.metrics()["hits"] == hits + 1
+
+    client.put(f"/products/{product_id}", json={"stock": 9})
+    assert ask() == "Answer #2"
+
+
+def test_errors_are_not_cached(client, fake_llm):
+    responses = iter(["An API error occurred: boom", '{"product_name": "Mug", "category": "Kitchen"}'])
+
+    async def completion(prompt, client, model_name, api_provider, temperature=0.7, timeout=None):
+        return next(responses)
+
+    fake_llm(completion)
+    assert client.post("/autofill", json={"description": "white ceramic mug"}).status_code == 500
+    assert client.post("/autofill", json={"description": "white ceramic mug"}).json()["product_name"] == "Mug"
+
+
+def test_writes_to_other_products_do_not_discard_an_answer(client, fake_llm):
+    async def completion(prompt, client, model_name, api_provider, temperature=0.7, timeout=None):
+        # Another product changes while this answer is being generated
+        main.llm_cache.invalidate_tags(main.product_tags([999]))
+        return "Restock soon"
+
+    fake_llm(completion)
+    before = main.llm_cache.metrics()
+
+    async def ask():
+        return await main.cached_completion("q", object(), "gpt-4o", "openai", tags=main.product_tags([1]))
+
+    assert asyncio.run(ask()) == "Restock soon"
+    after = main.llm_cache.metrics()
+    assert (after["puts"] - before["puts"], after["discarded"] - before["discarded"]) == (1, 0)
+
+
+def test_disk_invalidation_does_not_wait_for_a_locked_database(tmp_path):
+    path = str(tmp_path / "llm_cache.db")
+    writer = LLMResponseCache(path=path)
+    writer.put("q1", "answer 1", tags=["product:1"])
+    writer.put("q2", "answer 2", tags=["product:2"])
+    writer.close()
+    cache = LLMResponseCache(path=path)
+
+    other_worker = sqlite3.connect(path, isolation_level=None)
+    other_worker.execute("BEGIN IMMEDIATE")
+    started = time.monotonic()
+    cache.invalidate_tags(["product:1"])
+    assert time.monotonic() - started < 1
+    # The row is still on disk but no longer served
+    assert cache.get("q1") is None and cache.get("q2") == "answer 2"
+
+    other_worker.execute("COMMIT")
+    cache.close()
+    assert other_worker.execute("SELECT key FROM llm_cache").fetchall() == [("q2",)]
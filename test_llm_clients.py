@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared LLM client registry and GET /health/llm.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+import main
+import utils
+
+MUG = '{"product_name": "Mug", "category": "Kitchen"}'
+
+
+class FakeOpenAI:
+    """OpenAI-shaped async client that answers every chat completion with `reply`."""
+
+    def __init__(self, http_client=None, reply=MUG, delay=0.0):
+        self.http_client = http_client
+        self.reply = reply
+        self.delay = delay
+        self.calls = self.active = self.peak = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model, messages, temperature, stream=False):
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.reply))])
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """
+    A fresh registry, installed as main.llm_registry, that builds FakeOpenAI
+    clients. Builds are recorded in `registry.builds`; setting `registry.error`
+    makes them fail the way a missing API key does.
+    """
+    registry = utils.LLMClientRegistry(retry_interval=60)
+    registry.builds = []
+    registry.error = None
+
+    def build(model_name, api_provider, http_client=None, use_async=False):
+        registry.builds.append((model_name, use_async))
+        if registry.error:
+            raise ValueError(registry.error)
+        return FakeOpenAI(http_client)
+
+    monkeypatch.setattr(utils, "_create_llm_client", build)
+    monkeypatch.setattr(utils, "load_environment", lambda: None)
+    monkeypatch.setattr(main, "llm_registry", registry)
+    yield registry
+    asyncio.run(registry.aclose())
+
+
+def test_clients_are_built_once_and_share_a_pool(registry):
+    client, model_name, api_provider = registry.get_async("gpt-4o")
+    assert (model_name, api_provider) == ("gpt-4o", "openai")
+    assert registry.get_async("gpt-4o")[0] is client
+
+    # Other models of the same provider get their own client on the same keep-alive pool
+    other = registry.get_async("gpt-4.1-mini")[0]
+    assert other is not client and other.http_client is client.http_client
+    sync = registry.get("gpt-4o")[0]
+    assert sync is not client and sync.http_client is not client.http_client
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        assert {id(c) for c in pool.map(lambda _: registry.get("gpt-4o")[0], range(32))} == {id(sync)}
+    assert registry.builds == [("gpt-4o", True), ("gpt-4.1-mini", True), ("gpt-4o", False)]
+
+
+def test_endpoints_reuse_the_shared_client(client, registry):
+    for description in ("white ceramic mug", "blue ceramic mug"):
+        assert client.post("/autofill", json={"description": description}).json()["product_name"] == "Mug"
+    assert registry.builds == [(main.LLM_MODEL_NAME, True)]
+    assert registry.get_async(main.LLM_MODEL_NAME)[0].calls == 2
+
+
+def test_health_reports_readiness(client, registry):
+    registry.error = "OPENAI_API_KEY not found in .env file."
+    registry.warm_up([main.LLM_MODEL_NAME])
+
+    response = client.get("/health/llm")
+    assert response.status_code == 503
+    detail = response.json()["detail"]
+    assert detail["models"][f"{main.LLM_MODEL_NAME} (async)"] == {
+        "provider": "openai", "ready": False, "error": "OPENAI_API_KEY not found in .env file.",
+    }
+    # Failed builds are not retried on every request
+    assert client.post("/autofill", json={"description": "mug"}).status_code == 503
+    assert len(registry.builds) == 1
+
+    registry.error = None
+    registry.retry_interval = 0
+    assert client.post("/autofill", json={"description": "mug"}).status_code == 200
+    assert client.get("/health/llm").json()["ready"]
+
+
+@pytest.fixture
+def llm_slots(monkeypatch):
+    """Sets the per-process LLM concurrency limit; the semaphore is rebuilt on the test's event loop."""
+    def limit(slots):
+        monkeypatch.setattr(utils, "LLM_MAX_CONCURRENCY", slots)
+        monkeypatch.setattr(utils, "_llm_semaphore", None)
+    limit(utils.LLM_MAX_CONCURRENCY)
+    return limit
+
+
+def test_async_completions_are_bounded(llm_slots):
+    llm_slots(2)
+    client = FakeOpenAI(delay=0.02)
+
+    async def burst():
+        return await asyncio.gather(*(utils.get_completion_async("q", client, "gpt-4o", "openai") for _ in range(6)))
+
+    assert asyncio.run(burst()) == [MUG] * 6
+    assert client.calls == 6 and client.peak == 2
+
+
+def test_async_completion_times_out_and_frees_its_slot(llm_slots):
+    llm_slots(1)
+    client = FakeOpenAI(delay=10)
+
+    async def scenario():
+        timed_out = await utils.get_completion_async("q", client, "gpt-4o", "openai", timeout=0.05)
+        client.delay = 0
+        return timed_out, await utils.get_completion_async("q", client, "gpt-4o", "openai", timeout=1)
+
+    timed_out, answered = asyncio.run(scenario())
+    assert timed_out == "An API error occurred: request timed out after 0.05s"
+    assert answered == MUG and client.active == 0
+
+
+@pytest.fixture
+def fake_chunks(monkeypatch):
+    """Replaces the provider stream with three chunks; it hangs after `stall_after` of them. Records closing."""
+    stream = SimpleNamespace(chunks=["Order ", "12 ", "units."], stall_after=None, closed=False)
+
+    async def chunks(prompt, client, model_name, api_provider, temperature):
+        try:
+            for sent, chunk in enumerate(stream.chunks):
+                if sent == stream.stall_after:
+                    await asyncio.sleep(60)
+                yield chunk
+        finally:
+            stream.closed = True
+
+    monkeypatch.setattr(utils, "_stream_chunks_async", chunks)
+    return stream
+
+
+def test_stream_yields_chunks_in_order(fake_chunks, llm_slots):
+    async def consume():
+        received = []
+        async for chunk in utils.stream_completion_async("q", object(), "gpt-4o", "openai", timeout=1):
+            received.append(chunk)
+            await asyncio.sleep(0.01)  # the consumer's own awaits are outside the read timeout
+        return received
+
+    assert asyncio.run(consume()) == ["Order ", "12 ", "units."]
+    assert fake_chunks.closed
+
+
+def test_stream_timeout_closes_the_provider_stream(fake_chunks, llm_slots):
+    fake_chunks.stall_after = 2
+    llm_slots(1)
+    received = []
+
+    async def consume():
+        async for chunk in utils.stream_completion_async("q", object(), "gpt-4o", "openai", timeout=0.1):
+            received.append((chunk, fake_chunks.closed, utils._get_llm_semaphore().locked()))
+
+    asyncio.run(consume())
+    assert received == [
+        ("Order ", False, True),
+        ("12 ", False, True),
+        # Closed, and the concurrency slot released, before the error is reported
+        ("An API error occurred: request timed out after 0.1s", True, False),
+    ]
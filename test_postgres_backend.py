@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Runs product CRUD against a throwaway PostgreSQL cluster through asyncpg.
+
+Skipped unless asyncpg is installed and the PostgreSQL server binaries
+(initdb, pg_ctl) are on PATH or in the directory named by PG_BIN.
+"""
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("asyncpg")
+
+PG_BIN = os.getenv("PG_BIN")
+INITDB = shutil.which("initdb", path=PG_BIN)
+PG_CTL = shutil.which("pg_ctl", path=PG_BIN)
+if not (INITDB and PG_CTL):
+    pytest.skip("PostgreSQL server binaries not found", allow_module_level=True)
+
+sys.path.insert(0, str(Path(__file__).parent / "app"))
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker  # noqa: E402
+
+import main  # noqa: E402
+from database import DatabaseSettings, create_db_engine  # noqa: E402
+from migrations import run_migrations  # noqa: E402
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def postgres_url():
+    data_dir = tempfile.mkdtemp(prefix="inventory-pg-")
+    port = _free_port()
+    subprocess.run([INITDB, "-D", data_dir, "-U", "postgres", "-A", "trust"],
+                   check=True, capture_output=True)
+    subprocess.run([PG_CTL, "-D", data_dir, "-w", "-l", os.path.join(data_dir, "server.log"),
+                    "-o", f"-p {port} -k {data_dir} -h 127.0.0.1", "start"],
+                   check=True, capture_output=True)
+    try:
+        yield f"postgresql://postgres@127.0.0.1:{port}/postgres"
+    finally:
+        subprocess.run([PG_CTL, "-D", data_dir, "-m", "fast", "stop"], capture_output=True)
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+@pytest.fixture(scope="module")
+def client(postgres_url):
+    engine = create_db_engine(DatabaseSettings(url=postgres_url))
+
+    async def migrate():
+        async with engine.begin() as connection:
+            await connection.run_sync(run_migrations, main.Base.metadata)
+
+    asyncio.run(migrate())
+    # The TestClient runs its own event loop, so the pool must not be shared with asyncio.run's
+    asyncio.run(engine.dispose())
+    sessions = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+    async def get_test_db():
+        async with sessions() as db:
+            yield db
+
+    main.app.dependency_overrides[main.get_db] = get_test_db
+    try:
+        yield TestClient(main.app)
+    finally:
+        main.app.dependency_overrides.pop(main.get_db, None)
+
+
+def test_product_crud(client):
+    response = client.post("/products/", json={"sku": "PG-001", "name": "Postgres Widget", "price": 12.5, "stock": 3})
+    assert response.status_code == 201
+    product = response.json()
+    assert product["price"] == 12.5
+
+    assert client.post("/products/", json={"sku": "PG-001", "name": "Duplicate"}).status_code == 400
+
+    response = client.put(f"/products/{product['id']}", json={"stock": 7})
+    assert response.status_code == 200
+    assert response.json()["stock"] == 7
+
+    assert any(p["sku"] == "PG-001" for p in client.get("/products/").json())
+
+    assert client.delete(f"/products/{product['id']}").status_code == 204
+    assert client.get(f"/products/{product['id']}").status_code == 404
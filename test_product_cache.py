@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for the read-through product cache.
+"""
+import main
+from product_cache import ProductCache
+
+
+def _row(product_id, sku, barcode=None, stock=0):
+    return {"id": product_id, "sku": sku, "barcode": barcode, "name": sku, "stock": stock}
+
+
+def test_lookup_by_every_key_and_invalidation():
+    cache = ProductCache(max_entries=2)
+    assert cache.put(_row(1, "A-1", "111"), cache.token())
+    assert cache.get("id", 1)["sku"] == "A-1"
+    assert cache.get("sku", "A-1")["id"] == 1
+    assert cache.get("barcode", "111")["id"] == 1
+    assert cache.get("sku", "missing") is None
+
+    cache.invalidate([1])
+    assert cache.get("sku", "A-1") is None and cache.get("barcode", "111") is None
+
+    metrics = cache.metrics()
+    assert metrics["keys"]["sku"] == {"hits": 1, "shared_hits": 0, "misses": 2, "hit_rate": 0.3333}
+    assert metrics["keys"]["id"]["hits"] == 1
+
+
+def test_put_after_invalidation_is_discarded():
+    cache = ProductCache()
+    token = cache.token()          # reader starts loading product 1 ...
+    cache.invalidate([1])          # ... a writer commits a change to it ...
+    assert not cache.put(_row(1, "OLD"), token)   # ... so the row it read is not cached
+    assert cache.get("id", 1) is None
+    assert cache.metrics()["discarded"] == 1
+
+
+def test_shared_tier_keeps_workers_coherent(tmp_path):
+    path = str(tmp_path / "products.db")
+    worker_a = ProductCache(path=path, sync_interval=0)
+    worker_b = ProductCache(path=path, sync_interval=0)
+    try:
+        worker_a.put(_row(7, "S-7", stock=5), worker_a.token())
+        assert worker_b.get("sku", "S-7")["stock"] == 5      # served from the shared tier
+        assert worker_b.metrics()["keys"]["sku"]["shared_hits"] == 1
+
+        token = worker_b.token()
+        worker_a.invalidate([7])                              # a write lands on worker A
+        assert worker_b.get("id", 7) is None                  # B replays the invalidation
+        assert not worker_b.put(_row(7, "S-7", stock=5), token)
+    finally:
+        worker_a.close()
+        worker_b.close()
+
+
+def test_api_reads_through_and_writes_invalidate(client, warehouses, move):
+    created = client.post("/products/", json={"sku": "C-1", "name": "Cable", "barcode": "400"}).json()
+    product_id = created["id"]
+    before = main.product_cache.metrics()["keys"]["id"]    # counters outlive clear(), so compare deltas
+    assert client.get(f"/products/{product_id}").json()["name"] == "Cable"
+    assert client.get(f"/products/{product_id}").json()["name"] == "Cable"
+    after = main.product_cache.metrics()["keys"]["id"]
+    assert (after["hits"] - before["hits"], after["misses"] - before["misses"]) == (1, 1)
+
+    # Uniqueness checks are answered from the cached row
+    assert client.post("/products/", json={"sku": "C-1", "name": "Dup"}).status_code == 400
+    assert client.post("/products/", json={"sku": "C-2", "name": "Dup", "barcode": "400"}).status_code == 400
+    assert client.put(f"/products/{product_id}", json={"sku": "C-1"}).status_code == 200
+
+    client.put(f"/products/{product_id}", json={"name": "Cable v2"})
+    assert client.get(f"/products/{product_id}").json()["name"] == "Cable v2"
+
+    move(product_id=product_id, warehouse_id=1, movement_type="inbound", quantity=3)
+    assert client.get(f"/products/{product_id}").json()["stock"] == 3
+
+    spare_id = client.post("/products/", json={"sku": "C-9", "name": "Spare"}).json()["id"]
+    assert client.get(f"/products/{spare_id}").status_code == 200
+    assert client.delete(f"/products/{spare_id}").status_code == 204
+    assert client.get(f"/products/{spare_id}").status_code == 404
+    assert client.post("/products/", json={"sku": "C-9", "name": "Reused"}).status_code == 201
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Tests for the scanner lookup endpoints.
+"""
+import pytest
+
+import main
+
+
+@pytest.fixture
+def scanner_client(client):
+    for i in range(1, 4):
+        response = client.post("/products/", json={"sku": f"SCAN-{i}", "name": f"Item {i}", "barcode": f"00{i}",
+                                                   "price": 1.5 * i, "description": "long text " * 20})
+        assert response.status_code == 201
+    client.post("/products/", json={"sku": "002", "name": "SKU that looks like a barcode"})
+    return client
+
+
+def test_single_lookups(scanner_client):
+    assert scanner_client.get("/products/by-barcode/002").json()["sku"] == "SCAN-2"
+    assert scanner_client.get("/products/by-sku/SCAN-3").json()["barcode"] == "003"
+    assert scanner_client.get("/products/by-barcode/999").status_code == 404
+    assert scanner_client.get("/products/by-sku/NOPE").status_code == 404
+
+
+def test_batch_lookup(scanner_client):
+    response = scanner_client.post("/products/lookup", json={"codes": ["003", "SCAN-1", "nope", "002", "003"]})
+    assert response.status_code == 200
+    result = response.json()
+    assert [(p["code"], p["sku"]) for p in result["found"]] == [("003", "SCAN-3"), ("SCAN-1", "SCAN-1"),
+                                                                ("002", "SCAN-2")]
+    assert result["missing"] == ["nope"]
+    assert set(result["found"][0]) == {"code", "id", "sku", "barcode", "name", "price", "stock", "is_active"}
+    assert result["found"][0]["price"] == 4.5
+
+    by_sku = scanner_client.post("/products/lookup", json={"codes": ["002", "003"], "by": "sku"}).json()
+    assert [p["name"] for p in by_sku["found"]] == ["SKU that looks like a barcode"]
+    assert by_sku["missing"] == ["003"]
+
+    # The rows found by the batch query were cached for the next scan
+    assert main.product_cache.get("barcode", "003")["sku"] == "SCAN-3"
+
+
+def test_batch_lookup_limits(scanner_client):
+    too_many = [str(i) for i in range(main.PRODUCT_LOOKUP_MAX + 1)]
+    assert scanner_client.post("/products/lookup", json={"codes": too_many}).status_code == 422
+    assert scanner_client.post("/products/lookup", json={"codes": []}).status_code == 422
+    assert scanner_client.post("/products/lookup", json={"codes": ["1"], "by": "name"}).status_code == 422
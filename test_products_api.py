@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+In-process tests for the product endpoints (see conftest.py for the
+`client` fixture).
+"""
+import pytest
+
+import main
+
+CATEGORIES = ["Electronics", "Furniture", None, "Office Supplies"]
+
+
+def _create_products(client, count):
+    for i in range(count):
+        response = client.post("/products/", json={
+            "sku": f"SKU-{i:03d}", "name": f"Product {i}", "category": CATEGORIES[i % len(CATEGORIES)],
+            "price": i + 0.5, "stock": i,
+        })
+        assert response.status_code == 201
+
+
+def _all_pages(client, **params):
+    seen, cursor = [], None
+    while True:
+        query = dict(params, **({"cursor": cursor} if cursor else {}))
+        response = client.get("/products/", params=query)
+        assert response.status_code == 200
+        seen.extend(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return seen
+
+
+def test_cursor_pages_by_id(client):
+    _create_products(client, 11)
+    products = _all_pages(client, limit=4)
+    assert [p["id"] for p in products] == sorted(p["id"] for p in products)
+    assert len(products) == 11
+
+
+def test_cursor_pages_by_category(client):
+    _create_products(client, 11)
+    products = _all_pages(client, limit=3, sort="category", fields="category")
+    keys = [(p["category"] is not None, p["category"] or "", p["id"]) for p in products]
+    assert keys == sorted(keys)
+    assert len({p["id"] for p in products}) == 11
+
+
+def test_fields_projection(client):
+    _create_products(client, 2)
+    products = client.get("/products/", params={"fields": "sku,price"}).json()
+    assert products[0] == {"id": products[0]["id"], "sku": "SKU-000", "price": 0.5}
+    assert client.get("/products/", params={"fields": "sku,password"}).status_code == 400
+
+    # Documented as full product rows; projected pages are not validated against the model
+    schema = client.get("/openapi.json").json()["paths"]["/products/"]["get"]["responses"]["200"]
+    assert schema["content"]["application/json"]["schema"]["items"]["$ref"].endswith("/ProductResponse")
+
+
+def test_cursor_is_tied_to_sort(client):
+    _create_products(client, 3)
+    cursor = client.get("/products/", params={"limit": 1}).headers["X-Next-Cursor"]
+    assert client.get("/products/", params={"cursor": cursor, "sort": "category"}).status_code == 400
+    assert client.get("/products/", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_filters(client):
+    _create_products(client, 12)
+    ids = lambda **params: [p["id"] for p in client.get("/products/", params=dict(params, fields="id")).json()]
+    products = {p["sku"]: p for p in client.get("/products/").json()}
+
+    assert ids(category="Furniture") == [products[f"SKU-{i:03d}"]["id"] for i in (1, 5, 9)]
+    assert len(ids(stock_lt=3)) == 3
+    assert len(ids(price_min=2, price_max=4.5)) == 3
+    assert len(ids(is_active=True)) == 12 and ids(is_active=False) == []
+    assert ids(category="Furniture", stock_lt=5) == [products["SKU-001"]["id"]]
+
+
+def test_sort_descending_pages(client):
+    _create_products(client, 9)
+    products = _all_pages(client, limit=2, sort="-price", fields="price")
+    assert [p["price"] for p in products] == sorted((i + 0.5 for i in range(9)), reverse=True)
+
+
+@pytest.mark.parametrize("index_ready", [True, False])
+def test_q_search(client, index_ready):
+    _create_products(client, 5)
+    client.post("/products/", json={"sku": "LAP-100", "name": "Gaming Laptop", "description": "16GB RAM"})
+    main.inventory_index.ready = index_ready
+    assert [p["sku"] for p in client.get("/products/", params={"q": "laptop 16gb"}).json()] == ["LAP-100"]
+    assert client.get("/products/", params={"q": "laptop tablet"}).json() == []
+    assert client.get("/products/", params={"q": "100%"}).json() == []
+
+
+def test_total_count_is_invalidated_on_write(client):
+    _create_products(client, 4)
+    response = client.get("/products/", params={"limit": 1, "include_total": True, "category": "Electronics"})
+    assert response.headers["X-Total-Count"] == "1"
+    client.post("/products/", json={"sku": "NEW-1", "name": "New", "category": "Electronics"})
+    response = client.get("/products/", params={"limit": 1, "include_total": True, "category": "Electronics"})
+    assert response.headers["X-Total-Count"] == "2"
+
+
+def test_bulk_create_reports_row_errors(client):
+    client.post("/products/", json={"sku": "OLD-1", "name": "Existing", "barcode": "111"})
+    rows = [
+        {"sku": "B-1", "name": "One", "price": 1.25},
+        {"sku": "B-1", "name": "Duplicate in payload"},
+        {"sku": "OLD-1", "name": "Clashes with stored SKU"},
+        {"sku": "B-2", "name": "Clashes with stored barcode", "barcode": "111"},
+        {"sku": "B-3", "price": -1},
+        {"sku": "B-4", "name": "Four", "category": "Furniture"},
+    ]
+    result = client.post("/products/bulk", json=rows).json()
+    assert (result["created"], result["updated"], result["failed"]) == (2, 0, 4)
+    assert [e["index"] for e in result["errors"]] == [1, 2, 3, 4]
+    assert [p["sku"] for p in client.get("/products/", params={"q": "four"}).json()] == ["B-4"]
+
+
+def test_bulk_upsert_from_ndjson(client):
+    client.post("/products/", json={"sku": "UP-1", "name": "Before", "stock": 1})
+    body = "\n".join([
+        '{"sku": "UP-1", "name": "After", "stock": 9}',
+        '{"sku": "UP-2", "name": "New"}',
+        '{not json',
+    ])
+    response = client.post("/products/bulk", params={"on_conflict": "update"}, content=body,
+                           headers={"Content-Type": "application/x-ndjson"})
+    result = response.json()
+    assert (result["created"], result["updated"], result["failed"]) == (1, 1, 1)
+    products = {p["sku"]: p for p in client.get("/products/").json()}
+    assert products["UP-1"]["name"] == "After" and products["UP-1"]["stock"] == 9
+    assert "UP-2" in products
+
+
+def test_bulk_update(client):
+    _create_products(client, 3)
+    ids = [p["id"] for p in client.get("/products/").json()]
+    rows = [
+        {"id": ids[0], "price": 10},
+        {"id": ids[1], "name": "Renamed", "stock": 0},
+        {"id": ids[2], "sku": "SKU-000"},
+        {"id": 99999, "name": "Missing"},
+    ]
+    result = client.put("/products/bulk", json=rows).json()
+    assert (result["updated"], result["failed"]) == (2, 2)
+    assert [(e["index"], e["error"]) for e in result["errors"]] == [(2, "SKU already exists"), (3, "Product not found")]
+    products = {p["id"]: p for p in client.get("/products/").json()}
+    assert products[ids[0]]["price"] == 10 and products[ids[0]]["name"] == "Product 0"
+    assert products[ids[1]]["name"] == "Renamed" and products[ids[1]]["stock"] == 0
+
+
+def test_streamed_page_matches_buffered_page(client):
+    _create_products(client, 5)
+    buffered = client.get("/products/", params={"limit": 3, "include_total": True})
+    streamed = client.get("/products/", params={"limit": 3, "include_total": True, "stream": True})
+    assert streamed.status_code == 200
+    assert streamed.json() == buffered.json()
+    assert streamed.headers["content-type"] == "application/json"
+    for header in ("X-Next-Cursor", "X-Total-Count"):
+        assert streamed.headers[header] == buffered.headers[header]
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Checks that the hot inventory queries are served by indexes.
+
+Builds a throwaway SQLite database through the migration runner, then runs
+EXPLAIN QUERY PLAN on each hot query and fails if SQLite falls back to a
+full table scan.
+"""
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import and_, create_engine, func, or_, select, text
+
+sys.path.insert(0, str(Path(__file__).parent / "app"))
+from main import Base, CatalogVersion, InventoryLevel, Product, ReorderAlert, StockMovement  # noqa: E402
+from migrations import MIGRATIONS, run_migrations  # noqa: E402
+
+HOT_QUERIES = {
+    "stock movements by product, warehouse and time": (
+        select(StockMovement)
+        .where(StockMovement.product_id == 1, StockMovement.warehouse_id == 1,
+               StockMovement.created_at >= "2024-01-01")
+        .order_by(StockMovement.created_at)
+    ),
+    "open reorder alerts": select(ReorderAlert).where(ReorderAlert.is_resolved == 0),
+    "active products in a category": (
+        select(Product).where(Product.category == "Electronics", Product.is_active == 1)
+    ),
+    "inventory levels in a warehouse": select(InventoryLevel).where(InventoryLevel.warehouse_id == 1),
+    "product page after a (category, id) cursor": (
+        select(Product.id, Product.category)
+        .where(or_(Product.category > "Electronics",
+                   and_(Product.category == "Electronics", Product.id > 100)))
+        .order_by(Product.category.asc().nulls_first(), Product.id)
+        .limit(100)
+    ),
+    "stock movement export for a warehouse and time range": (
+        select(StockMovement)
+        .where(StockMovement.warehouse_id == 1, StockMovement.created_at >= "2024-01-01",
+               StockMovement.created_at < "2024-02-01")
+        .order_by(StockMovement.created_at, StockMovement.id)
+    ),
+    "stock movement export for a time range": (
+        select(StockMovement)
+        .where(StockMovement.created_at >= "2024-01-01", StockMovement.created_at < "2024-02-01")
+        .order_by(StockMovement.created_at, StockMovement.id)
+    ),
+    "low-stock products": select(Product.id, Product.stock).where(Product.stock < 5),
+    "products by price, most expensive first": (
+        select(Product.id, Product.price)
+        .where(Product.price >= 1000, Product.price <= 5000)
+        .order_by(Product.price.desc().nulls_last(), Product.id.desc())
+        .limit(100)
+    ),
+    "scanner batch lookup by barcode or sku": (
+        select(Product).where(or_(Product.barcode.in_(["0012345678905", "MUG-WHT-12"]),
+                                  Product.sku.in_(["0012345678905", "MUG-WHT-12"])))
+    ),
+    "latest product update for the search index watermark": select(func.max(Product.updated_at)),
+    "catalog revision for the list ETag": select(CatalogVersion.revision).where(CatalogVersion.id == 1),
+}
+
+
+@pytest.fixture(scope="module")
+def connection():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        run_migrations(conn, Base.metadata)
+        yield conn
+
+
+def _query_plan(conn, statement):
+    sql = str(statement.compile(conn, compile_kwargs={"literal_binds": True}))
+    return [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+
+def test_migrations_are_recorded(connection):
+    versions = [row[0] for row in connection.execute(text("SELECT version FROM schema_migrations ORDER BY version"))]
+    assert versions == sorted(m.version for m in MIGRATIONS)
+    # Re-running is a no-op
+    assert run_migrations(connection, Base.metadata) == []
+
+
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+def test_hot_query_uses_index(connection, name):
+    plan = _query_plan(connection, HOT_QUERIES[name])
+    full_scans = [step for step in plan if step.startswith("SCAN") and "INDEX" not in step]
+    assert not full_scans, f"{name}: full table scan in plan {plan}"
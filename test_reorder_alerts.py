@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests for the reorder alert engine and GET /reorder_alerts.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def alert_client(client, warehouses, seed):
+    """Warehouses 1 and 2; product 1 reorders at 10 (50 per order, 7 day lead time), product 2 never."""
+    seed(
+        main.Product(id=1, sku="RA-1", name="Tape", category="Packing",
+                     reorder_point=10, reorder_quantity=50, lead_time_days=7),
+        main.Product(id=2, sku="RA-2", name="Box", category="Packing", reorder_point=0),
+    )
+    main.reorder_alert_engine._touched.clear()  # the engine is shared between tests
+    return client
+
+
+def _evaluate(client, full=False):
+    return client.post("/reorder_alerts/evaluate", params={"full": full}).json()
+
+
+def test_movements_open_and_resolve_alerts(alert_client, move):
+    move(product_id=1, warehouse_id=1, movement_type="INBOUND", quantity=12)
+    move(product_id=2, warehouse_id=1, movement_type="INBOUND", quantity=1)
+    assert _evaluate(alert_client) == {"full": False, "created": 0, "resolved": 0}
+
+    move(product_id=1, warehouse_id=1, movement_type="OUTBOUND", quantity=4)
+    assert main.reorder_alert_engine.pending() == 1
+    assert _evaluate(alert_client)["created"] == 1
+    assert main.reorder_alert_engine.pending() == 0
+
+    alerts = alert_client.get("/reorder_alerts").json()
+    assert [(a["product_id"], a["warehouse_id"], a["quantity"], a["warehouse_name"]) for a in alerts] == [
+        (1, 1, 8, "North")
+    ]
+    assert not alerts[0]["is_resolved"]
+
+    # Still low: no duplicate, even on a full sweep
+    move(product_id=1, warehouse_id=1, movement_type="OUTBOUND", quantity=1)
+    assert _evaluate(alert_client)["created"] == 0
+    assert _evaluate(alert_client, full=True)["created"] == 0
+
+    move(product_id=1, warehouse_id=1, movement_type="INBOUND", quantity=50)
+    assert _evaluate(alert_client) == {"full": False, "created": 0, "resolved": 1}
+    assert alert_client.get("/reorder_alerts").json() == []
+    resolved = alert_client.get("/reorder_alerts", params={"status": "resolved"}).json()
+    assert len(resolved) == 1 and resolved[0]["resolved_at"]
+
+
+def test_suggested_quantity_covers_lead_time_demand(alert_client, seed, move):
+    seed(
+        main.InventoryLevel(product_id=1, warehouse_id=1, quantity=20),
+        main.InventoryLevel(product_id=1, warehouse_id=2, quantity=20),
+        main.StockMovement(product_id=1, warehouse_id=2, movement_type="outbound", quantity=1000,
+                           created_at=datetime.utcnow() - timedelta(days=5)),
+        main.StockMovement(product_id=1, warehouse_id=2, movement_type="outbound", quantity=5000,
+                           created_at=datetime.utcnow() - timedelta(days=90)),
+    )
+    move(product_id=1, warehouse_id=1, movement_type="OUTBOUND", quantity=15)
+    move(product_id=1, warehouse_id=2, movement_type="OUTBOUND", quantity=15)
+    _evaluate(alert_client)
+
+    suggested = {a["warehouse_id"]: a["suggested_quantity"] for a in alert_client.get("/reorder_alerts").json()}
+    # North: 15 units in 30 days over a 7 day lead time is 4 more; 10 - 5 + 4 < reorder_quantity 50
+    # South: only the last 30 days count, ceil(1015 * 7 / 30) = 237; 10 - 5 + 237 = 242
+    assert suggested == {1: 50, 2: 242}
+
+
+def test_sweep_and_filters(alert_client, seed):
+    seed(
+        main.InventoryLevel(product_id=1, warehouse_id=1, quantity=3),
+        main.InventoryLevel(product_id=1, warehouse_id=2, quantity=40),
+        main.InventoryLevel(product_id=2, warehouse_id=2, quantity=0),
+    )
+
+    # Written behind the API's back, so only a sweep sees them
+    assert _evaluate(alert_client)["created"] == 0
+    assert _evaluate(alert_client, full=True)["created"] == 1
+
+    assert len(alert_client.get("/reorder_alerts", params={"warehouse_id": 1}).json()) == 1
+    assert alert_client.get("/reorder_alerts", params={"warehouse_id": 2}).json() == []
+    assert len(alert_client.get("/reorder_alerts", params={"category": "Packing", "status": "all"}).json()) == 1
+    assert alert_client.get("/reorder_alerts", params={"product_id": 2}).json() == []
+
+    # Raising the reorder point through the API queues the product for the next incremental run
+    alert_client.put("/products/1", json={"reorder_point": 50})
+    assert _evaluate(alert_client)["created"] == 1
+    assert alert_client.get("/reorder_alerts").json()[0]["warehouse_id"] == 2
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests for POST /restock_suggestion/batch.
+"""
+import asyncio
+import json
+
+import pytest
+
+import main
+from forecasting import forecasting_available
+
+pytestmark = pytest.mark.skipif(not forecasting_available(), reason="numpy not installed")
+
+
+@pytest.fixture
+def batch_client(client, seed):
+    """Products 1-5 at or below their reorder point of 10, product 6 well stocked, product 7 inactive."""
+    seed(
+        *(main.Product(id=i, sku=f"RB-{i}", name=f"Item {i}", category="Packing", stock=i * 2,
+                       reorder_point=10, reorder_quantity=20, lead_time_days=7)
+          for i in range(1, 6)),
+        main.Product(id=6, sku="RB-6", name="Item 6", category="Packing", stock=500, reorder_point=10),
+        main.Product(id=7, sku="RB-7", name="Item 7", stock=0, reorder_point=10, is_active=0),
+    )
+    return client
+
+
+@pytest.fixture
+def packing_llm(fake_llm, monkeypatch):
+    """Answers packed prompts in JSON, dropping RB-2; records prompts and peak concurrency."""
+    calls = {"prompts": [], "active": 0, "peak": 0}
+
+    async def completion(prompt, client, model_name, api_provider, temperature=0.7, timeout=None):
+        calls["prompts"].append(prompt)
+        calls["active"] += 1
+        calls["peak"] = max(calls["peak"], calls["active"])
+        await asyncio.sleep(0.01)
+        calls["active"] -= 1
+        products = json.loads(prompt.split("Products (JSON):\n", 1)[1].split("\n\nRespond", 1)[0])
+        answer = [{"sku": p["sku"], "reorder_message": f"Please reorder {p['sku']}."}
+                  for p in products if p["sku"] != "RB-2"]
+        return "```json\n" + json.dumps(answer) + "\n```"
+
+    fake_llm(completion)
+    monkeypatch.setattr(main, "RESTOCK_BATCH_CONCURRENCY", 2)
+    return calls
+
+
+def test_skus_are_packed_and_bounded(batch_client, packing_llm):
+    skus = ["RB-5", "RB-1", "RB-2", "RB-3", "RB-4", "NOPE"]
+    result = batch_client.post("/restock_suggestion/batch", json={"skus": skus, "pack_size": 2}).json()
+    items = result["items"]
+    assert [item["sku"] for item in items] == skus[:-1] + ["NOPE"]
+    assert items[-1]["error"] == "Product not found"
+    assert len(packing_llm["prompts"]) == 3 and packing_llm["peak"] <= 2
+
+    by_sku = {item["sku"]: item for item in items}
+    assert by_sku["RB-1"]["reorder_message"] == "Please reorder RB-1." and by_sku["RB-1"]["message_source"] == "llm"
+    # Left out of the model's answer: falls back to the template
+    assert by_sku["RB-2"]["message_source"] == "template" and "RB-2" in by_sku["RB-2"]["reorder_message"]
+    assert by_sku["RB-1"]["suggested_quantity"] > 0
+
+
+def test_filter_and_stream(batch_client, packing_llm):
+    response = batch_client.post("/restock_suggestion/batch", params={"stream": True},
+                                 json={"below_reorder_point": True, "pack_size": 4})
+    events = [json.loads(line) for line in response.iter_lines() if line]
+    assert events[-1] == {"event": "done", "data": {"products": 5, "missing": 0}}
+    assert sorted(e["data"]["sku"] for e in events if e["event"] == "suggestion") == [f"RB-{i}" for i in range(1, 6)]
+    assert len(packing_llm["prompts"]) == 2
+
+
+def test_without_llm_and_validation(batch_client):
+    result = batch_client.post("/restock_suggestion/batch", json={"needs_reorder": True, "use_llm": False}).json()
+    assert {item["message_source"] for item in result["items"]} == {"template"}
+    assert "RB-6" not in [item["sku"] for item in result["items"]]
+    assert batch_client.post("/restock_suggestion/batch", json={"use_llm": False}).status_code == 422
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Tests for the fast JSON encoding used by list endpoints.
+"""
+import json
+from datetime import datetime
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import serialization
+from serialization import JSONRowsResponse, dumps, iter_json_array
+
+ROWS = [
+    {"id": i, "sku": f"SKU-{i}", "name": "Café ☕", "price": i + 0.25, "is_active": bool(i % 2),
+     "barcode": None, "created_at": datetime(2026, 10, 18, 9, 30, i, 1500 * i)}
+    for i in range(7)
+]
+
+
+@pytest.fixture(params=["orjson", "json"])
+def encoder(request, monkeypatch):
+    if request.param == "orjson":
+        if not serialization.orjson_available():
+            pytest.skip("orjson is not installed")
+    else:
+        monkeypatch.setattr(serialization, "orjson", None)
+    return request.param
+
+
+def test_matches_default_response_path(encoder):
+    expected = JSONResponse(jsonable_encoder(ROWS)).body
+    assert dumps(ROWS) == expected
+    assert JSONRowsResponse(ROWS).body == expected
+
+
+def test_streamed_array_is_the_same_document(encoder):
+    for rows in (ROWS, ROWS[:1], []):
+        assert b"".join(iter_json_array(rows, chunk_rows=3)) == dumps(rows)
+    assert json.loads(b"".join(iter_json_array(ROWS, chunk_rows=2)))[6]["id"] == 6
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Tests for request coalescing of identical in-flight calls.
+"""
+import asyncio
+
+import pytest
+
+import main
+from single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    async def scenario():
+        flights, calls = SingleFlight(), []
+
+        async def upstream():
+            calls.append(1)
+            await asyncio.sleep(0.02)
+            return "result"
+
+        results = await asyncio.gather(*(flights.do("k", upstream) for _ in range(10)))
+        assert results == ["result"] * 10 and len(calls) == 1
+        assert flights.metrics()["coalesced"] == 9 and flights.in_flight() == 0
+
+        # Once finished, the next call starts a new flight
+        assert await flights.do("k", upstream) == "result" and len(calls) == 2
+
+    asyncio.run(scenario())
+
+
+def test_exceptions_reach_every_caller():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def upstream():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        results = await asyncio.gather(*(flights.do("k", upstream) for _ in range(3)), return_exceptions=True)
+        assert [str(r) for r in results] == ["upstream down"] * 3
+
+    asyncio.run(scenario())
+
+
+def test_cancelling_one_caller_keeps_the_call_for_others():
+    async def scenario():
+        flights, finished = SingleFlight(), []
+
+        async def upstream():
+            await asyncio.sleep(0.05)
+            finished.append(1)
+            return "result"
+
+        first = asyncio.create_task(flights.do("k", upstream))
+        second = asyncio.create_task(flights.do("k", upstream))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == "result" and finished == [1]
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(scenario())
+
+
+def test_call_is_cancelled_when_every_caller_gives_up():
+    async def scenario():
+        flights, cancelled = SingleFlight(), []
+
+        async def upstream():
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+
+        waiters = [flights.do("k", upstream, timeout=0.02) for _ in range(2)]
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        assert all(isinstance(r, asyncio.TimeoutError) for r in results)
+        await asyncio.sleep(0)
+        assert cancelled == [1] and flights.in_flight() == 0
+        assert flights.metrics()["abandoned"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_identical_autofill_requests_make_one_llm_call(client, fake_llm, monkeypatch):
+    calls = []
+
+    async def completion(prompt, client, model_name, api_provider, temperature=0.7, timeout=None):
+        calls.append(prompt)
+        await asyncio.sleep(0.05)
+        return '{"product_name": "Mug", "category": "Kitchen"}'
+
+    fake_llm(completion)
+    monkeypatch.setattr(main.llm_cache, "max_entries", 0)  # coalescing alone, no cache
+
+    async def storm():
+        import httpx
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await asyncio.gather(*(
+                http.post("/autofill", json={"description": "white ceramic mug"}) for _ in range(5)
+            ))
+
+    responses = asyncio.run(storm())
+    assert [r.json()["product_name"] for r in responses] == ["Mug"] * 5
+    assert len(calls) == 1
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Tests for the stock movement ledger endpoints.
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import func, select
+
+import main
+
+
+@pytest.fixture
+def warehouse_client(client, warehouses, seed):
+    """Client with warehouses 1 and 2 and product 1 (catalog stock 10, nothing in any warehouse yet)."""
+    seed(main.Product(id=1, sku="MOVE-1", name="Mover", stock=10))
+    return client
+
+
+def _levels(result):
+    return {(l["product_id"], l["warehouse_id"]): l["quantity"] for l in result["levels"]}
+
+
+def _ledger_count(session_factory):
+    async def count():
+        async with session_factory() as db:
+            return (await db.execute(select(func.count()).select_from(main.StockMovement))).scalar_one()
+    return asyncio.run(count())
+
+
+def test_inbound_outbound_and_damage(warehouse_client):
+    move = lambda **kw: warehouse_client.post("/stock_movements", json=dict(product_id=1, warehouse_id=1, **kw))
+
+    response = move(movement_type="INBOUND", quantity=20, reference_number="PO-1")
+    assert response.status_code == 201
+    result = response.json()
+    assert result["movements"][0]["movement_type"] == "inbound"
+    assert _levels(result) == {(1, 1): 20}
+
+    assert _levels(move(movement_type="outbound", quantity=5).json()) == {(1, 1): 15}
+    assert _levels(move(movement_type="damage", quantity=3).json()) == {(1, 1): 12}
+    assert _levels(move(movement_type="ADJUSTMENT", quantity=-2).json()) == {(1, 1): 10}
+    assert warehouse_client.get("/products/1").json()["stock"] == 10 + 20 - 5 - 3 - 2
+
+
+def test_outbound_cannot_go_negative(warehouse_client, session_factory):
+    response = warehouse_client.post("/stock_movements", json={
+        "product_id": 1, "warehouse_id": 1, "movement_type": "OUTBOUND", "quantity": 1,
+    })
+    assert response.status_code == 409
+    assert _ledger_count(session_factory) == 0
+
+
+def test_transfer_writes_two_rows(warehouse_client):
+    warehouse_client.post("/stock_movements", json={
+        "product_id": 1, "warehouse_id": 1, "movement_type": "INBOUND", "quantity": 8,
+    })
+    result = warehouse_client.post("/stock_movements", json={
+        "product_id": 1, "warehouse_id": 1, "to_warehouse_id": 2, "movement_type": "TRANSFER", "quantity": 3,
+    }).json()
+    assert [(m["warehouse_id"], m["quantity"]) for m in result["movements"]] == [(1, -3), (2, 3)]
+    assert _levels(result) == {(1, 1): 5, (1, 2): 3}
+    assert warehouse_client.get("/products/1").json()["stock"] == 18
+
+
+def test_batch_is_all_or_nothing(warehouse_client, session_factory):
+    movements = [
+        {"product_id": 1, "warehouse_id": 1, "movement_type": "INBOUND", "quantity": 4},
+        {"product_id": 1, "warehouse_id": 2, "movement_type": "OUTBOUND", "quantity": 1},
+    ]
+    response = warehouse_client.post("/stock_movements/batch", json={"movements": movements})
+    assert response.status_code == 409
+    assert _ledger_count(session_factory) == 0
+
+    movements[1]["warehouse_id"] = 1
+    result = warehouse_client.post("/stock_movements/batch", json={"movements": movements}).json()
+    assert len(result["movements"]) == 2
+    assert _levels(result) == {(1, 1): 3}
+
+
+def test_validation_and_unknown_ids(warehouse_client):
+    post = lambda **kw: warehouse_client.post("/stock_movements", json=dict(product_id=1, warehouse_id=1, **kw))
+    assert post(movement_type="TRANSFER", quantity=1).status_code == 422
+    assert post(movement_type="INBOUND", quantity=0).status_code == 422
+    assert post(movement_type="INBOUND", quantity=1, to_warehouse_id=2).status_code == 422
+    response = warehouse_client.post("/stock_movements", json={
+        "product_id": 1, "warehouse_id": 9, "movement_type": "INBOUND", "quantity": 1,
+    })
+    assert response.status_code == 404
+
+
+def test_concurrent_movements_are_not_lost(warehouse_client):
+    warehouse_client.post("/stock_movements", json={
+        "product_id": 1, "warehouse_id": 1, "movement_type": "INBOUND", "quantity": 100,
+    })
+
+    async def burst(session_factory):
+        async def one(delta_type):
+            async with session_factory() as db:
+                movement = main.StockMovementCreate(product_id=1, warehouse_id=1, movement_type=delta_type, quantity=1)
+                for _ in range(20):
+                    try:
+                        await main.record_stock_movements(db, [movement])
+                        await db.commit()
+                        return
+                    except Exception:
+                        await db.rollback()
+                        await asyncio.sleep(0.01)
+        await asyncio.gather(*(one("OUTBOUND" if i % 2 else "INBOUND") for i in range(30)))
+
+    factory = main.app.dependency_overrides[main.get_session_factory]()
+    asyncio.run(burst(factory))
+    levels = warehouse_client.post("/stock_movements", json={
+        "product_id": 1, "warehouse_id": 1, "movement_type": "ADJUSTMENT", "quantity": 1,
+    }).json()
+    assert _levels(levels) == {(1, 1): 101}
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Tests for the materialized product/warehouse stock totals.
+"""
+import asyncio
+import json
+
+import pytest
+from sqlalchemy import update
+
+import main
+
+
+@pytest.fixture
+def stocked_client(client, warehouses, seed):
+    seed(main.Product(id=1, sku="T-1", name="One"), main.Product(id=2, sku="T-2", name="Two"))
+    return client
+
+
+def _totals(client):
+    products = {t["product_id"]: (t["quantity"], t["warehouses_in_stock"])
+                for t in client.get("/stock_totals/products").json()}
+    warehouses = {t["warehouse_id"]: (t["quantity"], t["products_in_stock"])
+                  for t in client.get("/stock_totals/warehouses").json()}
+    return products, warehouses
+
+
+def test_movements_update_totals(stocked_client, move):
+    move(product_id=1, warehouse_id=1, movement_type="INBOUND", quantity=10)
+    move(product_id=2, warehouse_id=1, movement_type="INBOUND", quantity=4)
+    move(product_id=1, warehouse_id=1, to_warehouse_id=2, movement_type="TRANSFER", quantity=3)
+    move(product_id=2, warehouse_id=1, movement_type="OUTBOUND", quantity=4)
+
+    products, warehouses = _totals(stocked_client)
+    assert products == {1: (10, 2), 2: (0, 0)}
+    assert warehouses == {1: (7, 1), 2: (3, 1)}
+
+    for source in ("levels", "ledger"):
+        report = stocked_client.get("/stock_totals/verify", params={"source": source}).json()
+        assert report["ok"], report
+
+
+def test_inventory_import_updates_totals(stocked_client, move):
+    move(product_id=1, warehouse_id=1, movement_type="INBOUND", quantity=5)
+    before = {i: stocked_client.get(f"/products/{i}") for i in (1, 2)}
+    assert [before[i].json()["stock"] for i in (1, 2)] == [5, 0]
+    feed = "\n".join(json.dumps(row) for row in [
+        {"product_id": 1, "warehouse_id": 1, "quantity": 2},
+        {"product_id": 2, "warehouse_id": 2, "quantity": 6},
+    ])
+    stocked_client.post("/import/inventory_levels", content=feed, headers={"Content-Type": "application/x-ndjson"})
+
+    assert _totals(stocked_client) == ({1: (2, 1), 2: (6, 1)}, {1: (2, 1), 2: (6, 1)})
+    assert stocked_client.get("/stock_totals/verify").json()["ok"]
+
+    # Product.stock follows the imported levels, and cached copies and ETags are refreshed
+    for product_id, stock in ((1, 2), (2, 6)):
+        after = stocked_client.get(f"/products/{product_id}")
+        assert after.json()["stock"] == stock
+        assert after.headers["etag"] != before[product_id].headers["etag"]
+
+
+def test_verify_detects_drift_and_rebuild_repairs_it(stocked_client, session_factory, move):
+    move(product_id=1, warehouse_id=2, movement_type="INBOUND", quantity=8)
+
+    async def tamper():
+        async with session_factory() as db:
+            await db.execute(update(main.ProductStockTotal).values(quantity=999))
+            await db.commit()
+    asyncio.run(tamper())
+
+    report = stocked_client.get("/stock_totals/verify").json()
+    assert not report["ok"]
+    assert report["products"]["mismatches"] == [{
+        "product_id": 1,
+        "expected": {"quantity": 8, "warehouses_in_stock": 1},
+        "stored": {"quantity": 999, "warehouses_in_stock": 1},
+    }]
+
+    assert stocked_client.post("/stock_totals/rebuild", params={"source": "ledger"}).json()["products"] == 1
+    assert stocked_client.get("/stock_totals/verify").json()["ok"]
+    assert _totals(stocked_client)[0] == {1: (8, 1)}
+
+
+def test_movement_during_inventory_import_keeps_totals_consistent(stocked_client, session_factory, move, monkeypatch):
+    move(product_id=1, warehouse_id=1, movement_type="INBOUND", quantity=5)
+    apply_changes = main.apply_stock_total_changes
+    concurrent = []
+
+    async def movement():
+        async with session_factory() as db:
+            await main.record_stock_movements(db, [main.StockMovementCreate(
+                product_id=1, warehouse_id=1, movement_type="INBOUND", quantity=3)])
+            await db.commit()
+
+    async def interleaved(db, changes):
+        # Another request records a movement once the import has read the old quantities
+        if not concurrent:
+            concurrent.append(asyncio.create_task(movement()))
+            await asyncio.sleep(0.2)
+        await apply_changes(db, changes)
+
+    async def scenario():
+        monkeypatch.setattr(main, "apply_stock_total_changes", interleaved)
+        async with session_factory() as db:
+            await main.import_inventory_level_batch(
+                db, [(0, main.InventoryLevelSet(product_id=1, warehouse_id=1, quantity=2))])
+        await asyncio.gather(*concurrent)
+
+    asyncio.run(scenario())
+    # The movement waits for the import's write lock and then applies on top of it
+    assert _totals(stocked_client)[0][1] == (5, 1)
+    assert stocked_client.get("/products/1").json()["stock"] == 5
+    assert stocked_client.get("/stock_totals/verify").json()["ok"]
+
+
+def test_deleting_a_product_removes_it_from_the_totals(stocked_client, move):
+    move(product_id=1, warehouse_id=1, movement_type="INBOUND", quantity=5)
+    feed = json.dumps({"product_id": 2, "warehouse_id": 1, "quantity": 6})
+    stocked_client.post("/import/inventory_levels", content=feed, headers={"Content-Type": "application/x-ndjson"})
+    assert _totals(stocked_client)[1] == {1: (11, 2)}
+
+    assert stocked_client.delete("/products/2").status_code == 204
+    assert _totals(stocked_client) == ({1: (5, 1)}, {1: (5, 1)})
+    for source in ("levels", "ledger"):
+        assert stocked_client.get("/stock_totals/verify", params={"source": source}).json()["ok"]
+
+    # Products with ledger history stay, so the ledger keeps matching the totals
+    response = stocked_client.delete("/products/1")
+    assert response.status_code == 409
+    assert stocked_client.get("/products/1").status_code == 200
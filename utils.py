@@ -11,6 +11,9 @@ from PIL import Image
 from io import BytesIO
 import re
 import base64
+import threading
+import time
+import asyncio
 
 # --- Dynamic Library Installation ---
 try:
@@ -79,6 +82,40 @@ def load_environment():
         print("Warning: .env file not found. API keys may not be loaded.")
 
 
+def _create_llm_client(model_name, api_provider, http_client=None, use_async=False):
+    """Builds a provider client (sync or async). Raises ImportError/ValueError on failure."""
+    if api_provider == "openai":
+        from openai import OpenAI, AsyncOpenAI
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key: raise ValueError("OPENAI_API_KEY not found in .env file.")
+        client_cls = AsyncOpenAI if use_async else OpenAI
+        if http_client is not None:
+            return client_cls(api_key=api_key, http_client=http_client)
+        return client_cls(api_key=api_key)
+    elif api_provider == "anthropic":
+        from anthropic import Anthropic, AsyncAnthropic
+        api_key = os.getenv("ANTHROPIC_API_KEY")
+        if not api_key: raise ValueError("ANTHROPIC_API_KEY not found in .env file.")
+        client_cls = AsyncAnthropic if use_async else Anthropic
+        if http_client is not None:
+            return client_cls(api_key=api_key, http_client=http_client)
+        return client_cls(api_key=api_key)
+    elif api_provider == "huggingface":
+        from huggingface_hub import InferenceClient, AsyncInferenceClient
+        api_key = os.getenv("HUGGINGFACE_API_KEY")
+        if not api_key: raise ValueError("HUGGINGFACE_API_KEY not found in .env file.")
+        client_cls = AsyncInferenceClient if use_async else InferenceClient
+        return client_cls(model=model_name, token=api_key)
+    elif api_provider == "gemini":
+        # GenerativeModel exposes both generate_content and generate_content_async
+        import google.generativeai as genai
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key: raise ValueError("GOOGLE_API_KEY not found in .env file.")
+        genai.configure(api_key=api_key)
+        return genai.GenerativeModel(model_name)
+    return None
+
+
 def setup_llm_client(model_name="gpt-4o"):
     """Initializes and returns the API client for the specified model provider."""
     load_environment()
@@ -87,29 +124,8 @@ def setup_llm_client(model_name="gpt-4o"):
         return None, None, None
     config = RECOMMENDED_MODELS[model_name]
     api_provider = config["provider"]
-    client = None
     try:
-        if api_provider == "openai":
-            from openai import OpenAI
-            api_key = os.getenv("OPENAI_API_KEY")
-            if not api_key: raise ValueError("OPENAI_API_KEY not found in .env file.")
-            client = OpenAI(api_key=api_key)
-        elif api_provider == "anthropic":
-            from anthropic import Anthropic
-            api_key = os.getenv("ANTHROPIC_API_KEY")
-            if not api_key: raise ValueError("ANTHROPIC_API_KEY not found in .env file.")
-            client = Anthropic(api_key=api_key)
-        elif api_provider == "huggingface":
-            from huggingface_hub import InferenceClient
-            api_key = os.getenv("HUGGINGFACE_API_KEY")
-            if not api_key: raise ValueError("HUGGINGFACE_API_KEY not found in .env file.")
-            client = InferenceClient(model=model_name, token=api_key)
-        elif api_provider == "gemini":
-            import google.generativeai as genai
-            api_key = os.getenv("GOOGLE_API_KEY")
-            if not api_key: raise ValueError("GOOGLE_API_KEY not found in .env file.")
-            genai.configure(api_key=api_key)
-            client = genai.GenerativeModel(model_name)
+        client = _create_llm_client(model_name, api_provider)
     except ImportError:
         print(f"ERROR: The required library for '{api_provider}' is not installed.")
         return None, None, None
@@ -119,6 +135,157 @@ def setup_llm_client(model_name="gpt-4o"):
     print(f"✅ LLM Client configured: Using '{api_provider}' with model '{model_name}'")
     return client, model_name, api_provider
 
+
+# --- Shared Client Registry ---
+
+class LLMClientRegistry:
+    """
+    Process-wide cache of LLM clients, one per (provider, model, sync/async).
+
+    The environment is loaded once, and OpenAI/Anthropic clients share a pooled
+    keep-alive httpx transport per provider, so repeated requests reuse
+    connections and TLS sessions instead of rebuilding a client every call.
+    Failed builds are remembered and only retried after `retry_interval` seconds.
+    """
+
+    def __init__(self, max_connections=20, max_keepalive_connections=10,
+                 keepalive_expiry=30.0, timeout=60.0, retry_interval=30.0):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self._clients = {}
+        self._errors = {}
+        self._http_clients = {}
+        self._expected = set()
+        self._environment_loaded = False
+        self._lock = threading.Lock()
+
+    def _ensure_environment(self):
+        if not self._environment_loaded:
+            load_environment()
+            self._environment_loaded = True
+
+    def _http_client_for(self, api_provider, use_async):
+        """Returns the pooled httpx transport for a provider, or None if unsupported."""
+        if api_provider not in ("openai", "anthropic"):
+            return None
+        key = (api_provider, use_async)
+        if key not in self._http_clients:
+            try:
+                import httpx
+            except ImportError:
+                return None
+            client_cls = httpx.AsyncClient if use_async else httpx.Client
+            self._http_clients[key] = client_cls(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+            )
+        return self._http_clients[key]
+
+    def _build(self, model_name, use_async):
+        api_provider = RECOMMENDED_MODELS[model_name]["provider"]
+        key = (api_provider, model_name, use_async)
+        try:
+            client = _create_llm_client(
+                model_name, api_provider,
+                http_client=self._http_client_for(api_provider, use_async),
+                use_async=use_async,
+            )
+        except ImportError:
+            self._errors[key] = (time.monotonic(), f"The required library for '{api_provider}' is not installed.")
+            return None
+        except ValueError as e:
+            self._errors[key] = (time.monotonic(), str(e))
+            return None
+        self._errors.pop(key, None)
+        self._clients[key] = client
+        kind = "async" if use_async else "sync"
+        print(f"✅ LLM Client registered: Using '{api_provider}' with model '{model_name}' ({kind})")
+        return client
+
+    def _get(self, model_name, use_async):
+        if model_name not in RECOMMENDED_MODELS:
+            print(f"ERROR: Model '{model_name}' is not in the list of recommended models.")
+            return None, None, None
+        api_provider = RECOMMENDED_MODELS[model_name]["provider"]
+        key = (api_provider, model_name, use_async)
+        client = self._clients.get(key)
+        if client is not None:
+            return client, model_name, api_provider
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                failed = self._errors.get(key)
+                if failed and time.monotonic() - failed[0] < self.retry_interval:
+                    return None, None, None
+                self._ensure_environment()
+                client = self._build(model_name, use_async)
+        if client is None:
+            print(f"ERROR: {self._errors[key][1]}")
+            return None, None, None
+        return client, model_name, api_provider
+
+    def get(self, model_name="gpt-4o"):
+        """Returns (client, model_name, api_provider) using the shared sync client."""
+        return self._get(model_name, use_async=False)
+
+    def get_async(self, model_name="gpt-4o"):
+        """Returns (client, model_name, api_provider) using the shared async client."""
+        return self._get(model_name, use_async=True)
+
+    def warm_up(self, model_names, use_async=True):
+        """Builds clients for the given models up front (call once at startup)."""
+        for model_name in model_names:
+            self._expected.add((model_name, use_async))
+            self._get(model_name, use_async)
+
+    def status(self):
+        """Readiness report: every warmed-up client must have been built."""
+        models = {}
+        for model_name, use_async in sorted(self._expected):
+            api_provider = RECOMMENDED_MODELS[model_name]["provider"]
+            key = (api_provider, model_name, use_async)
+            failed = self._errors.get(key)
+            name = f"{model_name} (async)" if use_async else model_name
+            models[name] = {
+                "provider": api_provider,
+                "ready": key in self._clients,
+                "error": failed[1] if failed else None,
+            }
+        return {
+            "ready": bool(models) and all(m["ready"] for m in models.values()),
+            "models": models,
+        }
+
+    async def aclose(self):
+        """Closes pooled transports (sync and async) and drops cached clients."""
+        with self._lock:
+            http_clients = list(self._http_clients.items())
+            self._http_clients.clear()
+            self._clients.clear()
+            self._errors.clear()
+        for (_, use_async), http_client in http_clients:
+            try:
+                if use_async:
+                    await http_client.aclose()
+                else:
+                    http_client.close()
+            except Exception:
+                pass
+
+
+llm_registry = LLMClientRegistry(
+    max_connections=int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "20")),
+    max_keepalive_connections=int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "10")),
+    timeout=float(os.getenv("LLM_HTTP_TIMEOUT", "60")),
+)
+
 # --- Core Interaction Functions ---
 
 def get_completion(prompt, client, model_name, api_provider, temperature=0.7):
@@ -186,6 +353,172 @@ def get_vision_completion(prompt, image_url, client, model_name, api_provider):
     except Exception as e:
         return f"An API error occurred during vision completion: {e}"
 
+# --- Async Interaction Functions ---
+
+# Upper bound on concurrent upstream LLM calls per process, and default per-call timeout
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "60"))
+_llm_semaphore = None
+
+def _get_llm_semaphore():
+    global _llm_semaphore
+    if _llm_semaphore is None:
+        _llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _llm_semaphore
+
+async def _dispatch_completion_async(prompt, client, model_name, api_provider, temperature):
+    if api_provider == "openai":
+        response = await client.chat.completions.create(model=model_name, messages=[{"role": "user", "content": prompt}], temperature=temperature)
+        return response.choices[0].message.content
+    elif api_provider == "anthropic":
+        response = await client.messages.create(
+            model=model_name,
+            max_tokens=4096,
+            temperature=temperature,
+            messages=[{"role": "user", "content": prompt}]
+        )
+        return response.content[0].text
+    elif api_provider == "huggingface":
+        response = await client.chat_completion(messages=[{"role": "user", "content": prompt}], temperature=max(0.1, temperature), max_tokens=4096)
+        return response.choices[0].message.content
+    elif api_provider == "gemini":
+        response = await client.generate_content_async(prompt)
+        return response.text
+
+async def get_completion_async(prompt, client, model_name, api_provider, temperature=0.7, timeout=None):
+    """
+    Async counterpart of get_completion for clients from `llm_registry.get_async`.
+
+    At most LLM_MAX_CONCURRENCY calls run at once; each upstream call is cut off
+    after `timeout` seconds (LLM_REQUEST_TIMEOUT by default).
+    """
+    if not client: return "API client not initialized."
+    timeout = LLM_REQUEST_TIMEOUT if timeout is None else timeout
+    try:
+        async with _get_llm_semaphore():
+            return await asyncio.wait_for(
+                _dispatch_completion_async(prompt, client, model_name, api_provider, temperature),
+                timeout=timeout,
+            )
+    except asyncio.TimeoutError:
+        return f"An API error occurred: request timed out after {timeout}s"
+    except Exception as e:
+        return f"An API error occurred: {e}"
+
+async def _stream_chunks_async(prompt, client, model_name, api_provider, temperature):
+    if api_provider == "openai":
+        stream = await client.chat.completions.create(model=model_name, messages=[{"role": "user", "content": prompt}], temperature=temperature, stream=True)
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    elif api_provider == "anthropic":
+        stream = await client.messages.create(
+            model=model_name,
+            max_tokens=4096,
+            temperature=temperature,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True
+        )
+        async for event in stream:
+            if event.type == "content_block_delta" and getattr(event.delta, "text", None):
+                yield event.delta.text
+    elif api_provider == "huggingface":
+        stream = await client.chat_completion(messages=[{"role": "user", "content": prompt}], temperature=max(0.1, temperature), max_tokens=4096, stream=True)
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    elif api_provider == "gemini":
+        response = await client.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+async def stream_completion_async(prompt, client, model_name, api_provider, temperature=0.7, timeout=None):
+    """
+    Streaming counterpart of get_completion_async: yields text chunks as they arrive.
+
+    The whole stream shares one concurrency slot and must finish within `timeout`
+    seconds; on failure the error message is yielded as the final chunk.
+    """
+    if not client:
+        yield "API client not initialized."
+        return
+    timeout = LLM_REQUEST_TIMEOUT if timeout is None else timeout
+    chunks = _stream_chunks_async(prompt, client, model_name, api_provider, temperature)
+    try:
+        async with _get_llm_semaphore():
+            # One deadline for the whole stream, enforced in this task so the provider SDK's stream
+            # context is never cancelled from another task. The scope covers each read but not the
+            # yield: while suspended there the consumer runs in this same task, and a timeout firing
+            # then would cancel the consumer's own awaits.
+            deadline = asyncio.get_running_loop().time() + timeout
+            while True:
+                try:
+                    async with asyncio.timeout_at(deadline):
+                        chunk = await anext(chunks)
+                except StopAsyncIteration:
+                    break
+                yield chunk
+    except TimeoutError:
+        # Release the upstream connection before reporting the timeout
+        await chunks.aclose()
+        yield f"An API error occurred: request timed out after {timeout}s"
+    except Exception as e:
+        yield f"An API error occurred: {e}"
+    finally:
+        await chunks.aclose()
+
+async def _dispatch_vision_completion_async(prompt, img, image_url, client, model_name, api_provider):
+    if api_provider == "openai":
+        response = await client.chat.completions.create(model=model_name, messages=[{"role": "user", "content": [{"type": "text", "text": prompt}, {"type": "image_url", "image_url": {"url": image_url}}]}], max_tokens=4096)
+        return response.choices[0].message.content
+    elif api_provider == "anthropic":
+        buffered = BytesIO()
+        image_format = img.format if img.format else "JPEG"
+        img.save(buffered, format=image_format)
+        img_base64 = base64.b64encode(buffered.getvalue()).decode("utf-8")
+        media_type = f"image/{image_format.lower()}"
+
+        response = await client.messages.create(
+            model=model_name,
+            max_tokens=4096,
+            messages=[{
+                "role": "user",
+                "content": [
+                    {"type": "image", "source": {"type": "base64", "media_type": media_type, "data": img_base64}},
+                    {"type": "text", "text": prompt}
+                ],
+            }],
+        )
+        return response.content[0].text
+    elif api_provider == "gemini":
+        response = await client.generate_content_async([prompt, img])
+        return response.text
+    elif api_provider == "huggingface":
+        response = await client.image_to_text(image=img, prompt=prompt)
+        return response
+
+async def get_vision_completion_async(prompt, image_url, client, model_name, api_provider, timeout=None):
+    """Async counterpart of get_vision_completion, with the same concurrency limit and timeout."""
+    if not client: return "API client not initialized."
+    if not RECOMMENDED_MODELS.get(model_name, {}).get("vision"):
+        return f"Error: Model '{model_name}' does not support vision."
+    timeout = LLM_REQUEST_TIMEOUT if timeout is None else timeout
+    try:
+        response = await asyncio.to_thread(requests.get, image_url, timeout=timeout)
+        response.raise_for_status()
+        img = Image.open(BytesIO(response.content))
+
+        async with _get_llm_semaphore():
+            return await asyncio.wait_for(
+                _dispatch_vision_completion_async(prompt, img, image_url, client, model_name, api_provider),
+                timeout=timeout,
+            )
+    except asyncio.TimeoutError:
+        return f"An API error occurred during vision completion: request timed out after {timeout}s"
+    except Exception as e:
+        return f"An API error occurred during vision completion: {e}"
+
 def clean_llm_output(output_str: str, language: str = 'json') -> str:
     """Cleans markdown code blocks from LLM output."""
     if '```' in output_str: